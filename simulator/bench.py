@@ -0,0 +1,234 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime
+
+import numpy as np
+
+if __package__ in (None, ""):
+    # Run as a script : make the simulator package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator.models import Simulator, SimpleUser, SimpleYearlyDeathGod, RandomTrader
+from simulator.plotting import GrapheDrawer
+from simulator.population import Population
+from simulator.trading import BatchRandomTrader
+
+
+BENCHMARKS = ("day", "new_day", "trade_guzis", "add_point", "give_birth", "give_death")
+ENGINES = ("numpy", "objects")
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+# The objects engine needs minutes per day above this
+DEFAULT_OBJECTS_MAX_USERS = 100000
+# Modules of a headless run : they must not load plotting modules
+CORE_MODULES = (
+    "simulator.models",
+    "simulator.population",
+    "simulator.trading",
+    "simulator.demography",
+    "simulator.cohorts",
+    "simulator.sharding",
+    "simulator.checkpoint",
+    "simulator.ensemble",
+)
+
+
+def measure_import(modules=CORE_MODULES):
+    """
+    Import modules in a fresh interpreter and return a dict with the
+    seconds it took and whether matplotlib got loaded
+    """
+    code = "import sys, time; start = time.perf_counter(); import {}; print(time.perf_counter() - start, 'matplotlib' in sys.modules)"
+    output = subprocess.run(
+        [sys.executable, "-c", code.format(", ".join(modules))],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True, text=True, check=True).stdout.split()
+    return {"seconds": float(output[0]), "matplotlib": output[1] == "True"}
+
+
+def build_simulator(engine, user_count, seed=0, warmup_days=3):
+    """
+    Return a seeded Simulator of user_count users born in 2010, with its
+    trader, after warmup_days days of creation and trading
+    """
+    if engine == "numpy":
+        population = Population(user_count)
+        population.add_numbered_users(user_count, date(2010, 1, 1))
+        simulator = Simulator(date(2020, 1, 1), population, seed=seed)
+        trader = BatchRandomTrader(population, rng=simulator.rngs["trading"])
+    elif engine == "objects":
+        simulator = Simulator(date(2020, 1, 1), seed=seed)
+        simulator.add_users([SimpleUser(i, date(2010, 1, 1)) for i in range(user_count)])
+        trader = RandomTrader(simulator.user_pool, rng=simulator.rngs["trading"])
+    else:
+        raise ValueError("Unknown engine {}".format(engine))
+    for _ in range(warmup_days):
+        simulator.new_day()
+        trader.trade_guzis()
+    return simulator, trader
+
+
+def _operation(name, simulator, trader):
+    """
+    Return a function running benchmark name once on simulator
+    """
+    death_god = SimpleYearlyDeathGod()
+    graph_drawer = GrapheDrawer(simulator)
+
+    def day():
+        simulator.new_day()
+        trader.trade_guzis()
+        graph_drawer.add_point()
+
+    def give_birth():
+        simulator.user_pool = death_god.give_birth(
+            simulator.user_pool, simulator.current_date, simulator.rngs["demography"])
+
+    def give_death():
+        simulator.user_pool = death_god.give_death(simulator.user_pool)
+        # The objects engine returns a new list
+        trader.user_pool = simulator.user_pool
+
+    operations = {
+        "day": day,
+        "new_day": simulator.new_day,
+        "trade_guzis": trader.trade_guzis,
+        "add_point": graph_drawer.add_point,
+        "give_birth": give_birth,
+        "give_death": give_death,
+    }
+    if name not in operations:
+        raise ValueError("Unknown benchmark {}".format(name))
+    return operations[name]
+
+
+def run_benchmark(name, engine, user_count, repeat=5, seed=0):
+    """
+    Run benchmark name repeat times on a fresh simulator and return a
+    result dict : seconds per call (mean and best), memory used by the
+    simulator state and peak memory of one call on top of it, in bytes
+    """
+    tracemalloc.start()
+    simulator, trader = build_simulator(engine, user_count, seed)
+    operation = _operation(name, simulator, trader)
+    state_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    operation()
+    peak_memory = tracemalloc.get_traced_memory()[1] - state_memory
+    tracemalloc.stop()
+
+    # Timed without tracemalloc, which slows allocations down
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        times.append(time.perf_counter() - start)
+    return {
+        "benchmark": name,
+        "engine": engine,
+        "users": user_count,
+        "repeat": repeat,
+        "seconds": sum(times) / repeat,
+        "best_seconds": min(times),
+        "state_memory": state_memory,
+        "peak_memory": peak_memory,
+    }
+
+
+def run_suite(benchmarks=BENCHMARKS, engines=ENGINES, sizes=DEFAULT_SIZES, repeat=5,
+              objects_max_users=DEFAULT_OBJECTS_MAX_USERS, seed=0, log=None):
+    """
+    Run every benchmark for every engine and size, and return a report dict
+    with the environment, the core import time and the list of results.
+    log, if given, is called with each result as soon as it is measured.
+    """
+    results = []
+    for engine in engines:
+        for size in sizes:
+            if engine == "objects" and size > objects_max_users:
+                continue
+            for name in benchmarks:
+                result = run_benchmark(name, engine, size, repeat, seed)
+                if log is not None:
+                    log(result)
+                results.append(result)
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "import": measure_import(),
+        "results": results,
+    }
+
+
+def save_report(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1)
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _result_key(result):
+    return result["benchmark"], result["engine"], result["users"]
+
+
+def compare_reports(old, new):
+    """
+    Return (benchmark, engine, users, old seconds, new seconds, new/old)
+    for each result present in both reports
+    """
+    old_results = {_result_key(r): r for r in old["results"]}
+    comparison = []
+    for result in new["results"]:
+        key = _result_key(result)
+        if key in old_results:
+            old_seconds = old_results[key]["seconds"]
+            comparison.append(key + (old_seconds, result["seconds"], result["seconds"] / old_seconds))
+    return comparison
+
+
+def format_result(result):
+    return "{:<12} {:<8} {:>8} users : {:>10.6f} s/call (best {:.6f}), state {:>8.1f} MB, peak {:>8.1f} MB".format(
+        result["benchmark"], result["engine"], result["users"], result["seconds"], result["best_seconds"],
+        result["state_memory"] / 1e6, result["peak_memory"] / 1e6)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the simulator hot paths')
+    parser.add_argument('-b', type=str, dest='benchmarks', nargs='+', default=BENCHMARKS, choices=BENCHMARKS,
+                       help='benchmarks to run (default: all)')
+    parser.add_argument('-e', type=str, dest='engines', nargs='+', default=ENGINES, choices=ENGINES,
+                       help='population engines to benchmark (default: all)')
+    parser.add_argument('-u', type=int, dest='sizes', nargs='+', default=DEFAULT_SIZES,
+                       help='user counts to benchmark')
+    parser.add_argument('-r', type=int, dest='repeat', default=5,
+                       help='timed calls per benchmark')
+    parser.add_argument('--objects-max-users', type=int, dest='objects_max_users', default=DEFAULT_OBJECTS_MAX_USERS,
+                       help='skip the objects engine above this user count')
+    parser.add_argument('-o', type=str, dest='output',
+                       help='save results to this JSON file')
+    parser.add_argument('-c', type=str, dest='compare',
+                       help='compare results to a JSON file saved by a previous run')
+
+    args = parser.parse_args()
+
+    report = run_suite(args.benchmarks, args.engines, args.sizes, args.repeat, args.objects_max_users,
+                       log=lambda result: print(format_result(result), flush=True))
+    print("core import : {:.3f} s{}".format(
+        report["import"]["seconds"], ", loads matplotlib" if report["import"]["matplotlib"] else ""))
+    if args.output:
+        save_report(report, args.output)
+    if args.compare:
+        print("\nnew time / old time :")
+        for name, engine, users, old_seconds, new_seconds, ratio in compare_reports(load_report(args.compare), report):
+            print("{:<12} {:<8} {:>8} users : {:.6f} s => {:.6f} s ({:.2f}x)".format(
+                name, engine, users, old_seconds, new_seconds, ratio))
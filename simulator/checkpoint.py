@@ -0,0 +1,196 @@
+import collections
+import os
+import pickle
+import random
+import shutil
+
+import numpy as np
+
+from .models import Simulator, SimpleUser
+from .population import Population, UserView, SLOTTED_WALLETS
+
+
+CHECKPOINT_VERSION = 1
+
+# What load_checkpoint returns. rngs is a dict of name => numpy Generator
+# and extra the dict given to save_checkpoint.
+Checkpoint = collections.namedtuple("Checkpoint", "simulator company_pool rngs extra")
+
+
+class _Pickler(pickle.Pickler):
+    """
+    Pickle users of the population (like company founders) as references
+    to their key instead of copying them
+    """
+    def __init__(self, file, population, user_keys):
+        super().__init__(file)
+        self.population = population
+        self.user_keys = user_keys
+
+    def persistent_id(self, obj):
+        if isinstance(obj, UserView) and obj.population is self.population:
+            return ("user", obj.key)
+        if isinstance(obj, SimpleUser) and id(obj) in self.user_keys:
+            return ("user", self.user_keys[id(obj)])
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file, get_user):
+        super().__init__(file)
+        self.get_user = get_user
+
+    def persistent_load(self, pid):
+        kind, key = pid
+        if kind != "user":
+            raise pickle.UnpicklingError("Unknown persistent id {}".format(pid))
+        return self.get_user(key)
+
+
+def _storable_ids(ids):
+    """
+    Return ids as a plain numpy array when they are all integers or all
+    strings, so that they can be memory-mapped on resume. Mixed ids (like
+    numbered users and their children with uuid ids) stay an object array,
+    pickled in their .npy file.
+    """
+    values = ids.tolist()
+    if all(type(i) is int for i in values):
+        try:
+            return np.array(values, dtype=np.int64)
+        except OverflowError:
+            return ids
+    if all(type(i) is str for i in values):
+        return np.array(values, dtype=str)
+    return ids
+
+
+def _rng_states(rngs):
+    return {name: rng.bit_generator.state for name, rng in rngs.items()}
+
+
+def _restore_rngs(states):
+    rngs = {}
+    for name, rng_state in states.items():
+        bit_generator = getattr(np.random, rng_state["bit_generator"])()
+        bit_generator.state = rng_state
+        rngs[name] = np.random.Generator(bit_generator)
+    return rngs
+
+
+def save_checkpoint(simulator, path, company_pool=(), rngs=None, extra=None):
+    """
+    Save the state of simulator in directory path : one .npy file per user
+    column (and per expiry slots array), and a small pickle with dates, running totals, companies,
+    random generators states (simulator.rngs and the given rngs dict) and
+    the extra dict.
+    The checkpoint is written aside and moved to path once complete, so a
+    crash while saving keeps the previous checkpoint.
+    """
+    is_list = isinstance(simulator.user_pool, list)
+    if is_list:
+        population = Population(len(simulator.user_pool))
+        population.extend(simulator.user_pool)
+        user_keys = {id(u): key for key, u in enumerate(simulator.user_pool)}
+    else:
+        population = simulator.user_pool
+        user_keys = {}
+
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name in Population.COLUMNS:
+        array = population._field(name)
+        if name == "ids":
+            array = _storable_ids(array)
+        np.save(os.path.join(tmp_path, name + ".npy"), array)
+    np.save(os.path.join(tmp_path, "positions.npy"), population._positions[:population.next_key])
+    for name, slots in (population.slots or {}).items():
+        np.save(os.path.join(tmp_path, name + "_slots.npy"), slots[:, :population.size])
+
+    state = {
+        "version": CHECKPOINT_VERSION,
+        "start_date": simulator.start_date,
+        "current_date": simulator.current_date,
+        "debug": simulator.debug,
+        "is_list": is_list,
+        "totals": (population.guzis_on_road, population.daily_guzis_total),
+        "exact_expiry": population.slots is not None,
+        "day": population.day,
+        "seed_sequence": simulator.seed_sequence,
+        "simulator_rngs": _rng_states(simulator.rngs),
+        "rngs": _rng_states(rngs or {}),
+        "python_random": random.getstate(),
+        "extra": extra or {},
+    }
+    with open(os.path.join(tmp_path, "state.pickle"), "wb") as f:
+        pickle.dump(state, f)
+    with open(os.path.join(tmp_path, "companies.pickle"), "wb") as f:
+        _Pickler(f, population, user_keys).dump(list(company_pool))
+
+    old_path = path + ".old"
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def _load_array(path, name, mmap):
+    file_name = os.path.join(path, name + ".npy")
+    if mmap:
+        try:
+            # Copy on write : the run goes on in memory, the file is untouched
+            return np.load(file_name, mmap_mode="c")
+        except ValueError:
+            # Python objects can't be memory-mapped
+            pass
+    return np.load(file_name, allow_pickle=True)
+
+
+def load_checkpoint(path, mmap=True, restore_random=True):
+    """
+    Load a checkpoint saved with save_checkpoint.
+    User columns are memory-mapped (unless mmap=False) : pages are read
+    from disk only when the simulation touches them.
+    If restore_random, the global random module state is restored too.
+    """
+    with open(os.path.join(path, "state.pickle"), "rb") as f:
+        state = pickle.load(f)
+    if state["version"] != CHECKPOINT_VERSION:
+        raise ValueError("Unsupported checkpoint version {}".format(state["version"]))
+
+    slots = None
+    if state["exact_expiry"]:
+        slots = {name: _load_array(path, name + "_slots", mmap) for name in SLOTTED_WALLETS}
+    population = Population.from_arrays(
+        {name: _load_array(path, name, mmap) for name in Population.COLUMNS},
+        _load_array(path, "positions", mmap), slots, state["day"])
+    population.guzis_on_road, population.daily_guzis_total = state["totals"]
+
+    if state["is_list"]:
+        users = [SimpleUser(u.id, u.birthdate) for u in population]
+        for user, view in zip(users, population):
+            user.guzi_wallet = view.guzi_wallet
+            user.guza_wallet = view.guza_wallet
+            user.total_accumulated = view.total_accumulated
+            user.guza_trashbin = view.guza_trashbin
+            user.balance = {"income": view.balance["income"], "outcome": view.balance["outcome"]}
+        user_pool = users
+        get_user = users.__getitem__
+    else:
+        user_pool = population
+        get_user = lambda key: UserView(population, key)
+
+    with open(os.path.join(path, "companies.pickle"), "rb") as f:
+        company_pool = _Unpickler(f, get_user).load()
+
+    simulator = Simulator(state["start_date"], user_pool, state["debug"])
+    simulator.current_date = state["current_date"]
+    simulator.seed_sequence = state["seed_sequence"]
+    simulator.rngs = _restore_rngs(state["simulator_rngs"])
+
+    rngs = _restore_rngs(state["rngs"])
+    if restore_random:
+        random.setstate(state["python_random"])
+
+    return Checkpoint(simulator, company_pool, rngs, state["extra"])
@@ -0,0 +1,308 @@
+from datetime import date
+
+import numpy as np
+
+from .models import SimpleUser
+from .population import Population, daily_guzis, update_day
+from .demography import death_probabilities, _day_of_year
+
+
+class CohortPopulation:
+    """
+    A pool of anonymous users where users with identical state form a
+    cohort, stored once as a row with its number of members (counts).
+    Simulator.new_day updates one row per cohort, so runs without trading
+    scale with the number of distinct states instead of the head count.
+    Users are ordered cohort after cohort. Removing users shrinks their
+    cohorts, and isolate() splits the given users into single member
+    cohorts before they are changed one by one (like by a trade). new_day
+    merges cohorts back with compact() each time their number doubled, so
+    users isolated by trades share a row again once their states match.
+    guzis_on_road and daily_guzis_total are running sums over all users.
+    """
+    FIELDS = Population.FIELDS
+    # column name => (dtype, fill value of empty rows)
+    COLUMNS = dict(
+        counts=(np.int64, 0),
+        birthdates=("datetime64[D]", np.datetime64("NaT")),
+        **{f: (np.int64, 0) for f in FIELDS}
+    )
+    # Births are added with add_cohort (see models.anonymous_births)
+    anonymous_births = True
+
+    def __init__(self, capacity=16):
+        self.size = 0
+        self.user_count = 0
+        self._capacity = max(capacity, 1)
+        self._arrays = {
+            name: np.full(self._capacity, fill, dtype=dtype)
+            for name, (dtype, fill) in self.COLUMNS.items()
+        }
+        self.guzis_on_road = 0
+        self.daily_guzis_total = 0
+        # Number of cohorts after the last compact()
+        self._compacted_size = 1
+
+    def _field(self, name):
+        return self._arrays[name][:self.size]
+
+    counts = property(lambda self: self._field("counts"))
+    birthdates = property(lambda self: self._field("birthdates"))
+    guzi_wallet = property(lambda self: self._field("guzi_wallet"))
+    guza_wallet = property(lambda self: self._field("guza_wallet"))
+    total_accumulated = property(lambda self: self._field("total_accumulated"))
+    guza_trashbin = property(lambda self: self._field("guza_trashbin"))
+    income = property(lambda self: self._field("income"))
+    outcome = property(lambda self: self._field("outcome"))
+
+    def _add_rows(self, count):
+        """
+        Add count blank rows and return their slice
+        """
+        needed = self.size + count
+        if needed > self._capacity:
+            capacity = max(needed, 2 * self._capacity)
+            for name, (dtype, fill) in self.COLUMNS.items():
+                grown = np.full(capacity, fill, dtype=dtype)
+                grown[:self.size] = self._field(name)
+                self._arrays[name] = grown
+            self._capacity = capacity
+        rows = slice(self.size, needed)
+        self.size = needed
+        return rows
+
+    def cohort_count(self):
+        return self.size
+
+    def add_cohort(self, count, birthdate):
+        """
+        Add a cohort of count blank users born at birthdate
+        """
+        if count <= 0:
+            return
+        i = self._add_rows(1).start
+        self._arrays["counts"][i] = count
+        self._arrays["birthdates"][i] = np.datetime64("NaT") if birthdate is None else birthdate
+        self.user_count += count
+        # Blank users earn 1 Guzi a day
+        self.daily_guzis_total += count
+
+    def add_users(self, ids, birthdate):
+        """
+        Add one blank user per given id (ids are not kept) born at birthdate
+        """
+        self.add_cohort(len(ids), birthdate)
+
+    def _state_of(self, user):
+        return (
+            np.datetime64("NaT") if user.birthdate is None else np.datetime64(user.birthdate, "D"),
+            user.guzi_wallet, user.guza_wallet, user.total_accumulated, user.guza_trashbin,
+            user.balance["income"], user.balance["outcome"])
+
+    def append(self, user):
+        """
+        Add a member with the state of given SimpleUser (its id is not
+        kept), in the last cohort if it has the same state
+        """
+        state = self._state_of(user)
+        last = self.size - 1
+        if last < 0 or not self._same_state(last, state):
+            last = self._add_rows(1).start
+            for name, value in zip(("birthdates",) + self.FIELDS, state):
+                self._arrays[name][last] = value
+        self._arrays["counts"][last] += 1
+        self.user_count += 1
+        self.guzis_on_road += user.guzi_wallet
+        self.daily_guzis_total += user.daily_guzis()
+
+    def _same_state(self, row, state):
+        birthdate = self._arrays["birthdates"][row]
+        same_birthdate = birthdate == state[0] or (np.isnat(birthdate) and np.isnat(state[0]))
+        return same_birthdate and all(
+            self._arrays[name][row] == value for name, value in zip(self.FIELDS, state[1:]))
+
+    def extend(self, users):
+        for user in users:
+            self.append(user)
+
+    def __len__(self):
+        return self.user_count
+
+    def _cohorts_of(self, indices):
+        """
+        Return the row of the cohort holding each of given user indices
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) and (indices.min() < 0 or indices.max() >= self.user_count):
+            raise IndexError("CohortPopulation index out of range")
+        return np.searchsorted(np.cumsum(self.counts), indices, side="right")
+
+    def __getitem__(self, index):
+        """
+        Return a SimpleUser copy of the user at given index
+        """
+        if index < 0:
+            index += self.user_count
+        row = int(self._cohorts_of([index])[0])
+        birthdate = self.birthdates[row]
+        user = SimpleUser(None, None if np.isnat(birthdate) else birthdate.astype(date))
+        for name in ("guzi_wallet", "guza_wallet", "total_accumulated", "guza_trashbin", "income", "outcome"):
+            setattr(user, name, int(self._field(name)[row]))
+        return user
+
+    def _shrink(self, rows, removed):
+        """
+        Remove removed[i] members from cohort rows[i] (distinct rows), and
+        the cohorts left empty
+        """
+        counts = self.counts
+        counts[rows] -= removed
+        self.user_count -= int(removed.sum())
+        self.guzis_on_road -= int((self.guzi_wallet[rows] * removed).sum())
+        self.daily_guzis_total -= int((daily_guzis(self.total_accumulated[rows]) * removed).sum())
+        keep = counts > 0
+        if not keep.all():
+            size = int(keep.sum())
+            for name in self.COLUMNS:
+                self._arrays[name][:size] = self._field(name)[keep]
+                self._arrays[name][size:self.size] = self.COLUMNS[name][1]
+            self.size = size
+
+    def remove(self, indices):
+        """
+        Remove users at given indices
+        """
+        rows, removed = np.unique(self._cohorts_of(np.unique(indices)), return_counts=True)
+        self._shrink(rows, removed)
+
+    def remove_deaths(self, date, rng, days=365):
+        """
+        Remove users dying within given days after date, with the
+        probability of their age in data.die_stat : one binomial draw per
+        cohort. Return the number of dead.
+        """
+        birthdates = self.birthdates
+        known = np.flatnonzero(~np.isnat(birthdates))
+        today = np.array([date], dtype="datetime64[D]")
+        years = date.year - (birthdates[known].astype("datetime64[Y]").astype(np.int64) + 1970)
+        ages = years - (_day_of_year(today)[0] < _day_of_year(birthdates[known]))
+        dead = rng.binomial(self.counts[known], death_probabilities(ages, days))
+        self._shrink(known[dead > 0], dead[dead > 0])
+        return int(dead.sum())
+
+    def isolate(self, indices):
+        """
+        Split users at given indices out of their cohorts into single member
+        cohorts, and return their rows, in the order of indices
+        """
+        members = np.unique(indices)
+        cohorts = self._cohorts_of(members)
+        counts = self.counts
+        isolated = np.bincount(cohorts, minlength=self.size)
+        # The first isolated member of a fully isolated cohort keeps its row
+        first = np.searchsorted(cohorts, cohorts, side="left") == np.arange(len(cohorts))
+        reuse = first & (counts[cohorts] == isolated[cohorts])
+        rows = cohorts.copy()
+        new = np.flatnonzero(~reuse)
+        new_rows = self._add_rows(len(new))
+        for name in self.COLUMNS:
+            self._arrays[name][new_rows] = self._arrays[name][cohorts[new]]
+        self._arrays["counts"][new_rows] = 1
+        rows[new] = np.arange(new_rows.start, new_rows.stop)
+        self._arrays["counts"][:self.size] -= np.bincount(cohorts[new], minlength=self.size)
+        return rows[np.searchsorted(members, indices)]
+
+    def compact(self):
+        """
+        Merge cohorts which got the same state again
+        """
+        if self.size == 0:
+            return
+        columns = np.stack([self.birthdates.astype(np.int64)] + [self._field(f) for f in self.FIELDS])
+        states, inverse = np.unique(columns, axis=1, return_inverse=True)
+        counts = np.bincount(inverse.ravel(), weights=self.counts, minlength=states.shape[1]).astype(np.int64)
+        size = states.shape[1]
+        self._arrays["counts"][:size] = counts
+        self._arrays["birthdates"][:size] = states[0].astype("datetime64[D]")
+        for i, name in enumerate(self.FIELDS):
+            self._arrays[name][:size] = states[i + 1]
+        for name in self.COLUMNS:
+            self._arrays[name][size:self.size] = self.COLUMNS[name][1]
+        self.size = size
+
+    def add_total_accumulated(self, rows, amounts):
+        """
+        Add amounts to total_accumulated of single member cohorts at given
+        distinct rows
+        """
+        total_accumulated = self.total_accumulated
+        before = daily_guzis(total_accumulated[rows])
+        total_accumulated[rows] += amounts
+        self.daily_guzis_total += int((daily_guzis(total_accumulated[rows]) - before).sum())
+
+    def recompute_totals(self):
+        self.guzis_on_road, self.daily_guzis_total = self._computed_totals()
+
+    def _computed_totals(self):
+        return (int((self.guzi_wallet * self.counts).sum()),
+                int((daily_guzis(self.total_accumulated) * self.counts).sum()))
+
+    def check_totals(self):
+        """
+        Cross-check running totals against a full recompute
+        """
+        computed = self._computed_totals()
+        if (self.guzis_on_road, self.daily_guzis_total) != computed:
+            raise RuntimeError("Running totals (guzis_on_road, daily_guzis_total) {} differ from recomputed {}".format(
+                (self.guzis_on_road, self.daily_guzis_total), computed))
+
+    def new_day(self, date, profiler=None):
+        """
+        Same as Population.new_day, once per cohort
+        """
+        created, outdated = update_day(self, profiler)
+        counts = self.counts
+        self.daily_guzis_total = int((created * counts).sum())
+        self.guzis_on_road += self.daily_guzis_total - int((outdated * counts).sum())
+        # Compacting once the number of cohorts doubled costs O(1) per split
+        if self.size >= 2 * self._compacted_size:
+            self.compact()
+            self._compacted_size = max(self.size, 1)
+
+
+class CohortRandomTrader:
+    """
+    Random guzis paiements between users of a CohortPopulation, drawn like
+    BatchRandomTrader : payers and payees are isolated from their cohorts,
+    then trade as single users. Companies are not supported.
+    """
+    def __init__(self, user_pool, rng=None):
+        self.user_pool = user_pool
+        self.rng = np.random.default_rng() if rng is None else rng
+
+    def trade_guzis(self, k=0):
+        """
+        make paiements from k users, default 0
+        If k=0, each user makes a paiement < it's wallet size
+        """
+        population = self.user_pool
+        user_count = len(population)
+        if user_count == 0:
+            raise ValueError("Cannot trade guzis with empty user_pool")
+        if k == 0 or k == user_count:
+            payers = np.arange(user_count)
+        else:
+            payers = self.rng.choice(user_count, size=k, replace=False)
+        payers = payers[population.guzi_wallet[population._cohorts_of(payers)] > 1]
+        payees = self.rng.integers(0, user_count, size=len(payers))
+
+        rows = population.isolate(np.concatenate((payers, payees)))
+        payer_rows, payee_rows = rows[:len(payers)], rows[len(payers):]
+        amounts = self.rng.integers(1, population.guzi_wallet[payer_rows])
+
+        population.guzi_wallet[payer_rows] -= amounts
+        population.guzis_on_road -= int(amounts.sum())
+        to_self = payee_rows == payer_rows
+        population.add_total_accumulated(payee_rows[to_self], amounts[to_self])
+        population.income[:] += np.bincount(
+            payee_rows[~to_self], weights=amounts[~to_self], minlength=population.size).astype(np.int64)
@@ -0,0 +1,129 @@
+import math
+
+import numpy as np
+
+
+def as_numbers(values):
+    """
+    Return values as a float array, dates as their ordinal
+    """
+    values = np.asarray(values)
+    if values.dtype == object:
+        return np.array([v.toordinal() for v in values], dtype=np.float64)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[D]").astype(np.float64)
+    return values.astype(np.float64)
+
+
+def lttb_indices(x, y, count):
+    """
+    Return the indices of count points of series (x, y) chosen by Largest
+    Triangle Three Buckets : the first and last points, then in each bucket
+    the point making the largest triangle with the point chosen in the
+    previous bucket and the average of the next bucket.
+    """
+    size = len(x)
+    if count >= size or count < 3:
+        return np.arange(size)
+    x, y = as_numbers(x), as_numbers(y)
+    bounds = (np.arange(count - 1) * (size - 2) / (count - 2)).astype(np.int64) + 1
+    bounds[-1] = size - 1
+    indices = np.empty(count, dtype=np.int64)
+    indices[0], indices[-1] = 0, size - 1
+    chosen = 0
+    for b in range(count - 2):
+        start, stop = bounds[b], bounds[b + 1]
+        next_stop = bounds[b + 2] if b + 2 < len(bounds) else size
+        next_x, next_y = x[stop:next_stop].mean(), y[stop:next_stop].mean()
+        areas = np.abs(
+            (x[chosen] - next_x) * (y[start:stop] - y[chosen])
+            - (x[chosen] - x[start:stop]) * (next_y - y[chosen]))
+        chosen = start + int(np.argmax(areas))
+        indices[b + 1] = chosen
+    return indices
+
+
+def min_max_indices(y, size):
+    """
+    Return the indices of the minimum and maximum of y in each bucket of
+    size points, in order
+    """
+    y = as_numbers(y)
+    full = len(y) // size * size
+    starts = np.arange(0, full, size)
+    buckets = y[:full].reshape(-1, size)
+    indices = [starts + np.argmin(buckets, axis=1), starts + np.argmax(buckets, axis=1)]
+    if full < len(y):
+        indices.append(full + np.array([np.argmin(y[full:]), np.argmax(y[full:])]))
+    indices = np.sort(np.concatenate(indices))
+    keep = np.ones(len(indices), dtype=bool)
+    keep[1:] = indices[1:] != indices[:-1]
+    return indices[keep]
+
+
+def decimate(x, y, count, method="lttb"):
+    """
+    Return (x, y) arrays of at most about count points keeping the shape of
+    series (x, y) : chosen by Largest Triangle Three Buckets ("lttb") or the
+    minimum and maximum of each bucket ("minmax"). Series of count points
+    or less are returned whole.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    if len(x) <= count:
+        return x, y
+    if method == "lttb":
+        indices = lttb_indices(x, y, count)
+    elif method == "minmax":
+        indices = min_max_indices(y, math.ceil(2 * len(y) / count))
+    else:
+        raise ValueError("Unknown decimation method {}".format(method))
+    return x[indices], y[indices]
+
+
+class MinMaxStream:
+    """
+    A series growing point by point, kept to at most about count points :
+    each bucket of points is reduced to its minimum and maximum once full,
+    and buckets double in size when there are too many of them, so adding
+    points only reduces the new ones. The last point is always kept.
+    """
+    def __init__(self, count):
+        self.count = count
+        self.size = 1
+        self.x = np.zeros(0)
+        self.y = np.zeros(0)
+        self.tail_x = np.zeros(0)
+        self.tail_y = np.zeros(0)
+        self.last = None
+
+    def extend(self, x, y):
+        if len(x) == 0:
+            return
+        self.last = (x[-1], y[-1])
+        self.tail_x = np.concatenate((self.tail_x, x))
+        self.tail_y = np.concatenate((self.tail_y, y))
+        full = len(self.tail_y) // self.size * self.size
+        if full > 0:
+            if self.size == 1:
+                indices = np.arange(full)
+            else:
+                indices = min_max_indices(self.tail_y[:full], self.size)
+            self.x = np.concatenate((self.x, self.tail_x[indices]))
+            self.y = np.concatenate((self.y, self.tail_y[indices]))
+            self.tail_x, self.tail_y = self.tail_x[full:], self.tail_y[full:]
+        while len(self.y) > self.count:
+            # Merge reduced buckets two by two
+            if self.size == 1:
+                self.size = 4
+            else:
+                self.size *= 2
+            indices = min_max_indices(self.y, 4)
+            self.x, self.y = self.x[indices], self.y[indices]
+
+    def data(self):
+        """
+        Return (x, y) arrays of the reduced points then the last raw ones
+        """
+        if len(self.tail_x) == 0 and self.last is not None and self.x[-1] != self.last[0]:
+            return np.append(self.x, self.last[0]), np.append(self.y, self.last[1])
+        return np.concatenate((self.x, self.tail_x)), np.concatenate((self.y, self.tail_y))
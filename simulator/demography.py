@@ -0,0 +1,256 @@
+from datetime import date
+
+import numpy as np
+
+from .data import die_stat
+from .models import SimpleYearlyDeathGod, UserGenerator, anonymous_births, random_uuid
+
+
+# Probability to die within a year, indexed by age. Ages above the table
+# use the last value.
+YEARLY_DEATH_PROBABILITIES = np.array([stat for age, stat in sorted(die_stat)])
+
+
+def death_probabilities(ages, days=365):
+    """
+    Return the probability to die within given number of days for each age
+    of given array. Unborn users (negative age) never die.
+    """
+    ages = np.asarray(ages)
+    yearly = YEARLY_DEATH_PROBABILITIES[np.clip(ages, 0, len(YEARLY_DEATH_PROBABILITIES) - 1)]
+    probabilities = 1 - (1 - yearly) ** (days / 365)
+    return np.where(ages < 0, 0, probabilities)
+
+
+def survivorship():
+    """
+    Return the share of newborns reaching each age of
+    YEARLY_DEATH_PROBABILITIES, which is also the age pyramid of a
+    stationary population
+    """
+    return np.concatenate(([1], np.cumprod(1 - YEARLY_DEATH_PROBABILITIES)[:-1]))
+
+
+def pyramid_birthdates(count, date, rng=None):
+    """
+    Return a datetime64[D] array of count birthdates drawn at once, so
+    that ages at given date follow the survivorship age pyramid. Each
+    birthdate is uniform within the year giving its age.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    weights = survivorship()
+    ages = rng.choice(len(weights), size=count, p=weights / weights.sum())
+    # Users of age a are born after date - (a + 1) years, up to date - a years
+    first = _years_before(date, ages + 1) + 1
+    last = _years_before(date, ages)
+    return first + rng.integers(0, (last - first).astype(np.int64) + 1)
+
+
+def _years_before(date, years):
+    """
+    Return date minus each of given years as datetime64[D], with the
+    convention of User.age : from the end of February, the result is the
+    end of February too
+    """
+    today = np.datetime64(date, "D")
+    today_month = today.astype("datetime64[M]")
+    month = today_month - 12 * years
+    month_end = (month + 1).astype("datetime64[D]") - 1
+    if today == (today_month + 1).astype("datetime64[D]") - 1:
+        return month_end
+    return np.minimum(month.astype("datetime64[D]") + (today - today_month.astype("datetime64[D]")), month_end)
+
+
+def _day_of_year(dates):
+    """
+    Encode (month, day) of given datetime64[D] as (month-1)*100 + day-1, so
+    that comparing two codes tells if a birthday is passed
+    """
+    months = dates.astype("datetime64[M]")
+    return (months - dates.astype("datetime64[Y]")).astype(np.int64) * 100 + (dates - months).astype(np.int64)
+
+
+class AgeIndex:
+    """
+    Users of a Population grouped by birth year.
+    Each bucket holds the users keys sorted by birthday, so the age of any
+    member at a given date is the bucket age or the bucket age - 1, split
+    by a binary search on the birthday.
+    """
+    def __init__(self, population):
+        self.population = population
+        self.buckets = {}
+        self.next_key = 0
+        self.update()
+
+    def __len__(self):
+        return sum(len(keys) for keys, _ in self.buckets.values())
+
+    def update(self):
+        """
+        Index users added to the population since last update. Users without
+        birthdate are not indexed.
+        """
+        new_keys = np.arange(self.next_key, self.population.next_key)
+        self.next_key = self.population.next_key
+        positions = self.population.positions(new_keys)
+        alive = positions >= 0
+        self.add(new_keys[alive], self.population.birthdates[positions[alive]])
+
+    def add(self, keys, birthdates):
+        known = ~np.isnat(birthdates)
+        keys, birthdates = keys[known], birthdates[known]
+        years = birthdates.astype("datetime64[Y]").astype(np.int64) + 1970
+        days = _day_of_year(birthdates)
+        for year in np.unique(years):
+            in_year = years == year
+            bucket_keys, bucket_days = self.buckets.get(year, (keys[:0], days[:0]))
+            bucket_keys = np.concatenate((bucket_keys, keys[in_year]))
+            bucket_days = np.concatenate((bucket_days, days[in_year]))
+            order = np.argsort(bucket_days, kind="stable")
+            self.buckets[year] = (bucket_keys[order], bucket_days[order])
+
+    def draw_deaths(self, date, rng, days=365):
+        """
+        Draw who dies within given days after given date : one Bernoulli draw
+        per bucket, with each member probability given by its age.
+        Return the keys of dead users and forget them.
+        """
+        today = _day_of_year(np.array([date], dtype="datetime64[D]"))[0]
+        dead = []
+        for year in list(self.buckets):
+            keys, birthdays = self.buckets[year]
+            age = date.year - year
+            had_birthday = np.searchsorted(birthdays, today, side="right")
+            probabilities = np.repeat(
+                death_probabilities([age, age - 1], days),
+                [had_birthday, len(keys) - had_birthday])
+            dies = rng.random(len(keys)) < probabilities
+            if dies.any():
+                dead.append(keys[dies])
+                if dies.all():
+                    del self.buckets[year]
+                else:
+                    self.buckets[year] = (keys[~dies], birthdays[~dies])
+        return np.concatenate(dead) if dead else np.empty(0, dtype=np.int64)
+
+
+class AgeDeathGod(SimpleYearlyDeathGod):
+    """
+    Births like SimpleYearlyDeathGod, but each user dies with the
+    probability of his age in data.die_stat.
+    Works on a population.Population, indexed by birth year on first use,
+    or on a cohorts.CohortPopulation.
+    """
+    def __init__(self, rng=None):
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.index = None
+
+    def _get_index(self, population):
+        if self.index is None or self.index.population is not population:
+            self.index = AgeIndex(population)
+        else:
+            self.index.update()
+        return self.index
+
+    def give_birth(self, population, date=date.today(), rng=None):
+        """
+        Add to the population new users prorated to its size. Their ids are
+        drawn from rng, or from the death god rng by default.
+        """
+        rng = self.rng if rng is None else rng
+        born = self.how_much_born(len(population))
+        if anonymous_births(population):
+            population.add_cohort(born, date)
+        else:
+            population.add_users([random_uuid(rng) for _ in range(born)], date)
+        return population
+
+    def give_death(self, population, date=date.today(), days=365):
+        """
+        Remove from the population users dying within given days after date
+        """
+        if hasattr(population, "remove_deaths"):
+            # A cohorts.CohortPopulation draws deaths per cohort
+            population.remove_deaths(date, self.rng, days)
+            return population
+        dead = self._get_index(population).draw_deaths(date, self.rng, days)
+        positions = population.positions(dead)
+        population.remove(positions[positions >= 0])
+        return population
+
+
+class DailyDeathGod(SimpleYearlyDeathGod):
+    """
+    Births and deaths of SimpleYearlyDeathGod spread over the days : called
+    every day, it gives 1/365 of the yearly prorated counts, carrying the
+    fractions over to the next days. The oldest users still die first.
+    A population.Population removes them with swap_remove, found from the
+    smallest living key, so a day costs O(births + deaths) instead of
+    copying the whole pool. A list loses its first users in place, so the
+    Simulator only has to track the users born since the previous day.
+    The carried fractions are the state saved by checkpoints (getstate).
+    """
+    def __init__(self):
+        self.birth_carry = 0.0
+        self.death_carry = 0.0
+        self.population = None
+        # Keys below next_key are dead users of population
+        self.next_key = 0
+
+    def getstate(self):
+        return {"birth_carry": self.birth_carry, "death_carry": self.death_carry}
+
+    def _daily_count(self, yearly_count, population_size, carry):
+        """
+        Return the number of events of the day and the fraction to carry
+        """
+        expected = carry + yearly_count * population_size / (self.total_2019_population * 365)
+        count = int(expected)
+        return count, expected - count
+
+    def give_birth(self, population, date=date.today(), rng=None):
+        """
+        Add to the population the users born on given date
+        """
+        born, self.birth_carry = self._daily_count(self.total_2019_born, len(population), self.birth_carry)
+        if born == 0:
+            return population
+        if anonymous_births(population):
+            population.add_cohort(born, date)
+        elif isinstance(population, list):
+            population.extend(UserGenerator.generate_users(date, born, rng))
+        else:
+            population.add_users([random_uuid(rng) for _ in range(born)], date)
+        return population
+
+    def give_death(self, population):
+        """
+        Remove from the population the oldest users dying today
+        """
+        dead, self.death_carry = self._daily_count(self.total_2019_death, len(population), self.death_carry)
+        if dead == 0:
+            return population
+        if isinstance(population, list):
+            del population[:dead]
+        elif hasattr(population, "swap_remove"):
+            population.swap_remove(self._oldest_rows(population, dead))
+        else:
+            population.remove(range(dead))
+        return population
+
+    def _oldest_rows(self, population, count):
+        """
+        Return the rows of the count living users with the smallest keys
+        """
+        if population is not self.population:
+            self.population, self.next_key = population, 0
+        rows = []
+        while count > 0 and self.next_key < population.next_key:
+            keys = np.arange(self.next_key, min(self.next_key + 2 * count, population.next_key))
+            positions = population.positions(keys)
+            alive = np.flatnonzero(positions >= 0)[:count]
+            rows.append(positions[alive])
+            count -= len(alive)
+            self.next_key = int(keys[alive[-1]] + 1 if count == 0 else keys[-1] + 1)
+        return np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
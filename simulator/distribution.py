@@ -0,0 +1,146 @@
+import numpy as np
+
+from .population import daily_guzis
+
+
+# Values below LINEAR_LIMIT get a bin each, larger ones share logarithmic
+# bins of BINS_PER_OCTAVE per power of 2 (4.4% wide)
+LINEAR_LIMIT = 1024
+BINS_PER_OCTAVE = 16
+_LINEAR_OCTAVES = 10
+BIN_COUNT = LINEAR_LIMIT + (63 - _LINEAR_OCTAVES) * BINS_PER_OCTAVE
+
+# Columns added to graph points by distribution_point
+DISTRIBUTION_COLUMNS = (
+    "gini_total_accumulated",
+    "gini_guzi_wallet",
+    "daily_guzis_p10",
+    "daily_guzis_p50",
+    "daily_guzis_p90",
+    "guzi_wallet_p50",
+    "guzi_wallet_p90",
+)
+
+
+def _bins_of(values):
+    values = np.asarray(values, dtype=np.int64)
+    large = np.maximum(values, LINEAR_LIMIT)
+    log_bins = LINEAR_LIMIT + ((np.log2(large) - _LINEAR_OCTAVES) * BINS_PER_OCTAVE).astype(np.int64)
+    return np.where(values < LINEAR_LIMIT, values, np.minimum(log_bins, BIN_COUNT - 1))
+
+
+def _bin_lower_edges():
+    log_edges = 2.0 ** (_LINEAR_OCTAVES + np.arange(BIN_COUNT - LINEAR_LIMIT) / BINS_PER_OCTAVE)
+    return np.concatenate((np.arange(LINEAR_LIMIT, dtype=np.float64), log_edges))
+
+
+class LogHistogram:
+    """
+    Bounded memory histogram of non negative integers : exact below
+    LINEAR_LIMIT, within 4.4% above. It keeps the count and the sum of the
+    values of each bin, is filled in one vectorized pass and histograms of
+    parts of a pool (like shards) can be merged.
+    """
+    def __init__(self):
+        self.counts = np.zeros(BIN_COUNT, dtype=np.int64)
+        self.sums = np.zeros(BIN_COUNT, dtype=np.float64)
+
+    def add(self, values, weights=None):
+        """
+        Add values, each counted weights times if given
+        """
+        bins = _bins_of(values)
+        values = np.asarray(values, dtype=np.float64)
+        if weights is None:
+            self.counts += np.bincount(bins, minlength=BIN_COUNT)
+            self.sums += np.bincount(bins, weights=values, minlength=BIN_COUNT)
+        else:
+            weights = np.asarray(weights)
+            self.counts += np.bincount(bins, weights=weights, minlength=BIN_COUNT).astype(np.int64)
+            self.sums += np.bincount(bins, weights=values * weights, minlength=BIN_COUNT)
+        return self
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.sums += other.sums
+        return self
+
+    def count(self):
+        return int(self.counts.sum())
+
+    def lower_edges(self):
+        """
+        Return the smallest value of each bin
+        """
+        return _bin_lower_edges()
+
+    def quantile(self, q):
+        """
+        Return the smallest value v such that a q fraction of values are
+        <= v : exact below LINEAR_LIMIT, interpolated inside logarithmic bins
+        """
+        count = self.count()
+        if count == 0:
+            return 0.0
+        cumulated = np.cumsum(self.counts)
+        rank = max(q * count, 1)
+        b = int(np.searchsorted(cumulated, rank))
+        if b < LINEAR_LIMIT:
+            return float(b)
+        edges = _bin_lower_edges()
+        upper = edges[b] * 2 ** (1 / BINS_PER_OCTAVE)
+        before = cumulated[b] - self.counts[b]
+        return float(edges[b] + (upper - edges[b]) * (rank - before) / self.counts[b])
+
+    def gini(self):
+        """
+        Return the Gini coefficient of the values, from the Lorenz curve of
+        the bins : exact below LINEAR_LIMIT, slightly underestimated above as
+        values of a bin count as equal
+        """
+        count, total = self.count(), self.sums.sum()
+        if count == 0 or total == 0:
+            return 0.0
+        shares = np.cumsum(self.sums) / total
+        lorenz = shares + np.concatenate(([0.0], shares[:-1]))
+        return float(1 - (self.counts / count * lorenz).sum())
+
+
+def histogram_of(user_pool, name):
+    """
+    Return the LogHistogram of field name (a user column, or daily_guzis)
+    over the users of user_pool : a list of users, a population.Population,
+    a cohorts.CohortPopulation or a sharding.ShardedPopulation
+    """
+    if hasattr(user_pool, "histogram"):
+        return user_pool.histogram(name)
+    if isinstance(user_pool, list):
+        if name == "daily_guzis":
+            values = np.fromiter((u.daily_guzis() for u in user_pool), dtype=np.int64, count=len(user_pool))
+        else:
+            values = np.fromiter((getattr(u, name) for u in user_pool), dtype=np.int64, count=len(user_pool))
+        return LogHistogram().add(values)
+    if name == "daily_guzis":
+        values = daily_guzis(user_pool.total_accumulated)
+    else:
+        values = getattr(user_pool, name)
+    return LogHistogram().add(values, getattr(user_pool, "counts", None))
+
+
+def distribution_point(user_pool):
+    """
+    Return the DISTRIBUTION_COLUMNS of user_pool : Gini coefficients and
+    percentiles, from one histogram per field
+    """
+    total_accumulated = histogram_of(user_pool, "total_accumulated")
+    guzi_wallet = histogram_of(user_pool, "guzi_wallet")
+    daily = histogram_of(user_pool, "daily_guzis")
+    return {
+        "gini_total_accumulated": total_accumulated.gini(),
+        "gini_guzi_wallet": guzi_wallet.gini(),
+        "daily_guzis_p10": daily.quantile(0.1),
+        "daily_guzis_p50": daily.quantile(0.5),
+        "daily_guzis_p90": daily.quantile(0.9),
+        "guzi_wallet_p50": guzi_wallet.quantile(0.5),
+        "guzi_wallet_p90": guzi_wallet.quantile(0.9),
+    }
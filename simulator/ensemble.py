@@ -0,0 +1,175 @@
+import collections
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+
+from .models import Simulator, SimpleYearlyDeathGod, CompanyGenerator, RandomTrader
+from .plotting import GrapheDrawer, pyplot, save_figure
+from .population import Population
+from .cohorts import CohortPopulation, CohortRandomTrader
+from .demography import AgeDeathGod, DailyDeathGod
+from .profiling import phase
+from .sharding import ShardedPopulation, ShardedRandomTrader
+from .trading import BatchRandomTrader
+
+
+# Parameters of one ensemble member run. See run_member.
+Scenario = collections.namedtuple(
+    "Scenario",
+    "user_count days frequency start_date birthdate mortality company_count trade",
+    defaults=(date(2020, 1, 1), date(2010, 1, 1), "simple", 0, False))
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def death_god_of(mortality, rng=None):
+    """
+    Return the death god of mortality "simple", "daily" or "age"
+    """
+    if mortality == "age":
+        return AgeDeathGod(rng)
+    if mortality == "daily":
+        return DailyDeathGod()
+    return SimpleYearlyDeathGod()
+
+
+def random_trader(user_pool, company_pool=[], rng=None):
+    """
+    Return the random trader of the engine of user_pool. Companies only
+    trade with a population.Population or a list of users.
+    """
+    if isinstance(user_pool, ShardedPopulation):
+        return ShardedRandomTrader(user_pool, rng)
+    if isinstance(user_pool, CohortPopulation):
+        return CohortRandomTrader(user_pool, rng)
+    if isinstance(user_pool, list):
+        return RandomTrader(user_pool, company_pool, rng)
+    return BatchRandomTrader(user_pool, company_pool, rng)
+
+
+def schedule_run(simulator, death_god, sample, frequency, trader=None, first_day=0):
+    """
+    Schedule the events of a run on simulator : births and deaths by
+    death_god once a year (every day for a DailyDeathGod), sample(simulator)
+    every frequency days and, if trader is given, a day of trades before
+    each new_day. first_day is the number of days simulated before, by a
+    run resumed from a checkpoint, so that events keep their dates.
+    """
+    start = simulator.current_date
+    # First date of an event run every `every` days since the first day
+    first_date = lambda every: start + timedelta(days=-first_day % every)
+
+    def demography(simulator):
+        with phase(simulator.profiler, "births"):
+            simulator.user_pool = death_god.give_birth(
+                simulator.user_pool, simulator.current_date, simulator.rngs["demography"])
+        with phase(simulator.profiler, "deaths"):
+            if isinstance(death_god, AgeDeathGod):
+                simulator.user_pool = death_god.give_death(simulator.user_pool, simulator.current_date)
+            else:
+                simulator.user_pool = death_god.give_death(simulator.user_pool)
+
+    def trade(simulator):
+        # Yearly deaths give a new list of users to the objects engine
+        trader.user_pool = simulator.user_pool
+        with phase(simulator.profiler, "trade"):
+            trader.trade_guzis()
+            if len(getattr(trader, "company_pool", [])) > 0:
+                trader.trade_guzas()
+
+    demography_every = 1 if isinstance(death_god, DailyDeathGod) else 365
+    simulator.schedule(demography, first_date(demography_every), demography_every, priority=1)
+    simulator.schedule(sample, first_date(frequency), frequency, priority=2)
+    if trader is not None:
+        simulator.schedule(trade, start, 1, priority=3)
+
+
+def run_member(scenario, seed):
+    """
+    Run one simulation of scenario, seeded with given seed (int or
+    SeedSequence), and return its graph points. Users are born at
+    scenario.birthdate and the run is scheduled like simulator.py ones
+    (see schedule_run) : users only trade if scenario.trade.
+    """
+    simulator = Simulator(scenario.start_date, Population(), seed=seed)
+    simulator.user_pool.add_numbered_users(scenario.user_count, scenario.birthdate)
+    death_god = death_god_of(scenario.mortality, simulator.rngs["demography"])
+    company_pool = CompanyGenerator.create_company_pool(
+        scenario.company_count, simulator.user_pool, simulator.rngs["companies"])
+    trader = None
+    if scenario.trade:
+        trader = random_trader(simulator.user_pool, company_pool, simulator.rngs["trading"])
+    graph_drawer = GrapheDrawer(simulator)
+
+    schedule_run(simulator, death_god, lambda simulator: graph_drawer.add_point(), scenario.frequency, trader)
+    simulator.run(scenario.days)
+    graph_drawer.add_point()
+    return graph_drawer.points
+
+
+class EnsembleResult:
+    """
+    Graph points of every member, combined per series into mean and
+    percentile bands
+    """
+    def __init__(self, members, percentiles=DEFAULT_PERCENTILES):
+        self.members = members
+        self.percentiles = percentiles
+        self.dates = members[0]["date"]
+        self.series = {}
+        for name in members[0]:
+            if name == "date":
+                continue
+            values = np.array([m[name] for m in members], dtype=np.float64)
+            self.series[name] = {"mean": values.mean(axis=0)}
+            for p, band in zip(percentiles, np.percentile(values, percentiles, axis=0)):
+                self.series[name]["p{}".format(p)] = band
+
+    def draw(self, y_names):
+        """
+        Draw the mean of each y_names series with its percentile bands, one
+        chart per series in a single pyplot figure, and return pyplot
+        """
+        plt = pyplot()
+        self._plot(plt.figure(), y_names)
+        return plt
+
+    def save(self, y_names, path):
+        """
+        Same as draw, in a .png or .svg file
+        """
+        save_figure(lambda fig: self._plot(fig, y_names), path)
+
+    def _plot(self, fig, y_names):
+        axes = fig.subplots(len(y_names), 1, sharex=True, squeeze=False)
+        lower, upper = len(self.percentiles) // 2, len(self.percentiles) - 1
+        for ax, name in zip(axes[:, 0], y_names):
+            series = self.series[name]
+            for i in range(lower):
+                ax.fill_between(
+                    self.dates,
+                    series["p{}".format(self.percentiles[i])],
+                    series["p{}".format(self.percentiles[upper - i])],
+                    color="b", alpha=0.15 * (i + 1), linewidth=0)
+            ax.plot(self.dates, series["mean"], "b-", label="mean")
+            ax.set_ylabel(name)
+        axes[-1, 0].set_xlabel("date")
+        fig.autofmt_xdate()
+        fig.suptitle("{} runs".format(len(self.members)))
+
+
+def run_ensemble(scenario, runs, seed=None, workers=None, percentiles=DEFAULT_PERCENTILES):
+    """
+    Run runs independently seeded members of scenario on a pool of workers
+    processes (all cores by default, in process if workers=1).
+    Members seeds are spawned from seed, so results only depend on seed
+    and runs, not on workers.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(runs)
+    if workers == 1:
+        members = [run_member(scenario, s) for s in seeds]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            members = list(executor.map(run_member, [scenario] * runs, seeds))
+    return EnsembleResult(members, percentiles)
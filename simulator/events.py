@@ -0,0 +1,69 @@
+import heapq
+import itertools
+from datetime import timedelta
+
+
+class Event:
+    """
+    An action scheduled on a date, again every `every` days if given
+    """
+    __slots__ = ("date", "action", "every", "priority", "cancelled")
+
+    def __init__(self, date, action, every=None, priority=0):
+        if every is not None and every < 1:
+            raise ValueError("Events can't repeat more than once a day")
+        self.date = date
+        self.action = action
+        self.every = every
+        self.priority = priority
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler:
+    """
+    A priority queue of Events ordered by date, then priority (lowest
+    first), then scheduling order
+    """
+    def __init__(self):
+        self._queue = []
+        self._order = itertools.count()
+
+    def __len__(self):
+        return sum(1 for entry in self._queue if not entry[-1].cancelled)
+
+    def _push(self, event):
+        heapq.heappush(self._queue, (event.date, event.priority, next(self._order), event))
+
+    def schedule(self, date, action, every=None, priority=0):
+        """
+        Schedule action on date, and every `every` days after it if given.
+        Return the Event, which can be cancelled.
+        """
+        event = Event(date, action, every, priority)
+        self._push(event)
+        return event
+
+    def next_date(self):
+        """
+        Return the date of the next event, None if there is none
+        """
+        while self._queue and self._queue[0][-1].cancelled:
+            heapq.heappop(self._queue)
+        return self._queue[0][0] if self._queue else None
+
+    def run_due(self, date, *args):
+        """
+        Run action(*args) of the events due on date or before, including
+        the ones they schedule for date, and schedule their next occurrence
+        """
+        while self._queue and self._queue[0][0] <= date:
+            event = heapq.heappop(self._queue)[-1]
+            if event.cancelled:
+                continue
+            event.action(*args)
+            if event.every is not None and not event.cancelled:
+                event.date += timedelta(days=event.every)
+                self._push(event)
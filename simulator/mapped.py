@@ -0,0 +1,159 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+from .distribution import LogHistogram
+from .population import Population, daily_guzis, update_day
+
+
+class MappedPopulation(Population):
+    """
+    A Population whose columns are memory-mapped .npy files in directory
+    path, updated chunk_size rows at a time : the memory used by new_day,
+    remove and the totals only depends on chunk_size, so populations larger
+    than memory can run, with the same results as a Population.
+    Users are numbered : ids are integers, and add_cohort(count, birthdate)
+    adds numbered users, so that death gods give birth to them without
+    generating ids (anonymous_births). Guzis expire by capping wallets (no
+    exact_expiry).
+    Trading still works on whole columns.
+    """
+    COLUMNS = dict(Population.COLUMNS, ids=(np.int64, -1))
+    anonymous_births = True
+
+    def __init__(self, path, capacity=1024, chunk_size=1 << 20):
+        super().__init__(capacity=1)
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.path = path
+        self.chunk_size = chunk_size
+        self._capacity = max(capacity, 1)
+        os.makedirs(path, exist_ok=True)
+        self._arrays = {
+            name: self._open(name, dtype, self._capacity)
+            for name, (dtype, fill) in self.COLUMNS.items()
+        }
+        self._positions = self._open("positions", np.int64, self._capacity)
+        self._positions[:] = -1
+
+    def _open(self, name, dtype, capacity):
+        return np.lib.format.open_memmap(os.path.join(self.path, name + ".npy"), "w+", dtype, (capacity,))
+
+    def _grow(self, array, size, capacity, dtype, fill):
+        """
+        Copy array to a larger file, chunk by chunk, in place of its file
+        """
+        file_name = array.filename
+        grown = np.lib.format.open_memmap(file_name + ".tmp", "w+", dtype, (capacity,))
+        for start, stop in self._chunks(size):
+            grown[start:stop] = array[start:stop]
+        grown[size:] = fill
+        grown.flush()
+        del grown
+        os.replace(file_name + ".tmp", file_name)
+        return np.load(file_name, mmap_mode="r+")
+
+    def _chunks(self, stop=None, start=0):
+        """
+        Return (start, stop) bounds of the chunks of rows from start to stop
+        (the population size by default)
+        """
+        stop = self.size if stop is None else stop
+        return [(s, min(s + self.chunk_size, stop)) for s in range(start, stop, self.chunk_size)]
+
+    def _rows(self, start, stop):
+        """
+        Return the FIELDS of rows start to stop as attributes, for update_day
+        """
+        return SimpleNamespace(**{name: self._arrays[name][start:stop] for name in self.FIELDS})
+
+    def _add_rows(self, count):
+        """
+        Same as Population._add_rows, writing keys and positions chunk by
+        chunk
+        """
+        self._reserve(count)
+        rows = slice(self.size, self.size + count)
+        for start, stop in self._chunks(rows.stop, rows.start):
+            keys = np.arange(self._next_key, self._next_key + stop - start)
+            self._arrays["keys"][start:stop] = keys
+            self._positions[keys] = np.arange(start, stop)
+            self._next_key += stop - start
+        self.size += count
+        return rows
+
+    def add_numbered_users(self, count, birthdate):
+        rows = self._add_rows(count)
+        for start, stop in self._chunks(rows.stop, rows.start):
+            self._arrays["ids"][start:stop] = self._arrays["keys"][start:stop]
+        self._add_blank_users(rows, birthdate)
+
+    def add_cohort(self, count, birthdate):
+        self.add_numbered_users(count, birthdate)
+
+    def remove(self, indices):
+        """
+        Remove users at given rows, keeping the order of the others : the
+        following rows move up chunk by chunk
+        """
+        indices = np.sort(np.asarray(indices, dtype=np.int64))
+        if len(indices) == 0:
+            return
+        keep = np.ones(len(indices), dtype=bool)
+        keep[1:] = indices[1:] != indices[:-1]
+        indices = indices[keep]
+        self._positions[self.keys[indices]] = -1
+        self.guzis_on_road -= int(self.guzi_wallet[indices].sum())
+        self.daily_guzis_total -= int(daily_guzis(self.total_accumulated[indices]).sum())
+        write = int(indices[0])
+        for start, stop in self._chunks(start=write):
+            keep = np.ones(stop - start, dtype=bool)
+            keep[indices[np.searchsorted(indices, start):np.searchsorted(indices, stop)] - start] = False
+            kept = int(keep.sum())
+            for name in self.COLUMNS:
+                array = self._arrays[name]
+                array[write:write + kept] = array[start:stop][keep]
+            self._positions[self._arrays["keys"][write:write + kept]] = np.arange(write, write + kept)
+            write += kept
+        for name, (dtype, fill) in self.COLUMNS.items():
+            self._arrays[name][write:self.size] = fill
+        self.size = write
+
+    def _computed_totals(self):
+        guzis_on_road = daily_guzis_total = 0
+        for start, stop in self._chunks():
+            guzis_on_road += int(self._arrays["guzi_wallet"][start:stop].sum())
+            daily_guzis_total += int(daily_guzis(self._arrays["total_accumulated"][start:stop]).sum())
+        return guzis_on_road, daily_guzis_total
+
+    def histogram(self, name):
+        """
+        Return the distribution.LogHistogram of field name (a column, or
+        daily_guzis), chunk by chunk
+        """
+        histogram = LogHistogram()
+        column = "total_accumulated" if name == "daily_guzis" else name
+        for start, stop in self._chunks():
+            values = self._arrays[column][start:stop]
+            histogram.add(daily_guzis(values) if name == "daily_guzis" else values)
+        return histogram
+
+    def flush(self):
+        """
+        Write changed pages of every column to disk
+        """
+        for array in list(self._arrays.values()) + [self._positions]:
+            array.flush()
+
+    def new_day(self, date, profiler=None):
+        """
+        Same as Population.new_day, one chunk of rows at a time
+        """
+        created_total = outdated_total = 0
+        for start, stop in self._chunks():
+            created, outdated = update_day(self._rows(start, stop), profiler)
+            created_total += int(created.sum())
+            outdated_total += int(outdated.sum())
+        self.daily_guzis_total = created_total
+        self.guzis_on_road += created_total - outdated_total
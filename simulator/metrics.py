@@ -0,0 +1,218 @@
+import csv
+import glob
+import os
+from abc import ABC, abstractmethod
+from datetime import date
+
+import numpy as np
+
+
+class MetricsSink(ABC):
+    """
+    Receive graph points (dicts of column => value) one by one
+    """
+    @abstractmethod
+    def write(self, point):
+        pass
+
+    @abstractmethod
+    def read(self):
+        """
+        Return all written points as a dict of column => list of values
+        """
+
+    def close(self):
+        pass
+
+
+class MemorySink(MetricsSink):
+    """
+    Keep every point in memory
+    """
+    def __init__(self, points=None):
+        self.points = {} if points is None else points
+
+    def write(self, point):
+        for column, value in point.items():
+            self.points.setdefault(column, []).append(value)
+
+    def read(self):
+        return self.points
+
+
+class CsvSink(MetricsSink):
+    """
+    Append points to a CSV file, flushed every chunk_size points so that a
+    crash loses at most one chunk.
+    With resume_date, the points of the file before resume_date are kept
+    and the new ones appended after them.
+    """
+    def __init__(self, path, chunk_size=100, resume_date=None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.writer = None
+        self.pending = 0
+        if resume_date is not None and os.path.exists(path):
+            fieldnames = _truncate_csv(path, resume_date)
+            self.file = open(path, "a", newline="")
+            if fieldnames:
+                self.writer = csv.DictWriter(self.file, fieldnames=fieldnames)
+        else:
+            self.file = open(path, "w", newline="")
+
+    def write(self, point):
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.file, fieldnames=list(point))
+            self.writer.writeheader()
+        self.writer.writerow({
+            column: value.isoformat() if isinstance(value, date) else value
+            for column, value in point.items()
+        })
+        self.pending += 1
+        if self.pending >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        self.file.flush()
+        self.pending = 0
+
+    def read(self):
+        if not self.file.closed:
+            self.flush()
+        return read_csv_points(self.path)
+
+    def close(self):
+        self.file.close()
+
+
+class NpzSink(MetricsSink):
+    """
+    Save points in a directory, as one .npz file of arrays per chunk of
+    chunk_size points.
+    With resume_date, the chunks of points before resume_date are kept and
+    the new chunks numbered after them.
+    """
+    def __init__(self, path, chunk_size=1000, resume_date=None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.chunk = MemorySink()
+        self.chunk_count = 0
+        os.makedirs(path, exist_ok=True)
+        resuming = resume_date is not None
+        for old_chunk in sorted(glob.glob(os.path.join(path, "points_*.npz"))):
+            if resuming:
+                resuming = _truncate_npz(old_chunk, resume_date)
+                self.chunk_count += os.path.exists(old_chunk)
+            else:
+                os.remove(old_chunk)
+
+    def write(self, point):
+        self.chunk.write(point)
+        if len(next(iter(self.chunk.points.values()))) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if len(self.chunk.points) == 0:
+            return
+        arrays = {
+            column: np.array(values, dtype="datetime64[D]") if isinstance(values[0], date) else np.array(values)
+            for column, values in self.chunk.points.items()
+        }
+        np.savez(os.path.join(self.path, "points_{:06d}.npz".format(self.chunk_count)), **arrays)
+        self.chunk_count += 1
+        self.chunk = MemorySink()
+
+    def read(self):
+        """
+        Return the points of the saved chunks then of the current one, kept
+        in memory : reading doesn't save a chunk before it is full
+        """
+        points = read_npz_points(self.path)
+        for column, values in self.chunk.read().items():
+            points.setdefault(column, []).extend(values)
+        return points
+
+    def close(self):
+        self.flush()
+
+
+def _truncate_csv(path, resume_date):
+    """
+    Remove the rows of CSV file path dated resume_date or later, and return
+    its columns
+    """
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    if not rows:
+        return None
+    date_column = rows[0].index("date")
+    kept = [row for row in rows[1:] if date.fromisoformat(row[date_column]) < resume_date]
+    with open(path + ".tmp", "w", newline="") as f:
+        csv.writer(f).writerows([rows[0]] + kept)
+    os.replace(path + ".tmp", path)
+    return rows[0]
+
+
+def _truncate_npz(path, resume_date):
+    """
+    Remove the points of .npz chunk path dated resume_date or later. Return
+    whether the whole chunk is before resume_date, False if it was cut.
+    """
+    with np.load(path) as arrays:
+        columns = {column: arrays[column] for column in arrays.files}
+    kept = columns["date"] < np.datetime64(resume_date, "D")
+    if kept.all():
+        return True
+    if kept.any():
+        np.savez(path, **{column: values[kept] for column, values in columns.items()})
+    else:
+        os.remove(path)
+    return False
+
+
+def _parse_csv_value(column, value):
+    if column == "date":
+        return date.fromisoformat(value)
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def read_csv_points(path):
+    points = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            for column, value in row.items():
+                points.setdefault(column, []).append(_parse_csv_value(column, value))
+    return points
+
+
+def read_npz_points(path):
+    points = {}
+    for chunk in sorted(glob.glob(os.path.join(path, "points_*.npz"))):
+        with np.load(chunk) as arrays:
+            for column in arrays.files:
+                points.setdefault(column, []).extend(arrays[column].tolist())
+    return points
+
+
+def open_sink(path, chunk_size=None, resume_date=None):
+    """
+    Return a CsvSink for a .csv path, a NpzSink (directory) otherwise.
+    With resume_date, the points already in path before resume_date are
+    kept, for a simulation resumed at that date.
+    """
+    sink_class = CsvSink if path.endswith(".csv") else NpzSink
+    if chunk_size is None:
+        return sink_class(path, resume_date=resume_date)
+    return sink_class(path, chunk_size, resume_date)
+
+
+def read_points(path):
+    """
+    Read back points written by open_sink(path)
+    """
+    if path.endswith(".csv"):
+        return read_csv_points(path)
+    return read_npz_points(path)
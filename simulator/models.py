@@ -1,34 +1,213 @@
+import collections
+import collections.abc
+import sys
 import uuid
 from datetime import date, timedelta
-import matplotlib.pyplot as plt
 import random
-from pylab import array
+import numpy as np
 
 from guzi.models import User, GuziCreator, Company, DefaultEngagedStrategy
 
-def random_date(start, end):
+from .events import Scheduler
+from .profiling import phase
+# GrapheDrawer used to live here
+from .plotting import GrapheDrawer
+
+# Random helpers : they draw from the given numpy Generator rng, or from
+# the global random module if rng is None
+
+def _randrange(start, stop, rng=None):
+    if rng is None:
+        return random.randrange(start, stop)
+    return int(rng.integers(start, stop))
+
+
+def _choice(seq, rng=None):
+    if rng is None:
+        return random.choice(seq)
+    return seq[int(rng.integers(len(seq)))]
+
+
+# total_accumulated values whose daily guzis are read from a table
+DAILY_GUZIS_TABLE_SIZE = 1 << 16
+_daily_guzis_table = None
+
+
+def get_daily_guzis_table():
+    """
+    Return the list of daily guzis of each total_accumulated below
+    DAILY_GUZIS_TABLE_SIZE, built with the formula itself
+    """
+    global _daily_guzis_table
+    if _daily_guzis_table is None:
+        _daily_guzis_table = [int(t ** (1/3) + 1) for t in range(DAILY_GUZIS_TABLE_SIZE)]
+    return _daily_guzis_table
+
+
+def daily_guzis_of(total_accumulated):
+    """
+    Return int(total_accumulated ** (1/3) + 1), the daily guzis of a user
+    """
+    if total_accumulated < DAILY_GUZIS_TABLE_SIZE:
+        return get_daily_guzis_table()[total_accumulated]
+    return int(total_accumulated ** (1/3) + 1)
+
+
+def _sample(population, k, rng=None):
+    if rng is None:
+        return random.sample(population, k=k)
+    return [population[i] for i in rng.choice(len(population), size=k, replace=False)]
+
+
+def random_uuid(rng=None):
+    """
+    Return a random uuid4 string
+    """
+    if rng is None:
+        return str(uuid.uuid4())
+    return str(uuid.UUID(bytes=rng.bytes(16), version=4))
+
+
+def random_date(start, end, rng=None):
     """
     This function will return a random datetime between two datetime objects.
     """
     delta = end - start
     int_delta = (delta.days * 24 * 60 * 60) + delta.seconds
-    random_second = random.randrange(int_delta)
+    random_second = _randrange(0, int_delta, rng)
     return start + timedelta(seconds=random_second)
 
 
-class SimpleUser(User):
-    """A User but light in memory usage"""
+def pay_guzis(source, target, amount, create=GuziCreator.create_guzi):
+    """
+    Pay amount Guzis of source to target.
+    Simple entities only count what they receive, so they are paid with
+    pay_count and no Guzi is created. Other targets (like guzi.models.User)
+    are paid with a list of Guzis made by create.
+    """
+    if hasattr(target, "pay_count"):
+        target.pay_count(amount)
+    else:
+        target.pay([create(source, date(2000, 1, 1), i) for i in range(amount)])
+
+
+class Balance(collections.abc.MutableMapping):
+    """
+    dict-like access to the income and outcome fields of a SimpleUser, as
+    the balance of a guzi.models.User
+    """
+    __slots__ = ("user",)
+    KEYS = ("income", "outcome")
+
+    def __init__(self, user):
+        self.user = user
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self.user, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        setattr(self.user, key, value)
+        if key == "income":
+            self.user.touch()
+
+    def __delitem__(self, key):
+        raise TypeError("Balance keys can't be deleted")
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class SimpleUser:
+    """
+    A User but light in memory usage : Guzis are counted instead of
+    listed, and fields are slots, so a user takes 112 bytes (on 64 bits
+    CPython) instead of about 330 with a __dict__ and a balance dict.
+    It has the methods of guzi.models.User, and balance is still a
+    mapping of income and outcome. String ids are interned, integer ids
+    are the smallest.
+    dirty_set is the set of users paid since the last day of the Simulator
+    holding the user (None out of a Simulator) : paiements and balance
+    writes add the user to it. Code writing income directly must call
+    touch().
+    total_accumulated is a property caching the daily guzis of the user,
+    so that daily_guzis() is only computed again when total_accumulated
+    changes.
+    """
+    __slots__ = (
+        "id",
+        "birthdate",
+        "guzi_wallet",
+        "guza_wallet",
+        "_total_accumulated",
+        "guza_trashbin",
+        "income",
+        "outcome",
+        "dirty_set",
+        "_daily_guzis",
+    )
+
+    age = User.age
+    _is_guzi = User._is_guzi
+    _is_guza = User._is_guza
+
     def __init__(self, id, birthdate):
-        self.id = id
+        self.id = sys.intern(id) if type(id) is str else id
         self.birthdate = birthdate
         self.guzi_wallet = 0
         self.guza_wallet = 0
         self.total_accumulated = 0
         self.guza_trashbin = 0
-        self.balance = {"income": 0, "outcome": 0}
+        self.income = 0
+        self.outcome = 0
+        self.dirty_set = None
+
+    def __getstate__(self):
+        # The dirty set belongs to the Simulator
+        return {name: getattr(self, name) for name in self.__slots__ if name != "dirty_set"}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.dirty_set = None
+
+    def touch(self):
+        """
+        Mark the user for check_balance at the next day of its Simulator
+        """
+        if self.dirty_set is not None:
+            self.dirty_set.add(self)
+
+    @property
+    def balance(self):
+        return Balance(self)
+
+    @balance.setter
+    def balance(self, balance):
+        self.income = balance["income"]
+        self.outcome = balance["outcome"]
+        self.touch()
+
+    @property
+    def total_accumulated(self):
+        return self._total_accumulated
+
+    @total_accumulated.setter
+    def total_accumulated(self, value):
+        self._total_accumulated = value
+        self._daily_guzis = daily_guzis_of(value)
 
     def daily_guzis(self):
-        return int(self.total_accumulated ** (1/3) + 1)
+        return self._daily_guzis
 
     def outdate(self, guzis):
         for guzi in guzis:
@@ -39,7 +218,12 @@ class SimpleUser(User):
                 self.guza_wallet -= 1
 
     def pay(self, guzis):
-        self.balance["income"] += len(guzis)
+        self.pay_count(len(guzis))
+
+    def pay_count(self, count):
+        self.income += count
+        if self.dirty_set is not None:
+            self.dirty_set.add(self)
 
     def spend_to(self, target, amount):
         if amount < 0:
@@ -49,7 +233,7 @@ class SimpleUser(User):
         if target is self:
             self.total_accumulated += amount
         else:
-            target.pay([GuziCreator.create_guzi(self, date(2000, 1, 1), i) for i in range(amount)])
+            pay_guzis(self, target, amount)
         self.guzi_wallet -= amount
 
     def give_guzas_to(self, target, amount):
@@ -59,14 +243,17 @@ class SimpleUser(User):
             raise ValueError("User cannot give this amount")
         if not isinstance(target, Company):
             raise ValueError("Can only give Guzas to Company, not {}".format(type(target)))
-        target.add_guzas([GuziCreator.create_guza(self, date(2000, 1, 1), i) for i in range(amount)])
+        if hasattr(target, "add_guza_count"):
+            target.add_guza_count(amount)
+        else:
+            target.add_guzas([GuziCreator.create_guza(self, date(2000, 1, 1), i) for i in range(amount)])
         self.guza_wallet -= amount
-        self.balance["outcome"] += amount
+        self.outcome += amount
 
     def check_balance(self):
-        difference = self.balance["income"] - self.balance["outcome"]
+        difference = self.income - self.outcome
         if difference > 0:
-            self.balance["income"] -= difference
+            self.income -= difference
             self.total_accumulated += difference
 
     def check_outdated_guzis(self, date):
@@ -96,49 +283,98 @@ class SimpleCompany(Company):
         self.sample_user = founders[0]
 
     def add_guzas(self, guzas):
-        self.guzi_wallet += len(guzas)
+        self.add_guza_count(len(guzas))
+
+    def add_guza_count(self, count):
+        self.guzi_wallet += count
+
+    def pay_count(self, count):
+        """
+        Same as DefaultEngagedStrategy.pay without creating Guzis : engaged
+        users get one Guzi each in arrival order, then founders share the
+        rest in turn
+        """
+        strategy = self.engaged_strategy
+        engaged_count = min(count, len(strategy.engaged_users))
+        receivers = collections.Counter(strategy.engaged_users[:engaged_count])
+        del strategy.engaged_users[:engaged_count]
+
+        founders_count = count - engaged_count
+        founders = strategy.founders
+        turns, remainder = divmod(founders_count, len(founders))
+        for i, founder_id in enumerate(founders):
+            receivers[founder_id] += turns
+            if (i - strategy.founders_index) % len(founders) < remainder:
+                receivers[founder_id] += 1
+        strategy.founders_index = (strategy.founders_index + founders_count) % len(founders)
+
+        for user_id, received in receivers.items():
+            if received > 0:
+                pay_guzis(self.sample_user, strategy.users[user_id], received, GuziCreator.create_guza)
 
     def spend_to(self, target, amount):
         if amount < 0:
             raise ValueError("Cannot spend negative amount")
         if amount > self.guzi_wallet:
             raise ValueError("User cannot pay this amount")
-        guzis = [GuziCreator.create_guza(self.sample_user, date(2000, 1, 1), i) for i in range(amount)]
-        target.pay(guzis)
+        pay_guzis(self.sample_user, target, amount, GuziCreator.create_guza)
         self.guzi_wallet -= amount
 
 
 class UserGenerator:
-    def generate_user(birthdate):
-        randId = str(uuid.uuid4())
+    """
+    Random ids and birthdates are drawn from rng (a numpy Generator) when
+    given, from the global random modules otherwise
+    """
+    def generate_user(birthdate, rng=None):
+        randId = random_uuid(rng)
 
         return SimpleUser(randId, birthdate)
 
-    def generate_users(birthdate, count):
-        return [UserGenerator.generate_user(birthdate) for _ in range(count)]
+    def generate_users(birthdate, count, rng=None):
+        return [UserGenerator.generate_user(birthdate, rng) for _ in range(count)]
 
-    def generate_random_user(min_birth=date(1940, 1, 1), max_birth=date.today()):
+    def generate_random_user(min_birth=date(1940, 1, 1), max_birth=date.today(), rng=None):
         """
         Return a User instance with random birthdate and random id
         """
-        randBirthdate = random_date(min_birth, max_birth)
+        randBirthdate = random_date(min_birth, max_birth, rng)
         
-        return UserGenerator.generate_user(randBirthdate)
+        return UserGenerator.generate_user(randBirthdate, rng)
+
+    def generate_random_adult_user(rng=None):
+        return UserGenerator.generate_random_user(date(1940, 1, 1), date.today()-18*timedelta(days=365, hours=6), rng)
 
-    def generate_random_adult_user():
-        return UserGenerator.generate_random_user(date(1940, 1, 1), date.today()-18*timedelta(days=365, hours=6))
+    def generate_birthdates(count, min_birth=date(1940, 1, 1), max_birth=date.today(), rng=None):
+        """
+        Return a datetime64[D] array of count random birthdates between
+        min_birth and max_birth, drawn at once from rng (a new numpy
+        Generator by default). See also demography.pyramid_birthdates.
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        days = rng.integers(0, (max_birth - min_birth).days, size=count)
+        return np.datetime64(min_birth, "D") + days
 
 
 class CompanyGenerator:
-    def create_company_pool(size, user_pool):
+    def create_company_pool(size, user_pool, rng=None):
         return [
             SimpleCompany("i",
-                [random.choice(user_pool) for _ in range(random.randrange(1, min(len(user_pool), 5)))]
+                [_choice(user_pool, rng) for _ in range(_randrange(1, min(len(user_pool), 5), rng))]
             )
             for i in range(size)
         ]
 
 
+def anonymous_births(population):
+    """
+    Return whether death gods add births to population without ids, with
+    population.add_cohort(count, birthdate) : pools declare it with their
+    anonymous_births attribute, lists of SimpleUser never do
+    """
+    return not isinstance(population, list) and population.anonymous_births
+
+
 class SimpleYearlyDeathGod:
     total_2019_population = 67028048
     total_2019_born = 758610
@@ -158,113 +394,82 @@ class SimpleYearlyDeathGod:
         """
         return int(self.total_2019_death * population_size / self.total_2019_population)
 
-    def give_birth(self, population, date=date.today()):
+    def give_birth(self, population, date=date.today(), rng=None):
         """
         Add to the list new users prorated to given population size
+        Pools with anonymous_births (like a cohorts.CohortPopulation) get them
+        as a single cohort.
         """
+        if anonymous_births(population):
+            population.add_cohort(self.how_much_born(len(population)), date)
+            return population
         for _ in range(self.how_much_born(len(population))):
-            population.append(UserGenerator.generate_user(date))
+            population.append(UserGenerator.generate_user(date, rng))
         return population
 
     def give_death(self, population):
         """
         return a list of users belonging to given population who should die
         Note : kill always the oldest, like a canicule or a coronavirus
+        A population.Population is updated in place, so that views on its
+        users (like company founders) stay valid.
         """
         death_count = self.how_much_die(len(population))
-        return population[death_count:]
-
-
-class GrapheDrawer:
-    """
-    Get informations from a Simulator and draw them with matplotlib
-    """
-    def __init__(self, simulator):
-        self.simulator = simulator
-        self.points = {
-            "date": [],
-            "user_count": [],
-            "average_daily_guzi": [],
-            "guzis_on_road": [],
-        }
-        self.to_draw = {"x": None, "y": []}
-        self.colors = ["b-", "r-", "g-", "y-", "o-"]
-
-
-    def add_point(self):
-        self.points["date"].append(self.simulator.current_date)
-        self.points["user_count"].append(len(self.simulator.user_pool))
-        self.points["average_daily_guzi"].append(sum([u.daily_guzis() for u in self.simulator.user_pool])/len(self.simulator.user_pool))
-        self.points["guzis_on_road"].append(sum([u.guzi_wallet for u in self.simulator.user_pool]))
-
-    def add_graph(self, x, y):
-        if self.to_draw["x"] is not None and x != self.to_draw["x"]:
-            raise ValueError("Cannot add different x ({} != {})".format(self.to_draw["x"], x))
-        self.to_draw["x"] = x
-        if y not in self.to_draw["y"]:
-            self.to_draw["y"].append(y)
-
-    def draw(self):
-        graph_count = len(self.to_draw["y"])
-        if self.to_draw["x"] is None:
-            raise ValueError("You need to set an 'x' using add_graph(x,y) before calling draw()")
-        if graph_count == 0:
-            raise ValueError("You need to set an 'y' using add_graph(x,y) before calling draw()")
-
-        fig, host = plt.subplots()
-        if graph_count > 2:
-            fig.subplots_adjust(right=0.75*(graph_count-2))
-
-        p, = host.plot(
-            self.points[self.to_draw["x"]],
-            self.points[self.to_draw["y"][0]],
-        self.colors[0], label=self.to_draw["y"][0])
-
-        host.set_xlabel(self.to_draw["x"])
-        host.set_ylabel(self.to_draw["y"][0])
-        host.yaxis.label.set_color(p.get_color())
-
-        for i in range(1, len(self.to_draw["y"])):
-            par = host.twinx()
-            par.spines["right"].set_position(("axes", 1 + 0.2*(i-1)))
-            p, = par.plot(
-                self.points[self.to_draw["x"]],
-                self.points[self.to_draw["y"][i]],
-                self.colors[i%len(self.colors)], label=self.to_draw["y"][i])
-            par.set_ylabel(self.to_draw["y"][i])
-            par.yaxis.label.set_color(p.get_color())
+        if isinstance(population, list):
+            return population[death_count:]
+        population.remove(range(death_count))
+        return population
 
+    def getstate(self):
+        """
+        Return the state of the death god to save in a checkpoint : none,
+        births and deaths only depend on the population
+        """
+        return {}
 
-        return plt
+    def setstate(self, state):
+        """
+        Restore a state returned by getstate()
+        """
+        for name, value in state.items():
+            setattr(self, name, value)
 
 
 class RandomTrader:
     """
-    Handle paiements between users randomly
+    Handle paiements between users randomly, drawn from rng (a numpy
+    Generator) if given, from the global random module otherwise.
+    Amounts are drawn in [1, wallet), so an entity needs at least two Guzis
+    (or Guzas) to pay : with a single one the range is empty, and
+    randrange(1, 1) would raise instead of skipping it.
     """
-    def __init__(self, user_pool, company_pool=[]):
+    def __init__(self, user_pool, company_pool=[], rng=None):
         self.user_pool = user_pool
         self.company_pool = company_pool
+        self.rng = rng
 
     def trade_guzis(self, k=0):
         """
         make paiements from k entities (user or company), default 0
-        If k=0, each entity makes a paiement <= it's wallet size
+        If k=0, each entity makes a paiement < it's wallet size
+        An entity with a single Guzi can't pay less than it's wallet size, so
+        it doesn't pay.
         """
         if len(self.user_pool) == 0:
             raise ValueError("Cannot trade guzis with empty user_pool")
         all_entities = self.user_pool + self.company_pool
         if k == 0:
             k = len(all_entities)
-        entities = random.sample(all_entities, k=k)
+        entities = _sample(all_entities, k, self.rng)
         for e in entities:
-            if e.guzi_wallet > 0:
-                e.spend_to(random.choice(all_entities), random.randrange(1, e.guzi_wallet))
+            # Amounts are below the wallet size : a single Guzi can't pay
+            if e.guzi_wallet > 1:
+                e.spend_to(_choice(all_entities, self.rng), _randrange(1, e.guzi_wallet, self.rng))
 
     def trade_guzas(self, k=0):
         """
         Give guzas from k users to companies in company_pool
-        If k=0, each user makes a give <= it's wallet size
+        If k=0, each user makes a give < it's wallet size
         """
         if len(self.user_pool) == 0:
             raise ValueError("Cannot trade guzas with empty user_pool")
@@ -272,19 +477,62 @@ class RandomTrader:
             raise ValueError("Cannot trade guzas with empty company_pool")
         if k == 0:
             k = len(self.user_pool)
-        users = random.sample(self.user_pool, k=k)
+        users = _sample(self.user_pool, k, self.rng)
         for u in users:
-            if u.guza_wallet > 0:
-                u.give_guzas_to(random.choice(self.company_pool), random.randrange(1, u.guza_wallet))
+            # Amounts are below the wallet size : a single Guza can't pay
+            if u.guza_wallet > 1:
+                u.give_guzas_to(_choice(self.company_pool, self.rng), _randrange(1, u.guza_wallet, self.rng))
 
 class Simulator:
     """
     Simulator handles user pool and passing days
+    user_pool is a list of SimpleUser by default. It can also be a
+    population.Population, then new_day updates all users at once and
+    metrics are read from its running totals.
+    With debug=True, running totals are checked against a full recompute
+    each time they are read. A list of users keeps no running totals : its
+    metrics are summed over all users on each read, in O(users).
+    seed (an int or a numpy SeedSequence) seeds one independent Generator
+    per random stream in rngs. spawn_seeds gives non-overlapping seeds
+    to parallel shards or ensemble members.
+    With a profiling.Profiler, new_day records the time spent in each of
+    its steps.
+    For a list of users, check_balance only runs on users paid since the
+    last day (dirty_users) : users of the list are given dirty_users as
+    their dirty_set, and all checked once, when the list is replaced.
+    Users appended to the list are found each day from its end, as the
+    users not tracked yet (whatever the list size, so births replacing as
+    many deaths are found too). Other changes to the list must call
+    track_users().
+    Recurring or one-off work (demography, sampling, checkpoints...) is
+    registered with schedule() and run by run().
     """
-    def __init__(self, start_date=date.today()):
+    STREAMS = ("demography", "trading", "companies")
+
+    def __init__(self, start_date=date.today(), user_pool=None, debug=False, seed=None, profiler=None):
         self.start_date = start_date
         self.current_date = start_date
-        self.user_pool = []
+        self.user_pool = [] if user_pool is None else user_pool
+        self.debug = debug
+        self.profiler = profiler
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+        self.rngs = {
+            name: np.random.default_rng(s)
+            for name, s in zip(self.STREAMS, self.seed_sequence.spawn(len(self.STREAMS)))
+        }
+        self.scheduler = Scheduler()
+        self.dirty_users = set()
+        self._tracked_pool = None
+
+    def spawn_seeds(self, count):
+        """
+        Return count SeedSequences independent from each other and from the
+        simulator streams
+        """
+        return self.seed_sequence.spawn(count)
 
     def add_user(self, user):
         self.user_pool.append(user)
@@ -293,13 +541,117 @@ class Simulator:
         for user in users:
             self.add_user(user)
 
+    def track_users(self):
+        """
+        Give dirty_users to all users of the list and mark them dirty
+        """
+        for user in self.user_pool:
+            user.dirty_set = self.dirty_users
+        self.dirty_users.update(self.user_pool)
+        self._tracked_pool = self.user_pool
+
+    def _track_new_users(self):
+        """
+        Track the users at the end of the list not tracked yet : it stops
+        at the first tracked user, so it costs O(new users)
+        """
+        new_users = []
+        for user in reversed(self.user_pool):
+            if user.dirty_set is self.dirty_users:
+                break
+            user.dirty_set = self.dirty_users
+            new_users.append(user)
+        self.dirty_users.update(new_users)
+
+    def _pop_dirty_users(self):
+        if self.user_pool is not self._tracked_pool:
+            self.track_users()
+        else:
+            self._track_new_users()
+        dirty_users = list(self.dirty_users)
+        self.dirty_users.clear()
+        return dirty_users
+
     def new_day(self):
         self.current_date += timedelta(days=1)
-        for user in self.user_pool:
-            user.check_balance()
-            user.check_outdated_guzis(self.current_date)
-            user.create_daily_guzis(self.current_date)
+        if not isinstance(self.user_pool, list):
+            self.user_pool.new_day(self.current_date, self.profiler)
+            return
+        # Users are independent, so each step can run on all of them in turn
+        with phase(self.profiler, "check_balance"):
+            for user in self._pop_dirty_users():
+                user.check_balance()
+        if self.profiler is None:
+            for user in self.user_pool:
+                user.check_outdated_guzis(self.current_date)
+                user.create_daily_guzis(self.current_date)
+            return
+        with phase(self.profiler, "check_outdated_guzis"):
+            for user in self.user_pool:
+                user.check_outdated_guzis(self.current_date)
+        with phase(self.profiler, "create_daily_guzis"):
+            for user in self.user_pool:
+                user.create_daily_guzis(self.current_date)
 
     def new_days(self, days):
         for i in range(days):
             self.new_day()
+
+    def schedule(self, action, first=None, every=None, priority=0):
+        """
+        Call action(simulator) on date first (current_date by default),
+        before the new_day of that date, and then every `every` days if
+        given. Events of a date run by priority (lowest first), then in
+        scheduling order. Return the events.Event, which can be cancelled.
+        """
+        return self.scheduler.schedule(self.current_date if first is None else first, action, every, priority)
+
+    def run(self, days):
+        """
+        Simulate days days, running the events due before each new_day.
+        Days without events are simulated in one go.
+        """
+        end = self.current_date + timedelta(days=days)
+        while self.current_date < end:
+            self.scheduler.run_due(self.current_date, self)
+            next_date = self.scheduler.next_date()
+            if next_date is None or next_date > end:
+                next_date = end
+            self.new_days(max((next_date - self.current_date).days, 1))
+
+    def _running_totals(self):
+        """
+        Return the user_pool if it keeps running totals, None otherwise
+        (for a list, whose sums need no cross-check)
+        """
+        if isinstance(self.user_pool, list):
+            return None
+        if self.debug:
+            self.user_pool.check_totals()
+        return self.user_pool
+
+    def user_count(self):
+        return len(self.user_pool)
+
+    def guzis_on_road(self):
+        """
+        Return the Guzis in all wallets : a running total for pools keeping
+        one (like a population.Population), a sum over every user of a list
+        """
+        totals = self._running_totals()
+        if totals is None:
+            return sum([u.guzi_wallet for u in self.user_pool])
+        return totals.guzis_on_road
+
+    def daily_guzis_total(self):
+        """
+        Return the Guzis all users create a day : a running total for pools
+        keeping one, a sum over every user of a list
+        """
+        totals = self._running_totals()
+        if totals is None:
+            return sum([u.daily_guzis() for u in self.user_pool])
+        return totals.daily_guzis_total
+
+    def average_daily_guzi(self):
+        return self.daily_guzis_total() / self.user_count()
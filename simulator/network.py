@@ -0,0 +1,159 @@
+import os
+
+import numpy as np
+
+from .trading import BatchRandomTrader
+
+
+class TradeNetwork:
+    """
+    Who can pay whom : an undirected graph between the users (nodes 0 to
+    user_count - 1, the rows of a Population) and the companies (the next
+    nodes, in company_pool order), stored as CSR arrays. The neighbours of
+    node i are indices[indptr[i]:indptr[i + 1]].
+    A network saved with save() can be loaded memory-mapped read-only :
+    worker processes then share its pages, and pickling it only sends its
+    path.
+    """
+    def __init__(self, indptr, indices, path=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.path = path
+
+    @classmethod
+    def from_edges(cls, node_count, sources, targets):
+        """
+        Build the network of given edges, in both directions. Self loops
+        and duplicate edges are dropped.
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if len(sources) and (min(sources.min(), targets.min()) < 0 or max(sources.max(), targets.max()) >= node_count):
+            raise ValueError("Edges must link nodes between 0 and {}".format(node_count - 1))
+        edges = np.sort(np.concatenate((sources * node_count + targets, targets * node_count + sources)))
+        keep = edges // node_count != edges % node_count
+        keep[1:] &= edges[1:] != edges[:-1]
+        edges = edges[keep]
+        indptr = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edges // node_count, minlength=node_count), out=indptr[1:])
+        dtype = np.int32 if node_count <= np.iinfo(np.int32).max else np.int64
+        return cls(indptr, (edges % node_count).astype(dtype))
+
+    @property
+    def node_count(self):
+        return len(self.indptr) - 1
+
+    def degrees(self):
+        return np.diff(self.indptr)
+
+    def neighbours(self, node):
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def save(self, path):
+        """
+        Save the CSR arrays in directory path
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "indptr.npy"), self.indptr)
+        np.save(os.path.join(path, "indices.npy"), self.indices)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Load a network saved with save(), memory-mapped read-only unless
+        mmap=False
+        """
+        mmap_mode = "r" if mmap else None
+        return cls(
+            np.load(os.path.join(path, "indptr.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, "indices.npy"), mmap_mode=mmap_mode),
+            path if mmap else None)
+
+    def __reduce__(self):
+        if self.path is not None:
+            return TradeNetwork.load, (self.path,)
+        return TradeNetwork, (self.indptr, self.indices)
+
+
+def local_edges(node_count, degree):
+    """
+    Return (sources, targets) linking each node to the degree // 2 next
+    nodes on a ring : neighbourhoods of nearby rows
+    """
+    half = min(degree // 2, (node_count - 1) // 2)
+    sources = np.repeat(np.arange(node_count, dtype=np.int64), half)
+    targets = (sources + np.tile(np.arange(1, half + 1), node_count)) % node_count
+    return sources, targets
+
+
+def preferential_edges(node_count, m, rng=None):
+    """
+    Return (sources, targets) of a preferential attachment (Barabási-Albert)
+    graph : nodes m to node_count - 1 come one after the other and link to
+    m earlier nodes, drawn proportionally to their degree. The first one
+    links to nodes 0 to m - 1.
+    Drawing an endpoint of an earlier edge uniformly draws a node with its
+    degree as weight. An endpoint which is itself a drawn target is
+    resolved by following the earlier edges, all at once.
+    """
+    if not 0 < m < node_count:
+        raise ValueError("m must be between 1 and node_count - 1")
+    rng = np.random.default_rng() if rng is None else rng
+    edge_count = (node_count - m) * m
+    edges = np.arange(edge_count, dtype=np.int64)
+    sources = m + edges // m
+    # Endpoint 2e is the source of edge e, endpoint 2e + 1 its target
+    endpoints = (rng.random(edge_count) * (2 * m * (edges // m))).astype(np.int64)
+    pointers = endpoints // 2
+    targets = np.where(endpoints % 2 == 0, sources[pointers], -1)
+    targets[:m] = np.arange(m)
+    pending = np.flatnonzero(targets < 0)
+    while len(pending):
+        pointed = pointers[pending]
+        resolved = targets[pointed] >= 0
+        targets[pending[resolved]] = targets[pointed[resolved]]
+        # Jump over the unresolved edges, halving the chains
+        pending = pending[~resolved]
+        pointers[pending] = pointers[pointed[~resolved]]
+    return sources, targets
+
+
+def company_edges(population, company_pool):
+    """
+    Return (sources, targets) linking each company of company_pool to its
+    founders, which must be users of population
+    """
+    sources, targets = [], []
+    for c, company in enumerate(company_pool):
+        strategy = company.engaged_strategy
+        rows = population.positions(np.array([strategy.users[f].key for f in strategy.founders], dtype=np.int64))
+        sources.append(rows)
+        targets.append(np.full(len(rows), len(population) + c, dtype=np.int64))
+    if not sources:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(sources), np.concatenate(targets)
+
+
+class NetworkTrader(BatchRandomTrader):
+    """
+    BatchRandomTrader where entities only pay their neighbours in a
+    TradeNetwork : each payer pays one of its neighbours drawn uniformly,
+    entities without neighbours don't pay. Guzas still go to any company.
+    Rows move when users die, so the network must be built again after
+    births and deaths.
+    """
+    def __init__(self, user_pool, network, company_pool=[], rng=None):
+        super().__init__(user_pool, company_pool, rng)
+        self.network = network
+
+    def _draw_trades(self, wallets, k):
+        if self.network.node_count != len(wallets):
+            raise ValueError("Network has {} nodes for {} users and companies".format(
+                self.network.node_count, len(wallets)))
+        payers, amounts = self._draw_payers(wallets, k)
+        starts = self.network.indptr[payers]
+        degrees = self.network.indptr[payers + 1] - starts
+        connected = degrees > 0
+        payers, amounts, starts = payers[connected], amounts[connected], starts[connected]
+        payees = self.network.indices[starts + self.rng.integers(0, degrees[connected])]
+        return payers, amounts, payees.astype(np.int64)
@@ -0,0 +1,181 @@
+from .decimation import MinMaxStream, decimate
+from .metrics import MemorySink
+
+
+# Plotting modules are imported on first drawing : the simulation core runs
+# without loading matplotlib or needing a display.
+
+def pyplot():
+    """
+    Return matplotlib.pyplot, for figures shown on screen
+    """
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def save_figure(plot, path):
+    """
+    Draw a figure with plot(figure) and save it to path, in the format of
+    its extension (like .png or .svg). The figure is not attached to any
+    display, so it works in headless jobs.
+    """
+    from matplotlib.figure import Figure
+    figure = Figure()
+    plot(figure)
+    figure.savefig(path)
+
+
+class GrapheDrawer:
+    """
+    Get informations from a Simulator and draw them with matplotlib
+    Points go to a metrics.MetricsSink : kept in memory by default, or
+    streamed to a file (see metrics.open_sink) for long runs.
+    With distributions=True, points also get the Gini coefficients and
+    percentiles of distribution.DISTRIBUTION_COLUMNS.
+    Series longer than max_points are decimated before drawing, with
+    decimation "lttb" or "minmax" (see decimation.decimate), or drawn whole
+    if decimation is None.
+    """
+    def __init__(self, simulator, sink=None, distributions=False, max_points=2000, decimation="lttb"):
+        self.simulator = simulator
+        self.max_points = max_points
+        self.decimation = decimation
+        self.live = None
+        self.lines = []
+        self.distribution_point = None
+        if distributions:
+            from .distribution import distribution_point
+            self.distribution_point = distribution_point
+        if sink is None:
+            sink = MemorySink({
+                "date": [],
+                "user_count": [],
+                "average_daily_guzi": [],
+                "guzis_on_road": [],
+            })
+        self.sink = sink
+        self.to_draw = {"x": None, "y": []}
+        self.colors = ["b-", "r-", "g-", "y-", "o-"]
+
+    @property
+    def points(self):
+        return self.sink.read()
+
+    def add_point(self):
+        point = {
+            "date": self.simulator.current_date,
+            "user_count": self.simulator.user_count(),
+            "average_daily_guzi": self.simulator.average_daily_guzi(),
+            "guzis_on_road": self.simulator.guzis_on_road(),
+        }
+        if self.distribution_point is not None:
+            point.update(self.distribution_point(self.simulator.user_pool))
+        self.sink.write(point)
+        if self.live is not None:
+            self.live["new_points"].write(point)
+
+    def add_graph(self, x, y):
+        if self.to_draw["x"] is not None and x != self.to_draw["x"]:
+            raise ValueError("Cannot add different x ({} != {})".format(self.to_draw["x"], x))
+        self.to_draw["x"] = x
+        if y not in self.to_draw["y"]:
+            self.to_draw["y"].append(y)
+
+    def _check_graphs(self):
+        if self.to_draw["x"] is None:
+            raise ValueError("You need to set an 'x' using add_graph(x,y) before calling draw()")
+        if len(self.to_draw["y"]) == 0:
+            raise ValueError("You need to set an 'y' using add_graph(x,y) before calling draw()")
+
+    def draw(self):
+        """
+        Draw the graphs in a pyplot figure and return pyplot
+        """
+        self._check_graphs()
+        plt = pyplot()
+        self._plot(plt.figure())
+        return plt
+
+    def draw_live(self):
+        """
+        Draw the graphs in an interactive pyplot figure, to be updated by
+        refresh() while points are added, and return pyplot
+        """
+        self._check_graphs()
+        plt = pyplot()
+        plt.ion()
+        figure = plt.figure()
+        # Points added from now on are kept for refresh(), so that it
+        # doesn't read the whole sink again
+        self.live = {"figure": figure, "new_points": MemorySink(), "streams": []}
+        self._plot(figure)
+        plt.pause(0.001)
+        return plt
+
+    def refresh(self):
+        """
+        Add the points written since last refresh to the live figure. Each
+        series is a decimation.MinMaxStream, so only new points are reduced.
+        """
+        if self.live is None:
+            raise ValueError("You need to call draw_live() before refresh()")
+        points = self.live["new_points"].read()
+        if len(points) == 0:
+            return
+        self.live["new_points"] = MemorySink()
+        for y, stream, (line, axis) in zip(self.to_draw["y"], self.live["streams"], self.lines):
+            stream.extend(points[self.to_draw["x"]], points[y])
+            line.set_data(*stream.data())
+            axis.relim()
+            axis.autoscale_view()
+        self.live["figure"].canvas.draw_idle()
+        pyplot().pause(0.001)
+
+    def _series(self, points, y):
+        """
+        Return the (x, y) values to draw for series y, decimated if too long
+        """
+        x_values, y_values = points[self.to_draw["x"]], points[y]
+        if self.live is not None:
+            stream = MinMaxStream(self.max_points)
+            stream.extend(x_values, y_values)
+            self.live["streams"].append(stream)
+            return stream.data()
+        if self.decimation is None:
+            return x_values, y_values
+        return decimate(x_values, y_values, self.max_points, self.decimation)
+
+    def save(self, path):
+        """
+        Draw the graphs in a .png or .svg file, without display
+        """
+        self._check_graphs()
+        save_figure(self._plot, path)
+
+    def _plot(self, fig):
+        graph_count = len(self.to_draw["y"])
+        points = self.points
+        host = fig.subplots()
+        if graph_count > 2:
+            fig.subplots_adjust(right=0.75*(graph_count-2))
+
+        p, = host.plot(
+            *self._series(points, self.to_draw["y"][0]),
+        self.colors[0], label=self.to_draw["y"][0])
+        self.lines = [(p, host)]
+
+        if self.to_draw["x"] == "date":
+            fig.autofmt_xdate()
+        host.set_xlabel(self.to_draw["x"])
+        host.set_ylabel(self.to_draw["y"][0])
+        host.yaxis.label.set_color(p.get_color())
+
+        for i in range(1, len(self.to_draw["y"])):
+            par = host.twinx()
+            par.spines["right"].set_position(("axes", 1 + 0.2*(i-1)))
+            p, = par.plot(
+                *self._series(points, self.to_draw["y"][i]),
+                self.colors[i%len(self.colors)], label=self.to_draw["y"][i])
+            self.lines.append((p, par))
+            par.set_ylabel(self.to_draw["y"][i])
+            par.yaxis.label.set_color(p.get_color())
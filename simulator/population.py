@@ -0,0 +1,612 @@
+from datetime import date
+
+import numpy as np
+
+from .models import SimpleUser, daily_guzis_of, get_daily_guzis_table
+from .profiling import phase
+
+
+# Days a Guzi (or Guza) stays in a wallet
+EXPIRY_DAYS = 30
+# Wallets with a creation count per day in Population(exact_expiry=True)
+SLOTTED_WALLETS = ("guzi_wallet", "guza_wallet")
+
+# Roots covered by the daily guzis thresholds table : total_accumulated up to
+# 2^15 ** 3 (~3.5e13) is resolved with a binary search, above it falls back
+# to the Python formula.
+DAILY_GUZIS_TABLE_ROOTS = 1 << 15
+_daily_guzis_thresholds = None
+_daily_guzis_array = None
+
+
+def _get_daily_guzis_thresholds():
+    """
+    Return the sorted array t_k of the smallest total_accumulated giving
+    k+1 daily guzis with SimpleUser.daily_guzis formula.
+    The formula uses floating pow, so t_k can be a few units above k^3 : we
+    search it exactly instead of trusting a vectorized cube root.
+    """
+    global _daily_guzis_thresholds
+    if _daily_guzis_thresholds is None:
+        thresholds = []
+        for k in range(1, DAILY_GUZIS_TABLE_ROOTS):
+            t = k ** 3
+            while int(t ** (1/3) + 1) < k + 1:
+                t += 1
+            while int((t - 1) ** (1/3) + 1) >= k + 1:
+                t -= 1
+            thresholds.append(t)
+        _daily_guzis_thresholds = np.array(thresholds, dtype=np.int64)
+    return _daily_guzis_thresholds
+
+
+def daily_guzis(total_accumulated):
+    """
+    Vectorized SimpleUser.daily_guzis : return int(total ** (1/3) + 1) for
+    each value of the given array, bit for bit.
+    Values below models.DAILY_GUZIS_TABLE_SIZE are read from its table, the
+    others are searched in the thresholds table.
+    """
+    global _daily_guzis_array
+    if _daily_guzis_array is None:
+        _daily_guzis_array = np.array(get_daily_guzis_table(), dtype=np.int64)
+    total_accumulated = np.asarray(total_accumulated, dtype=np.int64)
+    result = _daily_guzis_array[np.minimum(total_accumulated, len(_daily_guzis_array) - 1)]
+    large = total_accumulated >= len(_daily_guzis_array)
+    if large.any():
+        result[large] = _search_daily_guzis(total_accumulated[large])
+    return result
+
+
+def _search_daily_guzis(total_accumulated):
+    thresholds = _get_daily_guzis_thresholds()
+    result = np.searchsorted(thresholds, total_accumulated, side="right") + 1
+    overflow = total_accumulated >= thresholds[-1]
+    if overflow.any():
+        result[overflow] = [int(t ** (1/3) + 1) for t in total_accumulated[overflow].tolist()]
+    return result
+
+
+def update_day(columns, profiler=None):
+    """
+    Run check_balance, check_outdated_guzis and create_daily_guzis on the
+    income, outcome, total_accumulated, guzi_wallet, guza_wallet and
+    guza_trashbin arrays of columns, in place.
+    Return the arrays of created and outdated guzis of each row.
+    """
+    with phase(profiler, "check_balance"):
+        check_balance(columns)
+    with phase(profiler, "check_outdated_guzis"):
+        outdated = cap_outdated_guzis(columns)
+    with phase(profiler, "create_daily_guzis"):
+        created = create_daily_guzis(columns)
+    return created, outdated
+
+
+def check_balance(columns):
+    """
+    SimpleUser.check_balance : income above outcome goes to total_accumulated
+    """
+    income, total_accumulated = columns.income, columns.total_accumulated
+    difference = np.maximum(income - columns.outcome, 0)
+    income -= difference
+    total_accumulated += difference
+
+
+def cap_outdated_guzis(columns):
+    """
+    SimpleUser.check_outdated_guzis : wallets are capped to 30 days of
+    daily guzis. Return the outdated guzis of each row.
+    """
+    guzi_wallet, guza_wallet = columns.guzi_wallet, columns.guza_wallet
+    total_accumulated = columns.total_accumulated
+    max_guzis = daily_guzis(total_accumulated) * EXPIRY_DAYS
+    difference_guzi = np.maximum(guzi_wallet - max_guzis, 0)
+    difference_guza = np.maximum(guza_wallet - max_guzis, 0)
+    guzi_wallet -= difference_guzi
+    total_accumulated += difference_guzi
+    guza_wallet -= difference_guza
+    guza_trashbin = columns.guza_trashbin
+    guza_trashbin += difference_guza
+    return difference_guzi
+
+
+def create_daily_guzis(columns):
+    """
+    Add daily guzis and guzas to each row and return their number
+    """
+    number_of_guzis_to_add = daily_guzis(columns.total_accumulated)
+    columns.guzi_wallet[:] += number_of_guzis_to_add
+    columns.guza_wallet[:] += number_of_guzis_to_add
+    return number_of_guzis_to_add
+
+
+class UserView(SimpleUser):
+    """
+    A SimpleUser reading and writing its state in a row of a Population.
+    Views follow the user key, so they stay valid when other users are
+    removed. Reading a removed user raises ValueError, but paying it is
+    allowed : the Guzis are lost.
+    """
+    __slots__ = ("population", "key")
+
+    def __init__(self, population, key):
+        self.population = population
+        self.key = key
+
+    @property
+    def index(self):
+        index = int(self.population.positions(self.key))
+        if index < 0:
+            raise ValueError("User {} was removed from the population".format(self.key))
+        return index
+
+    @property
+    def removed(self):
+        return int(self.population.positions(self.key)) < 0
+
+    def _get(self, name):
+        return int(self.population._field(name)[self.index])
+
+    def _set(self, name, value):
+        self.population.set_value(self.index, name, value)
+
+    @property
+    def id(self):
+        return self.population.ids[self.index]
+
+    @property
+    def birthdate(self):
+        birthdate = self.population.birthdates[self.index]
+        if np.isnat(birthdate):
+            return None
+        return birthdate.astype(date)
+
+    guzi_wallet = property(
+        lambda self: self._get("guzi_wallet"),
+        lambda self, value: self._set("guzi_wallet", value))
+    guza_wallet = property(
+        lambda self: self._get("guza_wallet"),
+        lambda self, value: self._set("guza_wallet", value))
+    total_accumulated = property(
+        lambda self: self._get("total_accumulated"),
+        lambda self, value: self._set("total_accumulated", value))
+    guza_trashbin = property(
+        lambda self: self._get("guza_trashbin"),
+        lambda self, value: self._set("guza_trashbin", value))
+    income = property(
+        lambda self: self._get("income"),
+        lambda self, value: self._set("income", value))
+    outcome = property(
+        lambda self: self._get("outcome"),
+        lambda self, value: self._set("outcome", value))
+
+    # Population.new_day checks all users
+    dirty_set = None
+
+    def pay_count(self, count):
+        # Guzis paid to a removed user (like a dead company founder) are
+        # lost, as for a SimpleUser no longer in the list of users
+        if not self.removed:
+            super().pay_count(count)
+
+    def spend_to(self, target, amount):
+        # Two views of the same row are the same user : paying oneself
+        if isinstance(target, UserView) and target.population is self.population and target.key == self.key:
+            target = self
+        super().spend_to(target, amount)
+
+    def daily_guzis(self):
+        return daily_guzis_of(self.total_accumulated)
+
+    def __reduce__(self):
+        return UserView, (self.population, self.key)
+
+    def __eq__(self, other):
+        return (isinstance(other, UserView)
+            and other.population is self.population
+            and other.key == self.key)
+
+    def __hash__(self):
+        return hash((id(self.population), self.key))
+
+
+class Population:
+    """
+    A pool of users stored as parallel numpy arrays (struct of arrays).
+    It behaves like a list of SimpleUser (len, indexing, iteration, append)
+    but Simulator.new_day updates it with whole-array operations.
+    Rows move when users are removed, so each user also gets a stable key :
+    positions(keys) gives the current rows of given keys.
+    guzis_on_road and daily_guzis_total are running sums of guzi_wallet and
+    daily guzis, kept up to date by every Population method and UserView
+    write. Code writing the arrays directly must call recompute_totals().
+    By default Guzis expire like SimpleUser ones : wallets are capped to
+    30 days of daily guzis. With exact_expiry, slots keeps for each wallet
+    a ring buffer of the Guzis created on each of the last 30 days (one row
+    per day, one column per user), so that every Guzi expires 30 days
+    after its creation, as in python-guzi, and spends take the oldest
+    Guzis first. Code debiting wallets must then use debit().
+    """
+    FIELDS = (
+        "guzi_wallet",
+        "guza_wallet",
+        "total_accumulated",
+        "guza_trashbin",
+        "income",
+        "outcome",
+    )
+    # column name => (dtype, fill value of empty rows)
+    COLUMNS = dict(
+        ids=(object, None),
+        keys=(np.int64, -1),
+        birthdates=("datetime64[D]", np.datetime64("NaT")),
+        **{f: (np.int64, 0) for f in FIELDS}
+    )
+    # Births need ids (see models.anonymous_births)
+    anonymous_births = False
+
+    def __init__(self, capacity=1024, exact_expiry=False):
+        self.size = 0
+        self._capacity = max(capacity, 1)
+        self._arrays = {
+            name: np.full(self._capacity, fill, dtype=dtype)
+            for name, (dtype, fill) in self.COLUMNS.items()
+        }
+        self.slots = None
+        if exact_expiry:
+            self.slots = {name: np.zeros((EXPIRY_DAYS, self._capacity), dtype=np.int32) for name in SLOTTED_WALLETS}
+        # Ordinal of the last simulated day, None before the first one
+        self.day = None
+        # row of each key, -1 once removed
+        self._positions = np.full(self._capacity, -1, dtype=np.int64)
+        self._next_key = 0
+        self.guzis_on_road = 0
+        self.daily_guzis_total = 0
+
+    @classmethod
+    def from_arrays(cls, arrays, positions, slots=None, day=None):
+        """
+        Build a Population around existing column arrays (for example
+        memory-mapped ones) without copying them. positions gives the row of
+        each key ever given, -1 for removed ones. slots and day are the ones
+        of an exact_expiry Population.
+        Running totals must be set or recomputed by the caller.
+        """
+        population = cls(capacity=1)
+        population.size = len(arrays["keys"])
+        population._capacity = population.size
+        population._arrays = dict(arrays)
+        population._positions = positions
+        population._next_key = len(positions)
+        population.slots = None if slots is None else dict(slots)
+        population.day = day
+        return population
+
+    def _field(self, name):
+        return self._arrays[name][:self.size]
+
+    guzi_wallet = property(lambda self: self._field("guzi_wallet"))
+    guza_wallet = property(lambda self: self._field("guza_wallet"))
+    total_accumulated = property(lambda self: self._field("total_accumulated"))
+    guza_trashbin = property(lambda self: self._field("guza_trashbin"))
+    income = property(lambda self: self._field("income"))
+    outcome = property(lambda self: self._field("outcome"))
+    ids = property(lambda self: self._field("ids"))
+    keys = property(lambda self: self._field("keys"))
+    birthdates = property(lambda self: self._field("birthdates"))
+
+    @property
+    def next_key(self):
+        """
+        Key the next added user will get : keys are given in increasing order
+        """
+        return self._next_key
+
+    def _reserve(self, count):
+        """
+        Make room for count more users, doubling the capacity when needed
+        """
+        needed = self.size + count
+        if needed > self._capacity:
+            capacity = max(needed, 2 * self._capacity)
+            for name, (dtype, fill) in self.COLUMNS.items():
+                self._arrays[name] = self._grow(self._arrays[name], self.size, capacity, dtype, fill)
+            if self.slots is not None:
+                for name, slots in self.slots.items():
+                    grown = np.zeros((EXPIRY_DAYS, capacity), dtype=np.int32)
+                    grown[:, :self.size] = slots[:, :self.size]
+                    self.slots[name] = grown
+            self._capacity = capacity
+        needed_keys = self._next_key + count
+        if needed_keys > len(self._positions):
+            capacity = max(needed_keys, 2 * len(self._positions))
+            self._positions = self._grow(self._positions, self._next_key, capacity, np.int64, -1)
+
+    def _grow(self, array, size, capacity, dtype, fill):
+        """
+        Return a copy of array in memory with given capacity and dtype (so
+        arrays loaded from a checkpoint become writable objects again)
+        """
+        grown = np.full(capacity, fill, dtype=dtype)
+        grown[:size] = array[:size]
+        return grown
+
+    def _add_rows(self, count):
+        """
+        Add count blank rows with new keys and return their slice
+        """
+        self._reserve(count)
+        rows = slice(self.size, self.size + count)
+        keys = np.arange(self._next_key, self._next_key + count)
+        self._arrays["keys"][rows] = keys
+        self._positions[keys] = np.arange(rows.start, rows.stop)
+        self._next_key += count
+        self.size += count
+        return rows
+
+    def append(self, user):
+        """
+        Copy the state of given SimpleUser at the end of the Population
+        """
+        i = self._add_rows(1).start
+        self._arrays["ids"][i] = user.id
+        self._arrays["birthdates"][i] = np.datetime64("NaT") if user.birthdate is None else user.birthdate
+        for f in ("guzi_wallet", "guza_wallet", "total_accumulated", "guza_trashbin"):
+            self._arrays[f][i] = getattr(user, f)
+        self._arrays["income"][i] = user.balance["income"]
+        self._arrays["outcome"][i] = user.balance["outcome"]
+        if self.slots is not None:
+            for name in SLOTTED_WALLETS:
+                self.slots[name][self._newest_slot(), i] = getattr(user, name)
+        self.guzis_on_road += user.guzi_wallet
+        self.daily_guzis_total += user.daily_guzis()
+
+    def extend(self, users):
+        for user in users:
+            self.append(user)
+
+    def add_users(self, ids, birthdate):
+        """
+        Add one blank user per given id, born at given birthdate : a date
+        for all of them, or an array of one birthdate per user
+        """
+        rows = self._add_rows(len(ids))
+        self._arrays["ids"][rows] = ids
+        self._add_blank_users(rows, birthdate)
+
+    def add_numbered_users(self, count, birthdate):
+        """
+        Add count blank users whose ids are their keys, so that ids are
+        sequential. birthdate is a date or an array of count birthdates
+        (see UserGenerator.generate_birthdates). Ids and birthdates are
+        written as whole arrays, without any SimpleUser.
+        """
+        rows = self._add_rows(count)
+        self._arrays["ids"][rows] = self._arrays["keys"][rows]
+        self._add_blank_users(rows, birthdate)
+
+    def _add_blank_users(self, rows, birthdate):
+        self._arrays["birthdates"][rows] = np.datetime64("NaT") if birthdate is None else birthdate
+        # Blank users earn 1 Guzi a day
+        self.daily_guzis_total += rows.stop - rows.start
+
+    def positions(self, keys):
+        """
+        Return the current rows of users with given keys, -1 for removed ones
+        """
+        return self._positions[keys]
+
+    def remove(self, indices):
+        """
+        Remove users at given rows, keeping the order of the others
+        """
+        keep = np.ones(self.size, dtype=bool)
+        keep[indices] = False
+        self._positions[self.keys[~keep]] = -1
+        self.guzis_on_road -= int(self.guzi_wallet[~keep].sum())
+        self.daily_guzis_total -= int(daily_guzis(self.total_accumulated[~keep]).sum())
+        size = int(keep.sum())
+        for name in self.COLUMNS:
+            self._arrays[name][:size] = self._field(name)[keep]
+            self._arrays[name][size:self.size] = self.COLUMNS[name][1]
+        if self.slots is not None:
+            for slots in self.slots.values():
+                slots[:, :size] = slots[:, :self.size][:, keep]
+                slots[:, size:self.size] = 0
+        self.size = size
+        self._positions[self.keys] = np.arange(size)
+
+    def swap_remove(self, indices):
+        """
+        Remove users at given rows by moving the last users into them : the
+        cost only depends on the number of removed users, but the order of
+        the others changes
+        """
+        indices = np.sort(np.asarray(indices, dtype=np.int64))
+        if len(indices) == 0:
+            return
+        keep = np.ones(len(indices), dtype=bool)
+        keep[1:] = indices[1:] != indices[:-1]
+        indices = indices[keep]
+        size = self.size - len(indices)
+        self._positions[self.keys[indices]] = -1
+        self.guzis_on_road -= int(self.guzi_wallet[indices].sum())
+        self.daily_guzis_total -= int(daily_guzis(self.total_accumulated[indices]).sum())
+        # Last rows still used fill the removed rows before size
+        holes = indices[indices < size]
+        moved = np.ones(self.size - size, dtype=bool)
+        moved[indices[indices >= size] - size] = False
+        movers = np.arange(size, self.size)[moved]
+        for name, (dtype, fill) in self.COLUMNS.items():
+            array = self._arrays[name]
+            array[holes] = array[movers]
+            array[size:self.size] = fill
+        if self.slots is not None:
+            for slots in self.slots.values():
+                slots[:, holes] = slots[:, movers]
+                slots[:, size:self.size] = 0
+        self.size = size
+        self._positions[self._arrays["keys"][holes]] = holes
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.take(np.arange(self.size)[key])
+        if key < 0:
+            key += self.size
+        if not 0 <= key < self.size:
+            raise IndexError("Population index out of range")
+        return UserView(self, int(self.keys[key]))
+
+    def first_user(self):
+        """
+        Return a view of the living user with the smallest key, the first
+        one added : row 0 unless users were moved by swap_remove
+        """
+        if self.size == 0:
+            raise IndexError("Population is empty")
+        return UserView(self, int(self.keys.min()))
+
+    def __iter__(self):
+        for key in self.keys.tolist():
+            yield UserView(self, key)
+
+    def take(self, indices):
+        """
+        Return a new Population holding a copy of users at given indices.
+        Copied users get new keys.
+        """
+        population = Population(len(indices), exact_expiry=self.slots is not None)
+        rows = population._add_rows(len(indices))
+        for name in self.COLUMNS:
+            if name != "keys":
+                population._arrays[name][rows] = self._field(name)[indices]
+        if self.slots is not None:
+            for name, slots in self.slots.items():
+                population.slots[name][:, rows] = slots[:, :self.size][:, indices]
+            population.day = self.day
+        population.recompute_totals()
+        return population
+
+    def set_value(self, index, name, value):
+        """
+        Set the field name of user at given row, keeping running totals
+        """
+        array = self._field(name)
+        if self.slots is not None and name in SLOTTED_WALLETS:
+            change = value - int(array[index])
+            if change < 0:
+                self._spend_slots(name, np.array([index]), np.array([-change]))
+            else:
+                self.slots[name][self._newest_slot(), index] += change
+        if name == "guzi_wallet":
+            self.guzis_on_road += value - int(array[index])
+        elif name == "total_accumulated":
+            self.daily_guzis_total += daily_guzis_of(value) - daily_guzis_of(int(array[index]))
+        array[index] = value
+
+    def add_total_accumulated(self, indices, amounts):
+        """
+        Add amounts to total_accumulated of users at given distinct rows
+        """
+        total_accumulated = self.total_accumulated
+        before = daily_guzis(total_accumulated[indices])
+        total_accumulated[indices] += amounts
+        self.daily_guzis_total += int((daily_guzis(total_accumulated[indices]) - before).sum())
+
+    def debit(self, name, indices, amounts):
+        """
+        Take amounts from the name wallet (guzi_wallet or guza_wallet) of
+        users at given distinct rows, the oldest Guzis first
+        """
+        self._field(name)[indices] -= amounts
+        if name == "guzi_wallet":
+            self.guzis_on_road -= int(amounts.sum())
+        if self.slots is not None:
+            self._spend_slots(name, indices, amounts)
+
+    def _newest_slot(self):
+        """
+        Slot of the Guzis created on the last simulated day. Guzis added
+        before the first day go to the last slot.
+        """
+        return EXPIRY_DAYS - 1 if self.day is None else self.day % EXPIRY_DAYS
+
+    def _spend_slots(self, name, indices, amounts):
+        """
+        Remove amounts from the slots of users at given distinct rows,
+        oldest slots first
+        """
+        order = (self._newest_slot() + 1 + np.arange(EXPIRY_DAYS)) % EXPIRY_DAYS
+        slots = self.slots[name][order[:, None], indices]
+        spent_before = np.cumsum(slots, axis=0) - slots
+        slots -= np.clip(amounts - spent_before, 0, slots).astype(np.int32)
+        self.slots[name][order[:, None], indices] = slots
+
+    def _expire_slots(self, day):
+        """
+        Outdate the Guzis created 30 days or more before given day ordinal
+        and return the outdated guzis of each row
+        """
+        if self.day is None:
+            # Guzis added before the first day were created the day before
+            for slots in self.slots.values():
+                slots[[EXPIRY_DAYS - 1, (day - 1) % EXPIRY_DAYS]] = slots[[(day - 1) % EXPIRY_DAYS, EXPIRY_DAYS - 1]]
+            self.day = day - 1
+        expired = [(day - EXPIRY_DAYS - i) % EXPIRY_DAYS for i in range(min(day - self.day, EXPIRY_DAYS))]
+        outdated = {}
+        for name, slots in self.slots.items():
+            outdated[name] = slots[expired, :self.size].sum(axis=0, dtype=np.int64)
+            slots[expired, :self.size] = 0
+        self.guzi_wallet[:] -= outdated["guzi_wallet"]
+        self.total_accumulated[:] += outdated["guzi_wallet"]
+        self.guza_wallet[:] -= outdated["guza_wallet"]
+        self.guza_trashbin[:] += outdated["guza_wallet"]
+        return outdated["guzi_wallet"]
+
+    def recompute_totals(self):
+        self.guzis_on_road, self.daily_guzis_total = self._computed_totals()
+
+    def _computed_totals(self):
+        return int(self.guzi_wallet.sum()), int(self.daily_guzis().sum())
+
+    def check_totals(self):
+        """
+        Cross-check running totals against a full recompute
+        """
+        computed = self._computed_totals()
+        if (self.guzis_on_road, self.daily_guzis_total) != computed:
+            raise RuntimeError("Running totals (guzis_on_road, daily_guzis_total) {} differ from recomputed {}".format(
+                (self.guzis_on_road, self.daily_guzis_total), computed))
+        if self.slots is not None:
+            for name, slots in self.slots.items():
+                if not np.array_equal(slots[:, :self.size].sum(axis=0), self._field(name)):
+                    raise RuntimeError("{} slots differ from wallets".format(name))
+
+    def daily_guzis(self):
+        return daily_guzis(self.total_accumulated)
+
+    def new_day(self, date, profiler=None):
+        """
+        Same as calling check_balance, check_outdated_guzis and
+        create_daily_guzis on every user, with whole-array operations.
+        Each step is timed as a phase of profiler, if given.
+        """
+        if self.slots is None:
+            created, outdated = update_day(self, profiler)
+        else:
+            day = date.toordinal()
+            with phase(profiler, "check_balance"):
+                check_balance(self)
+            with phase(profiler, "check_outdated_guzis"):
+                outdated = self._expire_slots(day)
+            with phase(profiler, "create_daily_guzis"):
+                created = create_daily_guzis(self)
+                for slots in self.slots.values():
+                    slots[day % EXPIRY_DAYS, :self.size] = created
+                self.day = day
+        self.daily_guzis_total = int(created.sum())
+        self.guzis_on_road += self.daily_guzis_total - int(outdated.sum())
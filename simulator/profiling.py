@@ -0,0 +1,73 @@
+import time
+from contextlib import nullcontext
+
+
+_NO_PHASE = nullcontext()
+
+
+class _Phase:
+    """
+    Context manager adding its wall time to a phase of a Profiler
+    """
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+
+
+class Profiler:
+    """
+    Cumulative wall time and call count of named phases of a run.
+    Give it to Simulator(profiler=...) to time the steps of new_day, and
+    time other steps with profiler.phase(name).
+    """
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+
+    def phase(self, name):
+        """
+        Return a context manager timing its block as one call of phase name
+        """
+        return _Phase(self, name)
+
+    def add(self, name, seconds, calls=1):
+        self.seconds[name] = self.seconds.get(name, 0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + calls
+
+    def reset(self):
+        self.seconds = {}
+        self.calls = {}
+
+    def stats(self):
+        """
+        Return {phase name: {"calls": count, "seconds": total wall time}}
+        """
+        return {name: {"calls": self.calls[name], "seconds": self.seconds[name]} for name in self.seconds}
+
+    def summary(self):
+        """
+        Return a table of phases, the slowest first
+        """
+        total = sum(self.seconds.values())
+        lines = ["{:<24} {:>8} {:>12} {:>14} {:>7}".format("phase", "calls", "seconds", "seconds/call", "%")]
+        for name in sorted(self.seconds, key=self.seconds.get, reverse=True):
+            seconds, calls = self.seconds[name], self.calls[name]
+            lines.append("{:<24} {:>8} {:>12.6f} {:>14.9f} {:>7.1%}".format(
+                name, calls, seconds, seconds / calls, seconds / total if total else 0))
+        return "\n".join(lines)
+
+
+def phase(profiler, name):
+    """
+    Return profiler.phase(name), or a context manager doing nothing if
+    profiler is None
+    """
+    return _NO_PHASE if profiler is None else profiler.phase(name)
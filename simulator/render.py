@@ -0,0 +1,32 @@
+import argparse
+import os
+import sys
+
+if __package__ in (None, ""):
+    # Run as a script : make the simulator package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator.plotting import GrapheDrawer
+from simulator.metrics import MemorySink, read_points
+from simulator.distribution import DISTRIBUTION_COLUMNS
+
+
+if __name__ == "__main__":
+    columns = ["date", "guzis_on_road", "average_daily_guzi", "user_count"] + list(DISTRIBUTION_COLUMNS)
+    parser = argparse.ArgumentParser(description='Draw graph points saved by simulator.py -o')
+    parser.add_argument('path', type=str, help='.csv file or .npz chunks directory')
+    parser.add_argument('-x', type=str, dest='x', required=True, help='x axe', choices=columns)
+    parser.add_argument('-y', type=str, dest='y', nargs='+', required=True, help='y axe', choices=columns)
+    parser.add_argument('-p', type=str, dest='plot',
+                       help='save the graph to this .png or .svg file instead of showing it')
+
+    args = parser.parse_args()
+
+    graph_drawer = GrapheDrawer(None, MemorySink(read_points(args.path)))
+    for y in args.y:
+        graph_drawer.add_graph(args.x, y)
+
+    if args.plot:
+        graph_drawer.save(args.plot)
+    else:
+        graph_drawer.draw().show()
@@ -0,0 +1,410 @@
+import multiprocessing
+
+import numpy as np
+
+from .distribution import LogHistogram, histogram_of
+from .models import SimpleUser
+from .population import Population
+from .profiling import phase
+from .trading import BatchRandomTrader
+
+
+class _Shard:
+    """
+    A slice of a ShardedPopulation with its own random Generator. Its
+    methods are the commands a ShardedPopulation sends to its workers.
+    """
+    def __init__(self, population, seed):
+        self.population = population
+        self.trader = BatchRandomTrader(population, rng=np.random.default_rng(seed))
+
+    def totals(self):
+        return len(self.population), self.population.guzis_on_road, self.population.daily_guzis_total
+
+    def get_population(self):
+        return self.population
+
+    def new_day(self, date):
+        self.population.new_day(date)
+
+    def extend(self, users):
+        self.population.extend(users)
+
+    def add_users(self, ids, birthdate):
+        self.population.add_users(ids, birthdate)
+
+    def remove(self, indices):
+        self.population.remove(indices)
+
+    def check_totals(self):
+        self.population.check_totals()
+
+    def histogram(self, name):
+        return histogram_of(self.population, name)
+
+    def get_user(self, index):
+        """
+        Return a SimpleUser copy of user at given row
+        """
+        view = self.population[index]
+        user = SimpleUser(view.id, view.birthdate)
+        for name in ("guzi_wallet", "guza_wallet", "total_accumulated", "guza_trashbin"):
+            setattr(user, name, getattr(view, name))
+        user.balance = {"income": view.balance["income"], "outcome": view.balance["outcome"]}
+        return user
+
+    def trade_guzis(self, k, offsets, shard_index):
+        """
+        Make paiements from k users of this shard (all of them if k is None)
+        to users of any shard, drawn among offsets[-1] users.
+        Paiements to this shard are credited at once. Return the others as
+        {shard index: (rows, amounts)}, one row per paid user.
+        """
+        population = self.population
+        if k == 0:
+            return {}
+        payers, amounts = self.trader._draw_payers(population.guzi_wallet, 0 if k is None else k)
+        payees = self.trader.rng.integers(0, offsets[-1], size=len(payers))
+
+        population.debit("guzi_wallet", payers, amounts)
+
+        shards = np.searchsorted(offsets, payees, side="right") - 1
+        payees = payees - offsets[shards]
+        local = shards == shard_index
+        to_self = local & (payees == payers)
+        population.add_total_accumulated(payees[to_self], amounts[to_self])
+        self.credit(payees[local & ~to_self], amounts[local & ~to_self])
+
+        outgoing = {}
+        for shard in np.unique(shards[~local]).tolist():
+            rows, inverse = np.unique(payees[shards == shard], return_inverse=True)
+            outgoing[shard] = (rows, np.bincount(inverse, weights=amounts[shards == shard]).astype(np.int64))
+        return outgoing
+
+    def credit(self, rows, amounts):
+        """
+        Add amounts to the income of users at given rows
+        """
+        income = self.population.income
+        income[:] += np.bincount(rows, weights=amounts, minlength=len(income)).astype(np.int64)
+
+
+def _serve(connection, shard):
+    """
+    Worker process loop : run the commands received on connection against
+    shard, and answer with their result and the shard totals
+    """
+    while True:
+        command = connection.recv()
+        if command is None:
+            break
+        name, args = command
+        try:
+            connection.send((True, getattr(shard, name)(*args), shard.totals()))
+        except Exception as e:
+            connection.send((False, e, shard.totals()))
+    connection.close()
+
+
+class _LocalWorker:
+    """
+    Run shard commands in the current process, with the same send and
+    receive steps as a worker process
+    """
+    def __init__(self, shard):
+        self.shard = shard
+
+    def send(self, command):
+        name, args = command
+        try:
+            self.answer = (True, getattr(self.shard, name)(*args), self.shard.totals())
+        except Exception as e:
+            self.answer = (False, e, self.shard.totals())
+
+    def receive(self):
+        return self.answer
+
+    def close(self):
+        pass
+
+
+class _ProcessWorker:
+    def __init__(self, shard, context):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child_connection, shard), daemon=True)
+        self.process.start()
+        child_connection.close()
+
+    def send(self, command):
+        self.connection.send(command)
+
+    def receive(self):
+        return self.connection.recv()
+
+    def close(self):
+        self.connection.send(None)
+        self.process.join()
+        self.connection.close()
+
+
+class ShardedPopulation:
+    """
+    A Population split into shards, each one owned by a worker process.
+    Users are ordered shard after shard : index i is row i - offset of the
+    shard holding it. New users go to the smallest shard.
+    Daily updates run in every shard at once and only shard totals go back
+    to the main process, so Simulator and GrapheDrawer use it like a
+    Population. Each shard draws its trades with its own seed, so runs are
+    deterministic for a given seed and shard count.
+    With processes=False shards run one after the other in the current
+    process, with the same results.
+    """
+    anonymous_births = False
+
+    def __init__(self, populations, seeds, processes=True):
+        if len(populations) != len(seeds):
+            raise ValueError("Need one seed per shard")
+        shards = [_Shard(p, s) for p, s in zip(populations, seeds)]
+        if processes:
+            context = multiprocessing.get_context()
+            self.workers = [_ProcessWorker(s, context) for s in shards]
+        else:
+            self.workers = [_LocalWorker(s) for s in shards]
+        self.sizes = [len(p) for p in populations]
+        self.shard_guzis_on_road = [p.guzis_on_road for p in populations]
+        self.shard_daily_guzis_total = [p.daily_guzis_total for p in populations]
+        self.pending = []
+
+    @classmethod
+    def split(cls, population, seeds, processes=True):
+        """
+        Split population in len(seeds) shards of contiguous users
+        """
+        bounds = np.linspace(0, len(population), len(seeds) + 1).astype(np.int64)
+        populations = [population.take(np.arange(start, stop)) for start, stop in zip(bounds, bounds[1:])]
+        return cls(populations, seeds, processes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+        self.workers = []
+
+    def _call(self, commands):
+        """
+        Send {shard index: (name, args)} commands, so that shards run them in
+        parallel, and return {shard index: result}
+        """
+        for shard, command in commands.items():
+            self.workers[shard].send(command)
+        results, error = {}, None
+        for shard in commands:
+            ok, result, totals = self.workers[shard].receive()
+            self.sizes[shard], self.shard_guzis_on_road[shard], self.shard_daily_guzis_total[shard] = totals
+            if ok:
+                results[shard] = result
+            elif error is None:
+                error = result
+        if error is not None:
+            raise error
+        return results
+
+    def _call_all(self, name, *args):
+        results = self._call({shard: (name, args) for shard in range(len(self.workers))})
+        return [results[shard] for shard in range(len(self.workers))]
+
+    def _distribute(self, count):
+        """
+        Return how many of count new users go to each shard, filling the
+        smallest shards first
+        """
+        sizes = list(self.sizes)
+        counts = [0] * len(sizes)
+        for _ in range(count):
+            shard = sizes.index(min(sizes))
+            sizes[shard] += 1
+            counts[shard] += 1
+        return counts
+
+    def _flush(self):
+        """
+        Send users appended since last command to their shard
+        """
+        if not self.pending:
+            return
+        users, self.pending = self.pending, []
+        commands, start = {}, 0
+        for shard, count in enumerate(self._distribute(len(users))):
+            if count > 0:
+                commands[shard] = ("extend", (users[start:start + count],))
+                start += count
+        self._call(commands)
+
+    def append(self, user):
+        """
+        Add a copy of given SimpleUser. Users are sent to the shards in a
+        batch with the next command.
+        """
+        self.pending.append(user)
+
+    def extend(self, users):
+        self.pending.extend(users)
+
+    def add_users(self, ids, birthdate):
+        self._flush()
+        commands, start = {}, 0
+        for shard, count in enumerate(self._distribute(len(ids))):
+            if count > 0:
+                if np.ndim(birthdate) > 0:
+                    shard_birthdate = birthdate[start:start + count]
+                else:
+                    shard_birthdate = birthdate
+                commands[shard] = ("add_users", (ids[start:start + count], shard_birthdate))
+                start += count
+        self._call(commands)
+
+    def offsets(self):
+        return np.concatenate(([0], np.cumsum(self.sizes))).astype(np.int64)
+
+    def remove(self, indices):
+        """
+        Remove users at given indices
+        """
+        self._flush()
+        indices = np.asarray(indices, dtype=np.int64)
+        offsets = self.offsets()
+        shards = np.searchsorted(offsets, indices, side="right") - 1
+        self._call({
+            shard: ("remove", (indices[shards == shard] - offsets[shard],))
+            for shard in np.unique(shards).tolist()
+        })
+
+    def __len__(self):
+        return sum(self.sizes) + len(self.pending)
+
+    def __getitem__(self, index):
+        """
+        Return a SimpleUser copy of user at given index
+        """
+        self._flush()
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ShardedPopulation index out of range")
+        offsets = self.offsets()
+        shard = int(np.searchsorted(offsets, index, side="right")) - 1
+        return self._call({shard: ("get_user", (int(index - offsets[shard]),))})[shard]
+
+    @property
+    def guzis_on_road(self):
+        self._flush()
+        return sum(self.shard_guzis_on_road)
+
+    @property
+    def daily_guzis_total(self):
+        self._flush()
+        return sum(self.shard_daily_guzis_total)
+
+    def check_totals(self):
+        self._flush()
+        self._call_all("check_totals")
+
+    def histogram(self, name):
+        """
+        Return the distribution.LogHistogram of field name over all users,
+        merged from the histograms of the shards
+        """
+        self._flush()
+        histogram = LogHistogram()
+        for shard_histogram in self._call_all("histogram", name):
+            histogram.merge(shard_histogram)
+        return histogram
+
+    def new_day(self, date, profiler=None):
+        """
+        Update all shards in parallel, timed as a single new_day phase of
+        profiler if given
+        """
+        self._flush()
+        with phase(profiler, "new_day"):
+            self._call_all("new_day", date)
+
+    def trade_guzis(self, counts=None):
+        """
+        Make one day of paiements between users : shards pay in parallel,
+        then paiements to other shards are exchanged in one batch per shard.
+        counts gives the number of payers in each shard, all users by
+        default.
+        """
+        self._flush()
+        offsets = self.offsets()
+        if counts is None:
+            counts = [None] * len(self.workers)
+        outgoing = self._call({
+            shard: ("trade_guzis", (count, offsets, shard)) for shard, count in enumerate(counts)
+        })
+        incoming = {}
+        for source in range(len(self.workers)):
+            for shard, paiements in outgoing[source].items():
+                incoming.setdefault(shard, []).append(paiements)
+        self._call({
+            shard: ("credit", (np.concatenate([r for r, _ in batches]), np.concatenate([a for _, a in batches])))
+            for shard, batches in incoming.items()
+        })
+
+    def gather(self):
+        """
+        Return a Population holding a copy of all users, in index order
+        """
+        self._flush()
+        populations = self._call_all("get_population")
+        population = Population(len(self))
+        rows = population._add_rows(len(self))
+        for name in Population.COLUMNS:
+            if name != "keys":
+                population._arrays[name][rows] = np.concatenate([p._field(name) for p in populations])
+        population.recompute_totals()
+        return population
+
+
+class ShardedRandomTrader:
+    """
+    BatchRandomTrader for a ShardedPopulation : guzis paiements between
+    users of all shards. Companies are not sharded, so guza trading is not
+    supported.
+    rng draws how k payers are spread among shards, each shard then draws
+    its own payers, payees and amounts.
+    """
+    def __init__(self, user_pool, rng=None):
+        self.user_pool = user_pool
+        self.rng = np.random.default_rng() if rng is None else rng
+
+    def trade_guzis(self, k=0):
+        """
+        make paiements from k users, default 0
+        If k=0, each user makes a paiement < it's wallet size
+        """
+        if len(self.user_pool) == 0:
+            raise ValueError("Cannot trade guzis with empty user_pool")
+        if k == 0:
+            self.user_pool.trade_guzis()
+        else:
+            self.user_pool._flush()
+            counts = self.rng.multivariate_hypergeometric(self.user_pool.sizes, k)
+            self.user_pool.trade_guzis(counts.tolist())
+
+
+def shard_simulator(simulator, shard_count, processes=True):
+    """
+    Replace the Population of simulator by a ShardedPopulation of
+    shard_count shards seeded from the simulator seed
+    """
+    if not isinstance(simulator.user_pool, Population):
+        raise ValueError("Only a population.Population can be sharded")
+    simulator.user_pool = ShardedPopulation.split(simulator.user_pool, simulator.spawn_seeds(shard_count), processes)
+    return simulator.user_pool
@@ -1,51 +1,201 @@
 import argparse
-from datetime import date
+import os
+import sys
+from datetime import date, timedelta
 
-from models import Simulator, UserGenerator, GrapheDrawer, SimpleYearlyDeathGod
+if __package__ in (None, ""):
+    # Run as a script : make the simulator package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulator.models import Simulator, UserGenerator
+from simulator.plotting import GrapheDrawer
+from simulator.population import Population
+from simulator.mapped import MappedPopulation
+from simulator.cohorts import CohortPopulation
+from simulator.metrics import open_sink
+from simulator.distribution import DISTRIBUTION_COLUMNS
+from simulator.checkpoint import save_checkpoint, load_checkpoint
+from simulator.ensemble import Scenario, run_ensemble, death_god_of, random_trader, schedule_run
+from simulator.sharding import shard_simulator
+from simulator.profiling import Profiler, phase
 
 
 if __name__ == "__main__":
+    columns = ["date", "guzis_on_road", "average_daily_guzi", "user_count"]
     parser = argparse.ArgumentParser(description='Simulate Guzi interactions')
-    parser.add_argument('-u', type=int, dest='user_count', required=True,
-                       help='number of users to simulate')
+    parser.add_argument('-u', type=int, dest='user_count',
+                       help='number of users to simulate (required unless --resume)')
     parser.add_argument('-d', type=int, dest='days', default=365,
                        help='number of days simulation should last')
     parser.add_argument('-f', type=int, dest='frequency', default=1,
                        help='days between each graph point')
-    parser.add_argument('-x', type=str, dest='x', help='x axe', choices=["date", "guzis_on_road", "average_daily_guzi", "user_count"])
-    parser.add_argument('-y', type=str, dest='y', nargs='+', help='y axe', choices=["date", "guzis_on_road", "average_daily_guzi", "user_count"])
+    parser.add_argument('-e', type=str, dest='engine', default='numpy', choices=["numpy", "objects", "cohorts"],
+                       help='population engine : numpy arrays, one SimpleUser object per user or one row per cohort of identical users')
+    parser.add_argument('-m', type=str, dest='mortality', default='simple', choices=["simple", "daily", "age"],
+                       help='death model : prorated count of oldest users once a year or spread over the days, or per age probability (needs -e numpy or cohorts)')
+    parser.add_argument('--trade', action='store_true', dest='trade',
+                       help='make users pay random users every day')
+    parser.add_argument('--exact-expiry', action='store_true', dest='exact_expiry',
+                       help='expire each Guzi 30 days after its creation instead of capping wallets (numpy engine only)')
+    parser.add_argument('--mmap', type=str, dest='mmap',
+                       help='keep user columns in memory-mapped files in this directory, updated by chunks (numpy engine only)')
+    parser.add_argument('--debug', action='store_true', dest='debug',
+                       help='check running totals against a full recompute at each graph point')
+    parser.add_argument('--profile', action='store_true', dest='profile',
+                       help='print the time spent in each phase of the daily loop at the end of the run')
+    parser.add_argument('-o', type=str, dest='output',
+                       help='stream graph points to this .csv file, or to .npz chunks in this directory')
+    parser.add_argument('--checkpoint', type=str, dest='checkpoint',
+                       help='save the simulation state in this directory at the end of the run')
+    parser.add_argument('--checkpoint-every', type=int, dest='checkpoint_every', default=365,
+                       help='days between each checkpoint save during the run')
+    parser.add_argument('--resume', type=str, dest='resume',
+                       help='resume from a checkpoint directory and simulate -d more days')
+    parser.add_argument('-n', type=int, dest='runs', default=1,
+                       help='number of independently seeded runs, drawn as mean and percentile bands (needs -e numpy)')
+    parser.add_argument('-j', type=int, dest='workers',
+                       help='number of worker processes for -n runs (default: all cores)')
+    parser.add_argument('-s', type=int, dest='shards', default=1,
+                       help='split users in this many shards updated by parallel processes (needs -e numpy and -m simple)')
+    parser.add_argument('--seed', type=int, dest='seed',
+                       help='seed of the random streams : a seeded run always gives the same output')
+    parser.add_argument('-p', type=str, dest='plot',
+                       help='save the graph to this .png or .svg file instead of showing it')
+    parser.add_argument('--live', action='store_true', dest='live',
+                       help='draw the graph while the simulation runs, updated at each graph point')
+    parser.add_argument('--distributions', action='store_true', dest='distributions',
+                       help='add Gini coefficients and percentiles of wallets and daily Guzis to graph points')
+    parser.add_argument('-x', type=str, dest='x', help='x axe', choices=columns + list(DISTRIBUTION_COLUMNS))
+    parser.add_argument('-y', type=str, dest='y', nargs='+', help='y axe', choices=columns + list(DISTRIBUTION_COLUMNS))
 
     args = parser.parse_args()
+    if args.user_count is None and args.resume is None:
+        parser.error("-u is required unless --resume is given")
+    if args.mortality == "age" and args.engine == "objects":
+        parser.error("-m age needs -e numpy or cohorts")
+    if args.exact_expiry and (args.engine != "numpy" or args.runs > 1):
+        parser.error("--exact-expiry needs the numpy engine and a single run")
+    if args.mmap and (args.engine != "numpy" or args.exact_expiry or args.resume or args.runs > 1 or args.shards > 1):
+        parser.error("--mmap needs the numpy engine and can't be used with --exact-expiry, --resume, -n or -s")
+    if args.engine == "cohorts" and (args.resume or args.checkpoint):
+        parser.error("-e cohorts can't be used with --resume or --checkpoint")
+    if args.runs > 1 and (args.engine != "numpy" or args.resume or args.checkpoint or args.output):
+        parser.error("-n needs -e numpy and can't be used with --resume, --checkpoint or -o")
+    if args.live and (not (args.x and args.y) or args.plot or args.runs > 1):
+        parser.error("--live needs -x and -y and can't be used with -p or -n")
+    if args.distributions and args.runs > 1:
+        parser.error("--distributions can't be used with -n")
+    if not args.distributions and set([args.x] + (args.y or [])) & set(DISTRIBUTION_COLUMNS):
+        parser.error("-x and -y distribution columns need --distributions")
+    if args.shards > 1 and (args.engine != "numpy" or args.mortality != "simple" or args.resume or args.checkpoint or args.runs > 1):
+        parser.error("-s needs -e numpy and -m simple and can't be used with --resume, --checkpoint or -n")
     print(args)
 
-    simulator = Simulator()
-    death_god = SimpleYearlyDeathGod()
-    graph_drawer = GrapheDrawer(simulator)
+    if args.runs > 1:
+        scenario = Scenario(args.user_count, args.days, args.frequency, date.today(), date(2010, 1, 1), args.mortality,
+                            trade=args.trade)
+        result = run_ensemble(scenario, args.runs, args.seed, args.workers)
+        for name, series in result.series.items():
+            print("{} after {} days : mean {:.1f}, 5%-95% [{:.1f}, {:.1f}]".format(
+                name, args.days, series["mean"][-1], series["p5"][-1], series["p95"][-1]))
+        if args.y and args.plot:
+            result.save([y for y in args.y if y != "date"], args.plot)
+        elif args.y:
+            result.draw([y for y in args.y if y != "date"]).show()
+        sys.exit()
+
+    if args.resume:
+        checkpoint = load_checkpoint(args.resume)
+        simulator = checkpoint.simulator
+        simulator.debug = args.debug
+        day_counter = checkpoint.extra["day_counter"]
+    else:
+        user_pools = {"numpy": lambda: Population(exact_expiry=args.exact_expiry), "cohorts": CohortPopulation, "objects": lambda: None}
+        if args.mmap:
+            user_pools["numpy"] = lambda: MappedPopulation(args.mmap, capacity=args.user_count)
+        simulator = Simulator(user_pool=user_pools[args.engine](), debug=args.debug, seed=args.seed)
+        if args.engine == "numpy":
+            simulator.user_pool.add_numbered_users(args.user_count, date(2010, 1, 1))
+        elif args.engine == "cohorts":
+            simulator.user_pool.add_cohort(args.user_count, date(2010, 1, 1))
+        else:
+            simulator.add_users(UserGenerator.generate_users(date(2010, 1, 1), args.user_count, simulator.rngs["demography"]))
+        day_counter = 0
+    if args.shards > 1:
+        shard_simulator(simulator, args.shards)
+    if args.profile:
+        simulator.profiler = Profiler()
+    profiler = simulator.profiler
+    death_god = death_god_of(args.mortality, simulator.rngs["demography"])
+    if args.resume:
+        death_god.setstate(checkpoint.extra.get("death_god", {}))
+    trader = random_trader(simulator.user_pool, rng=simulator.rngs["trading"]) if args.trade else None
+
+    # A resumed run appends to the points written before its checkpoint
+    resume_date = simulator.current_date if args.resume else None
+    sink = open_sink(args.output, resume_date=resume_date) if args.output else None
+    graph_drawer = GrapheDrawer(simulator, sink, args.distributions)
+    if not args.resume:
+        graph_drawer.add_point()
 
-    simulator.add_users(UserGenerator.generate_users(date(2010, 1, 1), args.user_count))
-    graph_drawer.add_point()
-    
-    day_counter = 0
-    for i in range(args.days):
-        if day_counter % 365 == 0:
-            simulator.user_pool = death_god.give_birth(simulator.user_pool)
-            simulator.user_pool = death_god.give_death(simulator.user_pool)
+    # Days since the start of the simulation, across resumes
+    run_start, first_day = simulator.current_date, day_counter
+    elapsed_days = lambda simulator: first_day + (simulator.current_date - run_start).days
+    # First date of an event run every `every` days since the start
+    first_date = lambda every: run_start + timedelta(days=-first_day % every)
 
-        if day_counter % args.frequency == 0:
+    # Jonhy is the first user alive, found by key : daily deaths move the
+    # newest users to the first rows
+    jonhy = lambda user_pool: user_pool.first_user() if isinstance(user_pool, Population) else user_pool[0]
+
+    def sample(simulator):
+        day_counter = elapsed_days(simulator)
+        with phase(profiler, "graph_point"):
             graph_drawer.add_point()
-            print("day {} (year {})=> {} users for {} total guzis, jonhy total {} earns daily {}".format(
-                day_counter,
-                int(day_counter/365.25),
-                len(simulator.user_pool),
-                sum([u.guzi_wallet for u in simulator.user_pool]),
-                simulator.user_pool[0].total_accumulated,
-                int(simulator.user_pool[0].total_accumulated ** (1/3) + 1)))
-        simulator.new_day()
-        day_counter += 1
-
-    if args.x and args.y:
+        print("day {} (year {})=> {} users for {} total guzis, jonhy total {} earns daily {}".format(
+            day_counter,
+            int(day_counter/365.25),
+            simulator.user_count(),
+            simulator.guzis_on_road(),
+            jonhy(simulator.user_pool).total_accumulated,
+            jonhy(simulator.user_pool).daily_guzis()))
+
+    def checkpoint(simulator):
+        with phase(profiler, "checkpoint"):
+            save_checkpoint(simulator, args.checkpoint, extra={
+                "day_counter": elapsed_days(simulator), "death_god": death_god.getstate()})
+
+    # Checkpoints save the state of the previous day, before its births
+    if args.checkpoint:
+        first_checkpoint = first_date(args.checkpoint_every)
+        if first_checkpoint == run_start:
+            first_checkpoint += timedelta(days=args.checkpoint_every)
+        simulator.schedule(checkpoint, first_checkpoint, args.checkpoint_every, priority=0)
+    schedule_run(simulator, death_god, sample, args.frequency, trader, first_day)
+    if args.live:
+        for y in args.y:
+            graph_drawer.add_graph(args.x, y)
+        plt = graph_drawer.draw_live()
+        simulator.schedule(lambda simulator: graph_drawer.refresh(), first_date(args.frequency), args.frequency, priority=4)
+    simulator.run(args.days)
+    day_counter = elapsed_days(simulator)
+    graph_drawer.sink.close()
+    if args.shards > 1:
+        simulator.user_pool.close()
+    if args.checkpoint:
+        save_checkpoint(simulator, args.checkpoint, extra={"day_counter": day_counter, "death_god": death_god.getstate()})
+    if profiler is not None:
+        print(profiler.summary())
+
+    if args.live:
+        graph_drawer.refresh()
+        plt.ioff()
+        plt.show()
+    elif args.x and args.y:
         for y in args.y:
             graph_drawer.add_graph(args.x, y)
 
-        plot = graph_drawer.draw()
-        plot.show()
+        if args.plot:
+            graph_drawer.save(args.plot)
+        else:
+            graph_drawer.draw().show()
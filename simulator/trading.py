@@ -0,0 +1,99 @@
+import numpy as np
+
+from .models import RandomTrader
+
+
+class BatchRandomTrader(RandomTrader):
+    """
+    RandomTrader drawing a whole day of paiements at once.
+    user_pool must be a population.Population. Payers, payees and amounts
+    are drawn as arrays, then wallets are debited and credited with
+    whole-array operations.
+    Paiements are order independent (a paid user gets income, not Guzis to
+    spend), so this is the same random process as RandomTrader.
+    """
+    def __init__(self, user_pool, company_pool=[], rng=None):
+        super().__init__(user_pool, company_pool)
+        self.rng = np.random.default_rng() if rng is None else rng
+
+    def _company_wallets(self):
+        return np.fromiter((c.guzi_wallet for c in self.company_pool), dtype=np.int64, count=len(self.company_pool))
+
+    def _draw_payers(self, wallets, k):
+        """
+        Return k distinct random payers indices (among the ones able to pay)
+        with a random amount to pay for each
+        """
+        if k == 0 or k == len(wallets):
+            payers = np.arange(len(wallets))
+        else:
+            payers = self.rng.choice(len(wallets), size=k, replace=False)
+        payers = payers[wallets[payers] > 1]
+        amounts = self.rng.integers(1, wallets[payers])
+        return payers, amounts
+
+    def _draw_trades(self, wallets, k):
+        """
+        Return payers, amounts and payees of a day of paiements between the
+        entities of wallets : any entity may be paid
+        """
+        payers, amounts = self._draw_payers(wallets, k)
+        payees = self.rng.integers(0, len(wallets), size=len(payers))
+        return payers, amounts, payees
+
+    def _company_credits(self, companies, amounts):
+        """
+        Yield (company, credit) with the sum of amounts targeting each company
+        """
+        credits = np.bincount(companies, weights=amounts, minlength=len(self.company_pool)).astype(np.int64)
+        for c in np.flatnonzero(credits):
+            yield self.company_pool[c], int(credits[c])
+
+    def trade_guzis(self, k=0):
+        """
+        make paiements from k entities (user or company), default 0
+        If k=0, each entity makes a paiement < it's wallet size
+        """
+        user_count = len(self.user_pool)
+        if user_count == 0:
+            raise ValueError("Cannot trade guzis with empty user_pool")
+        company_wallets = self._company_wallets()
+        wallets = np.concatenate((self.user_pool.guzi_wallet, company_wallets))
+        payers, amounts, payees = self._draw_trades(wallets, k)
+
+        # Debit payers
+        user_payers = payers < user_count
+        self.user_pool.debit("guzi_wallet", payers[user_payers], amounts[user_payers])
+        company_payers = payers[~user_payers] - user_count
+        company_wallets[company_payers] -= amounts[~user_payers]
+        for c in company_payers:
+            self.company_pool[c].guzi_wallet = int(company_wallets[c])
+
+        # A user paying itself accumulates directly
+        to_self = (payees == payers) & user_payers
+        self.user_pool.add_total_accumulated(payees[to_self], amounts[to_self])
+
+        # Credit other users incomes and companies
+        to_users = (payees < user_count) & ~to_self
+        self.user_pool.income[:] += np.bincount(
+            payees[to_users], weights=amounts[to_users], minlength=user_count).astype(np.int64)
+        to_companies = payees >= user_count
+        for company, credit in self._company_credits(payees[to_companies] - user_count, amounts[to_companies]):
+            company.pay_count(credit)
+
+    def trade_guzas(self, k=0):
+        """
+        Give guzas from k users to companies in company_pool
+        If k=0, each user makes a give < it's wallet size
+        """
+        if len(self.user_pool) == 0:
+            raise ValueError("Cannot trade guzas with empty user_pool")
+        if len(self.company_pool) == 0:
+            raise ValueError("Cannot trade guzas with empty company_pool")
+        users, amounts = self._draw_payers(self.user_pool.guza_wallet, k)
+        companies = self.rng.integers(0, len(self.company_pool), size=len(users))
+
+        self.user_pool.debit("guza_wallet", users, amounts)
+        self.user_pool.outcome[users] += amounts
+        for company, credit in self._company_credits(companies, amounts):
+            company.add_guza_count(credit)
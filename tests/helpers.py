@@ -0,0 +1,16 @@
+from datetime import date
+
+from simulator.population import Population
+
+
+def generate_population(count, birthdate=date(2000, 1, 1), wallet=0):
+    """
+    Return a Population of count users numbered from 0, born at birthdate,
+    with wallet Guzis each
+    """
+    population = Population()
+    population.add_numbered_users(count, birthdate)
+    if wallet:
+        population.guzi_wallet[:] = wallet
+        population.recompute_totals()
+    return population
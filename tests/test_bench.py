@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from simulator.bench import BENCHMARKS, run_benchmark, run_suite, save_report, load_report, compare_reports
+
+
+class TestBench(unittest.TestCase):
+    def test_run_benchmark_should_measure_time_and_memory(self):
+        for engine in ("numpy", "objects"):
+            for name in BENCHMARKS:
+                result = run_benchmark(name, engine, 50, repeat=2)
+
+                self.assertEqual((result["benchmark"], result["engine"], result["users"]), (name, engine, 50))
+                self.assertGreater(result["seconds"], 0)
+                self.assertLessEqual(result["best_seconds"], result["seconds"])
+                self.assertGreater(result["state_memory"], 0)
+
+    def test_run_benchmark_should_raise_error_for_unknown_benchmark(self):
+        with self.assertRaises(ValueError):
+            run_benchmark("unknown", "numpy", 10)
+
+    def test_run_suite_should_skip_large_objects_runs(self):
+        report = run_suite(["new_day"], sizes=[10, 20], repeat=1, objects_max_users=10)
+
+        self.assertEqual(
+            [(r["engine"], r["users"]) for r in report["results"]],
+            [("numpy", 10), ("numpy", 20), ("objects", 10)])
+
+    def test_saved_reports_should_be_compared(self):
+        old = run_suite(["new_day"], ["numpy"], [10], repeat=1)
+        new = run_suite(["new_day", "add_point"], ["numpy"], [10], repeat=1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bench.json")
+            save_report(old, path)
+
+            comparison = compare_reports(load_report(path), new)
+
+        old_seconds, new_seconds = old["results"][0]["seconds"], new["results"][0]["seconds"]
+        self.assertEqual(comparison, [("new_day", "numpy", 10, old_seconds, new_seconds, new_seconds / old_seconds)])
@@ -0,0 +1,166 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+import numpy as np
+
+from simulator.models import Simulator, UserGenerator, SimpleCompany, SimpleUser, SimpleYearlyDeathGod
+from simulator.population import Population, UserView
+from simulator.trading import BatchRandomTrader
+from simulator.checkpoint import save_checkpoint, load_checkpoint
+
+
+def generate_simulator(count):
+    population = Population()
+    population.extend(UserGenerator.generate_users(date(2000, 1, 1), count))
+    return Simulator(date(2000, 1, 1), population)
+
+
+def state_of(population):
+    return {name: population._field(name).tolist() for name in Population.COLUMNS}
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "checkpoint")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_load_should_restore_population_memory_mapped(self):
+        simulator = generate_simulator(100)
+        simulator.new_days(40)
+        simulator.user_pool.remove([0, 5])
+
+        save_checkpoint(simulator, self.path, extra={"day_counter": 40})
+        checkpoint = load_checkpoint(self.path)
+
+        population = checkpoint.simulator.user_pool
+        self.assertIsInstance(population.guzi_wallet.base, np.memmap)
+        self.assertEqual(state_of(population), state_of(simulator.user_pool))
+        self.assertEqual(checkpoint.simulator.current_date, date(2000, 2, 10))
+        self.assertEqual(checkpoint.extra, {"day_counter": 40})
+        population.check_totals()
+
+    def test_mixed_ids_should_keep_their_type(self):
+        population = Population()
+        population.add_numbered_users(1000, date(2000, 1, 1))
+        SimpleYearlyDeathGod().give_birth(population, date(2020, 1, 1))
+        self.assertEqual(len(population), 1011)
+        population.add_users(["a", "b"], date(2020, 1, 1))
+        simulator = Simulator(date(2020, 1, 1), population)
+
+        save_checkpoint(simulator, self.path)
+        loaded = load_checkpoint(self.path).simulator.user_pool
+
+        self.assertEqual(loaded.ids.tolist(), population.ids.tolist())
+        self.assertEqual(loaded[4].id, 4)
+        self.assertEqual(loaded[1011].id, "a")
+        self.assertEqual(loaded[1000].id, population[1000].id)
+        for ids in ([1, 2], ["a", "b"]):
+            population = Population()
+            population.add_users(ids, None)
+            save_checkpoint(Simulator(date(2020, 1, 1), population), self.path)
+            loaded = load_checkpoint(self.path).simulator.user_pool
+            self.assertEqual(loaded.ids.tolist(), ids)
+            self.assertIsInstance(loaded.ids, np.memmap)
+
+    def test_resumed_run_should_match_uninterrupted_run(self):
+        simulator = generate_simulator(200)
+        trader = BatchRandomTrader(simulator.user_pool, rng=simulator.rngs["trading"])
+        for _ in range(20):
+            simulator.new_day()
+            trader.trade_guzis()
+        save_checkpoint(simulator, self.path)
+
+        checkpoint = load_checkpoint(self.path)
+        resumed = checkpoint.simulator
+        resumed_trader = BatchRandomTrader(resumed.user_pool, rng=resumed.rngs["trading"])
+        for _ in range(20):
+            simulator.new_day()
+            trader.trade_guzis()
+            resumed.new_day()
+            resumed_trader.trade_guzis()
+
+        self.assertEqual(state_of(resumed.user_pool), state_of(simulator.user_pool))
+        self.assertEqual(resumed.spawn_seeds(1)[0].spawn_key, simulator.spawn_seeds(1)[0].spawn_key)
+
+    def test_resumed_exact_expiry_run_should_match_uninterrupted_run(self):
+        population = Population(exact_expiry=True)
+        population.add_numbered_users(50, date(2000, 1, 1))
+        simulator = Simulator(date(2000, 1, 1), population)
+        trader = BatchRandomTrader(population, rng=simulator.rngs["trading"])
+        for _ in range(20):
+            simulator.new_day()
+            trader.trade_guzis()
+        save_checkpoint(simulator, self.path)
+
+        resumed = load_checkpoint(self.path).simulator
+        resumed_trader = BatchRandomTrader(resumed.user_pool, rng=resumed.rngs["trading"])
+        for _ in range(20):
+            simulator.new_day()
+            trader.trade_guzis()
+            resumed.new_day()
+            resumed_trader.trade_guzis()
+
+        self.assertEqual(state_of(resumed.user_pool), state_of(simulator.user_pool))
+        resumed.user_pool.check_totals()
+
+    def test_extra_rngs_should_be_restored(self):
+        rng = np.random.default_rng(4)
+        rng.random()
+        save_checkpoint(generate_simulator(1), self.path, rngs={"other": rng})
+
+        restored = load_checkpoint(self.path).rngs["other"]
+
+        self.assertEqual(restored.random(), rng.random())
+
+    def test_resumed_population_should_grow(self):
+        simulator = generate_simulator(10)
+        save_checkpoint(simulator, self.path)
+
+        population = load_checkpoint(self.path).simulator.user_pool
+        population.add_users(["new"], date(2001, 1, 1))
+
+        self.assertEqual(len(population), 11)
+        self.assertEqual(population[10].id, "new")
+
+    def test_companies_should_keep_founders_as_population_users(self):
+        simulator = generate_simulator(10)
+        company = SimpleCompany("c", [simulator.user_pool[3]])
+        company.guzi_wallet = 7
+        save_checkpoint(simulator, self.path, company_pool=[company])
+
+        checkpoint = load_checkpoint(self.path)
+        company = checkpoint.company_pool[0]
+        company.spend_to(checkpoint.simulator.user_pool[0], 7)
+
+        self.assertIsInstance(company.sample_user, UserView)
+        self.assertIs(company.sample_user.population, checkpoint.simulator.user_pool)
+        self.assertEqual(checkpoint.simulator.user_pool[3].balance["income"], 0)
+        self.assertEqual(checkpoint.simulator.user_pool[0].balance["income"], 7)
+
+    def test_list_user_pool_should_be_restored_as_list(self):
+        simulator = Simulator(date(2000, 1, 1))
+        simulator.add_users([SimpleUser(None, None), SimpleUser(None, None)])
+        simulator.new_days(3)
+        company = SimpleCompany("c", [simulator.user_pool[1]])
+        save_checkpoint(simulator, self.path, company_pool=[company])
+
+        checkpoint = load_checkpoint(self.path)
+
+        self.assertIsInstance(checkpoint.simulator.user_pool, list)
+        self.assertEqual([u.guzi_wallet for u in checkpoint.simulator.user_pool], [3, 3])
+        self.assertIs(checkpoint.company_pool[0].sample_user, checkpoint.simulator.user_pool[1])
+
+    def test_save_should_replace_previous_checkpoint(self):
+        simulator = generate_simulator(10)
+        save_checkpoint(simulator, self.path)
+        simulator.new_day()
+
+        save_checkpoint(simulator, self.path)
+
+        self.assertEqual(load_checkpoint(self.path).simulator.current_date, date(2000, 1, 2))
+        self.assertEqual(os.listdir(self.directory.name), ["checkpoint"])
@@ -0,0 +1,161 @@
+import unittest
+from datetime import date
+
+import numpy as np
+
+from simulator.models import Simulator, SimpleUser, SimpleYearlyDeathGod
+from simulator.population import Population
+from simulator.cohorts import CohortPopulation, CohortRandomTrader
+from simulator.demography import AgeDeathGod
+
+
+def expand(cohorts):
+    """
+    Return the state of each user of cohorts, in index order
+    """
+    return [tuple(getattr(cohorts[i], name) for name in CohortPopulation.FIELDS) for i in range(len(cohorts))]
+
+
+class TestCohortPopulation(unittest.TestCase):
+    def test_run_without_trade_should_match_population(self):
+        death_god = SimpleYearlyDeathGod()
+        population = Population()
+        population.add_users(list(range(1000)), date(2010, 1, 1))
+        cohorts = CohortPopulation()
+        cohorts.add_cohort(1000, date(2010, 1, 1))
+        simulators = [Simulator(date(2020, 1, 1), population), Simulator(date(2020, 1, 1), cohorts)]
+
+        for day in range(800):
+            for simulator in simulators:
+                if day % 365 == 0:
+                    death_god.give_birth(simulator.user_pool, simulator.current_date)
+                    death_god.give_death(simulator.user_pool)
+                simulator.new_day()
+
+        self.assertEqual(
+            [(s.user_count(), s.guzis_on_road(), s.daily_guzis_total()) for s in simulators[1:]],
+            [(simulators[0].user_count(), simulators[0].guzis_on_road(), simulators[0].daily_guzis_total())])
+        # One cohort of founders and one per yearly births
+        self.assertEqual(cohorts.cohort_count(), 4)
+        cohorts.check_totals()
+
+    def test_append_should_merge_identical_users(self):
+        cohorts = CohortPopulation()
+        for _ in range(3):
+            cohorts.append(SimpleUser("a", date(2000, 1, 1)))
+        different = SimpleUser("b", date(2000, 1, 1))
+        different.guzi_wallet = 2
+        cohorts.append(different)
+
+        self.assertEqual(cohorts.counts.tolist(), [3, 1])
+        self.assertEqual(len(cohorts), 4)
+        self.assertEqual(cohorts[3].guzi_wallet, 2)
+        cohorts.check_totals()
+
+    def test_remove_should_shrink_cohorts(self):
+        cohorts = CohortPopulation()
+        cohorts.add_cohort(2, date(2000, 1, 1))
+        cohorts.add_cohort(3, date(2001, 1, 1))
+
+        cohorts.remove([0, 1, 4])
+
+        self.assertEqual(cohorts.counts.tolist(), [2])
+        self.assertEqual(cohorts[0].birthdate, date(2001, 1, 1))
+        cohorts.check_totals()
+
+    def test_isolate_should_split_users_from_their_cohort(self):
+        cohorts = CohortPopulation()
+        cohorts.add_cohort(3, date(2000, 1, 1))
+        cohorts.add_cohort(1, date(2001, 1, 1))
+        cohorts.new_day(date(2020, 1, 1))
+
+        rows = cohorts.isolate([3, 1, 1])
+        cohorts.guzi_wallet[rows[1]] = 5
+        cohorts.recompute_totals()
+
+        self.assertEqual(rows.tolist(), [1, 2, 2])
+        self.assertEqual(cohorts.counts.tolist(), [2, 1, 1])
+        self.assertEqual(len(cohorts), 4)
+        self.assertEqual(cohorts.isolate([0, 1]).tolist(), [0, 3])
+
+    def test_compact_should_merge_identical_cohorts(self):
+        cohorts = CohortPopulation()
+        cohorts.add_cohort(3, date(2000, 1, 1))
+        cohorts.isolate([0, 1])
+        before = sorted(expand(cohorts))
+
+        cohorts.compact()
+
+        self.assertEqual(cohorts.counts.tolist(), [3])
+        self.assertEqual(sorted(expand(cohorts)), before)
+
+    def test_new_day_should_keep_cohort_count_bounded(self):
+        cohorts = CohortPopulation()
+        cohorts.add_cohort(10000, date(2000, 1, 1))
+        simulator = Simulator(date(2020, 1, 1), cohorts)
+        rng = np.random.default_rng(0)
+
+        for _ in range(100):
+            # Isolated users keep the state of their cohort
+            cohorts.isolate(rng.choice(10000, size=100, replace=False))
+            self.assertGreater(cohorts.cohort_count(), 100)
+            simulator.new_day()
+            self.assertEqual(cohorts.cohort_count(), 1)
+
+        self.assertEqual(len(cohorts), 10000)
+        cohorts.check_totals()
+
+    def test_age_death_god_should_draw_deaths_per_cohort(self):
+        cohorts = CohortPopulation()
+        cohorts.add_cohort(100000, date(1920, 1, 1))
+        cohorts.add_cohort(100000, date(2019, 1, 1))
+        cohorts.add_cohort(5, None)
+
+        AgeDeathGod(np.random.default_rng(0)).give_death(cohorts, date(2020, 6, 1))
+
+        old, young, unknown = cohorts.counts.tolist()
+        self.assertAlmostEqual(old / 100000, 1 - 0.328455, delta=0.01)
+        self.assertAlmostEqual(young / 100000, 1 - 0.00059, delta=0.001)
+        self.assertEqual(unknown, 5)
+        cohorts.check_totals()
+
+
+class TestCohortRandomTrader(unittest.TestCase):
+    def test_trade_guzis_should_keep_guzis_and_split_traders_only(self):
+        cohorts = CohortPopulation()
+        cohorts.add_cohort(1000, date(2000, 1, 1))
+        simulator = Simulator(date(2020, 1, 1), cohorts)
+        trader = CohortRandomTrader(cohorts, np.random.default_rng(0))
+        # Users need 2 Guzis to pay
+        simulator.new_day()
+
+        for _ in range(5):
+            simulator.new_day()
+            before = int((cohorts.guzi_wallet * cohorts.counts).sum())
+            trader.trade_guzis(10)
+            paid = before - int((cohorts.guzi_wallet * cohorts.counts).sum())
+            self.assertGreater(paid, 0)
+            cohorts.check_totals()
+
+        self.assertEqual(len(cohorts), 1000)
+        self.assertLessEqual(cohorts.cohort_count(), 101)
+
+    def test_trade_guzis_should_match_population_totals(self):
+        cohorts = CohortPopulation()
+        cohorts.add_cohort(50, date(2000, 1, 1))
+        simulator = Simulator(date(2020, 1, 1), cohorts)
+        trader = CohortRandomTrader(cohorts, np.random.default_rng(1))
+
+        for _ in range(10):
+            simulator.new_day()
+            trader.trade_guzis()
+
+        population = Population()
+        population.extend(cohorts[i] for i in range(len(cohorts)))
+        self.assertEqual((population.guzis_on_road, population.daily_guzis_total),
+                         (cohorts.guzis_on_road, cohorts.daily_guzis_total))
+        self.assertEqual(cohorts.cohort_count(), 50)
+
+    def test_trade_guzis_should_raise_error_if_user_pool_is_empty(self):
+        with self.assertRaises(ValueError):
+            CohortRandomTrader(CohortPopulation()).trade_guzis()
@@ -0,0 +1,61 @@
+import unittest
+from datetime import date, timedelta
+
+import numpy as np
+
+from simulator.decimation import lttb_indices, min_max_indices, decimate, MinMaxStream
+
+
+class TestDecimation(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.x = np.arange(36500)
+        self.y = np.cumsum(rng.normal(size=36500))
+        self.y[12345] = 1000
+
+    def test_lttb_should_keep_ends_and_spikes(self):
+        indices = lttb_indices(self.x, self.y, 500)
+
+        self.assertEqual(len(indices), 500)
+        self.assertEqual((indices[0], indices[-1]), (0, 36499))
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertIn(12345, indices)
+
+    def test_lttb_should_accept_dates(self):
+        dates = [date(2000, 1, 1) + timedelta(days=i) for i in range(100)]
+
+        x, y = decimate(dates, np.arange(100) ** 2, 10)
+
+        self.assertEqual(len(x), 10)
+        self.assertEqual((x[0], x[-1]), (dates[0], dates[-1]))
+
+    def test_min_max_should_keep_each_bucket_extremes(self):
+        indices = min_max_indices(self.y, 100)
+
+        buckets = self.y[:36500 // 100 * 100].reshape(-1, 100)
+        self.assertEqual(self.y[indices].max(), self.y.max())
+        self.assertEqual(self.y[indices].min(), self.y.min())
+        self.assertLessEqual(len(indices), 2 * 365)
+        self.assertTrue(set(np.argmax(buckets, axis=1) + np.arange(0, 36500, 100)) <= set(indices))
+
+    def test_short_series_should_not_be_decimated(self):
+        x, y = decimate([1, 2, 3], [4, 5, 6], 10)
+
+        self.assertEqual((x.tolist(), y.tolist()), ([1, 2, 3], [4, 5, 6]))
+        with self.assertRaises(ValueError):
+            decimate(self.x, self.y, 10, "average")
+
+    def test_min_max_stream_should_stay_bounded_and_keep_extremes(self):
+        stream = MinMaxStream(1000)
+        for start in range(0, 36500, 365):
+            stream.extend(self.x[start:start + 365], self.y[start:start + 365])
+
+            x, y = stream.data()
+            self.assertLessEqual(len(x), 1000 + stream.size)
+            self.assertEqual(y.max(), self.y[:start + 365].max())
+            self.assertEqual(x[-1], min(start + 364, 36499))
+        self.assertTrue(np.all(np.diff(x) > 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+import unittest
+from datetime import date
+
+import numpy as np
+
+from simulator.models import Simulator, SimpleUser, SimpleYearlyDeathGod, UserGenerator
+from simulator.population import Population
+from simulator.cohorts import CohortPopulation
+from tests.helpers import generate_population
+from simulator.demography import AgeIndex, AgeDeathGod, DailyDeathGod, death_probabilities, survivorship, pyramid_birthdates
+
+
+class TestDeathProbabilities(unittest.TestCase):
+    def test_death_probabilities_should_use_die_stat(self):
+        result = death_probabilities([0, 104, 130, -1])
+
+        np.testing.assert_allclose(result, [0.00322, 0.40808, 0.40808, 0])
+
+    def test_death_probabilities_should_be_prorated_to_days(self):
+        daily = death_probabilities([100], days=1)[0]
+
+        self.assertAlmostEqual(1 - (1 - daily) ** 365, 0.328455)
+
+
+class TestPyramidBirthdates(unittest.TestCase):
+    def test_survivorship_should_decrease_from_one(self):
+        result = survivorship()
+
+        self.assertEqual(result[0], 1)
+        self.assertTrue((np.diff(result) < 0).all())
+
+    def test_ages_should_follow_survivorship(self):
+        for today in (date(2020, 2, 29), date(2021, 2, 28), date(2021, 7, 14)):
+            birthdates = pyramid_birthdates(2000, today, np.random.default_rng(3))
+
+            weights = survivorship()
+            expected = np.random.default_rng(3).choice(len(weights), size=2000, p=weights / weights.sum())
+            ages = [SimpleUser(None, b).age(today) for b in birthdates.astype(date)]
+            self.assertEqual(ages, expected.tolist())
+
+
+class TestAgeIndex(unittest.TestCase):
+    def test_index_should_bucket_users_by_birth_year(self):
+        population = generate_population(3, date(2000, 5, 1))
+        population.add_users([3], date(1990, 1, 1))
+        population.append(SimpleUser(4, None))
+
+        index = AgeIndex(population)
+
+        self.assertEqual(sorted(index.buckets), [1990, 2000])
+        self.assertEqual(len(index), 4)
+
+    def test_update_should_index_new_users(self):
+        population = generate_population(3, date(2000, 5, 1))
+        index = AgeIndex(population)
+
+        population.add_users([3, 4], date(2001, 5, 1))
+        index.update()
+
+        self.assertEqual(index.buckets[2001][0].tolist(), [3, 4])
+
+    def test_draw_deaths_should_use_age_at_date(self):
+        population = generate_population(1000, date(2020, 6, 1))
+        index = AgeIndex(population)
+        rng = np.random.default_rng(0)
+
+        # Not born yet the day before birth, so nobody can die
+        before_birth = index.draw_deaths(date(2020, 5, 31), rng, days=36500)
+        at_birth = index.draw_deaths(date(2020, 6, 1), rng, days=36500)
+
+        self.assertEqual(len(before_birth), 0)
+        self.assertTrue(len(at_birth) > 200)
+
+    def test_draw_deaths_should_forget_dead_users(self):
+        population = generate_population(1000, date(1900, 1, 1))
+        index = AgeIndex(population)
+
+        dead = index.draw_deaths(date(2020, 1, 1), np.random.default_rng(0))
+
+        self.assertTrue(300 < len(dead) < 520)
+        self.assertEqual(len(index), 1000 - len(dead))
+
+
+class TestAgeDeathGod(unittest.TestCase):
+    def test_give_death_should_kill_old_users_more(self):
+        population = generate_population(10000, date(2020, 1, 1))
+        population.add_users(list(range(10000, 20000)), date(1920, 1, 1))
+        god = AgeDeathGod(np.random.default_rng(0))
+
+        population = god.give_death(population, date(2020, 6, 1))
+
+        young = (population.birthdates == np.datetime64("2020-01-01")).sum()
+        old = len(population) - young
+        self.assertTrue(young > 9900)
+        self.assertTrue(6000 < old < 7400)
+        self.assertEqual(population.positions(population.keys).tolist(), list(range(len(population))))
+
+    def test_give_death_should_ignore_users_removed_elsewhere(self):
+        population = generate_population(100, date(1900, 1, 1))
+        god = AgeDeathGod(np.random.default_rng(0))
+        god.give_death(population, date(2000, 1, 1), days=0)
+
+        population.remove(np.arange(50))
+        god.give_death(population, date(2010, 1, 1))
+
+        self.assertTrue(len(population) < 50)
+
+    def test_give_birth_should_add_indexed_users(self):
+        population = generate_population(10000, date(2000, 1, 1))
+        god = AgeDeathGod(np.random.default_rng(0))
+        god.give_death(population, date(2000, 1, 1), days=0)
+
+        god.give_birth(population, date(2020, 1, 1))
+        god.give_death(population, date(2020, 1, 1), days=0)
+
+        self.assertEqual(len(population), 10113)
+        self.assertEqual(len(god.index.buckets[2020][0]), 113)
+
+    def test_give_death_should_be_reproducible(self):
+        results = []
+        for _ in range(2):
+            population = generate_population(1000, date(1930, 1, 1))
+            AgeDeathGod(np.random.default_rng(3)).give_death(population, date(2020, 1, 1))
+            results.append(population.ids.tolist())
+
+        self.assertEqual(results[0], results[1])
+
+
+class TestDailyDeathGod(unittest.TestCase):
+    def run_year(self, god, population):
+        simulator = Simulator(date(2020, 1, 1), population)
+        for _ in range(365):
+            population = god.give_birth(population, simulator.current_date)
+            population = god.give_death(population)
+            simulator.new_day()
+        return population
+
+    def test_year_should_match_yearly_counts(self):
+        yearly = SimpleYearlyDeathGod()
+        for population in (Population(), CohortPopulation(), []):
+            if isinstance(population, list):
+                population.extend(UserGenerator.generate_users(date(2000, 1, 1), 10000))
+            else:
+                population.add_users(list(range(10000)), date(2000, 1, 1))
+
+            population = self.run_year(DailyDeathGod(), population)
+
+            expected = 10000 + yearly.how_much_born(10000) - yearly.how_much_die(10000)
+            self.assertAlmostEqual(len(population), expected, delta=2)
+
+    def test_give_death_should_kill_oldest_users_first(self):
+        population = Population()
+        population.add_users(list(range(20000)), date(2000, 1, 1))
+        god = DailyDeathGod()
+
+        population = self.run_year(god, population)
+
+        dead = 20000 - (population.keys < 20000).sum()
+        self.assertEqual(population.positions(np.arange(dead)).max(), -1)
+        self.assertTrue(np.all(population.positions(np.arange(dead, 20000)) >= 0))
+        self.assertEqual(god.next_key, dead)
+        self.assertEqual(population.positions(population.keys).tolist(), list(range(len(population))))
+        population.check_totals()
+
+    def test_restored_state_should_keep_carried_fractions(self):
+        god, restored = DailyDeathGod(), DailyDeathGod()
+        populations = [generate_population(1000, date(2000, 1, 1)) for _ in range(2)]
+        for _ in range(100):
+            god.give_birth(populations[0], date(2020, 1, 1))
+            god.give_death(populations[0])
+        populations[1] = populations[0].take(np.arange(len(populations[0])))
+
+        restored.setstate(god.getstate())
+        for _ in range(100):
+            for death_god, population in zip((god, restored), populations):
+                death_god.give_birth(population, date(2020, 1, 1))
+                death_god.give_death(population)
+
+        self.assertEqual(len(populations[1]), len(populations[0]))
+        self.assertEqual(restored.getstate(), god.getstate())
+        self.assertEqual(SimpleYearlyDeathGod().getstate(), {})
+
+    def test_give_death_should_skip_users_removed_elsewhere(self):
+        population = Population()
+        population.add_users(list(range(100000)), date(2000, 1, 1))
+        population.remove(np.arange(0, 100, 2))
+        god = DailyDeathGod()
+        god.death_carry = 0.99
+
+        god.give_death(population)
+
+        self.assertEqual(len(population), 99950 - 3)
+        self.assertEqual(population.positions([1, 3, 5, 7]).tolist(), [-1, -1, -1, 3])
+
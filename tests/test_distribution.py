@@ -0,0 +1,106 @@
+import unittest
+from datetime import date
+
+import numpy as np
+
+from simulator.models import Simulator, SimpleUser
+from simulator.population import Population
+from simulator.cohorts import CohortPopulation
+from simulator.sharding import ShardedPopulation
+from simulator.plotting import GrapheDrawer
+from simulator.distribution import LogHistogram, histogram_of, distribution_point, DISTRIBUTION_COLUMNS
+
+
+def exact_gini(values):
+    values = np.sort(np.asarray(values, dtype=np.float64))
+    n = len(values)
+    return float((2 * np.arange(1, n + 1) - n - 1).dot(values) / (n * values.sum()))
+
+
+class TestLogHistogram(unittest.TestCase):
+    def test_small_values_should_give_exact_gini_and_quantiles(self):
+        values = np.random.default_rng(0).integers(0, 1000, 10000)
+        histogram = LogHistogram().add(values)
+
+        self.assertAlmostEqual(histogram.gini(), exact_gini(values))
+        for q in (0.1, 0.5, 0.9):
+            self.assertEqual(histogram.quantile(q), np.percentile(values, q * 100, method="inverted_cdf"))
+
+    def test_large_values_should_be_within_bin_width(self):
+        values = np.random.default_rng(1).lognormal(10, 2, 100000).astype(np.int64)
+        histogram = LogHistogram().add(values)
+
+        self.assertAlmostEqual(histogram.gini(), exact_gini(values), delta=0.01)
+        for q in (0.1, 0.5, 0.9, 0.99):
+            exact = np.percentile(values, q * 100)
+            self.assertAlmostEqual(histogram.quantile(q) / exact, 1, delta=0.045)
+
+    def test_weights_and_merge_should_match_repeated_values(self):
+        weighted = LogHistogram().add([3, 5000], [2, 3])
+        merged = LogHistogram().add([3, 5000, 5000]).merge(LogHistogram().add([3, 5000]))
+
+        self.assertEqual(weighted.counts.tolist(), merged.counts.tolist())
+        self.assertEqual(weighted.sums.tolist(), merged.sums.tolist())
+        self.assertEqual(weighted.count(), 5)
+
+    def test_empty_histogram_should_return_zero(self):
+        self.assertEqual(LogHistogram().gini(), 0)
+        self.assertEqual(LogHistogram().quantile(0.5), 0)
+        self.assertEqual(LogHistogram().add([0, 0]).gini(), 0)
+
+
+class TestHistogramOf(unittest.TestCase):
+    def setUp(self):
+        self.population = Population()
+        self.population.add_numbered_users(50, date(2000, 1, 1))
+        simulator = Simulator(date(2020, 1, 1), self.population)
+        for day in range(40):
+            simulator.new_day()
+            self.population.guzi_wallet[day] = 0
+            self.population.total_accumulated[day] += 10 * day ** 3
+        self.population.recompute_totals()
+
+    def assertSameHistogram(self, first, second):
+        self.assertEqual(first.counts.tolist(), second.counts.tolist())
+        self.assertEqual(first.sums.tolist(), second.sums.tolist())
+
+    def test_user_list_should_match_population(self):
+        users = [SimpleUser(u.id, u.birthdate) for u in self.population]
+        for user, view in zip(users, self.population):
+            user.total_accumulated = view.total_accumulated
+            user.guzi_wallet = view.guzi_wallet
+
+        for name in ("total_accumulated", "guzi_wallet", "daily_guzis"):
+            self.assertSameHistogram(histogram_of(users, name), histogram_of(self.population, name))
+
+    def test_cohorts_should_match_population(self):
+        cohorts = CohortPopulation()
+        cohorts.extend(self.population)
+        cohorts.extend(self.population)
+        doubled = Population()
+        doubled.extend(self.population)
+        doubled.extend(self.population)
+
+        self.assertLess(cohorts.cohort_count(), len(cohorts))
+        for name in ("total_accumulated", "guzi_wallet", "daily_guzis"):
+            self.assertSameHistogram(histogram_of(cohorts, name), histogram_of(doubled, name))
+
+    def test_shards_should_merge_to_population(self):
+        with ShardedPopulation.split(self.population, [0, 1, 2], processes=False) as shards:
+            self.assertEqual(distribution_point(shards), distribution_point(self.population))
+
+    def test_graphe_drawer_should_add_distribution_columns(self):
+        graph_drawer = GrapheDrawer(Simulator(date(2020, 2, 10), self.population), distributions=True)
+        graph_drawer.add_point()
+
+        points = graph_drawer.points
+        for name in DISTRIBUTION_COLUMNS:
+            self.assertEqual(len(points[name]), 1)
+        daily_guzis = self.population.daily_guzis()
+        self.assertEqual(points["daily_guzis_p50"][0], np.percentile(daily_guzis, 50, method="inverted_cdf"))
+        self.assertAlmostEqual(points["gini_total_accumulated"][0], exact_gini(self.population.total_accumulated))
+        self.assertNotIn("gini_guzi_wallet", GrapheDrawer(None).points)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+import numpy as np
+
+from simulator.models import Simulator, SimpleYearlyDeathGod
+from simulator.population import Population
+from simulator.ensemble import Scenario, run_ensemble, run_member
+
+
+class TestEnsemble(unittest.TestCase):
+    def test_run_member_should_return_points(self):
+        scenario = Scenario(user_count=50, days=40, frequency=10)
+
+        points = run_member(scenario, np.random.SeedSequence(1))
+
+        self.assertEqual(points["date"][0], date(2020, 1, 1))
+        self.assertEqual(len(points["date"]), 5)
+
+    def test_results_should_not_depend_on_workers(self):
+        scenario = Scenario(user_count=100, days=60, frequency=20, mortality="age", company_count=3)
+
+        inline = run_ensemble(scenario, 4, seed=7, workers=1)
+        pooled = run_ensemble(scenario, 4, seed=7, workers=2)
+
+        self.assertEqual(inline.members, pooled.members)
+
+    def test_members_should_be_independent(self):
+        scenario = Scenario(user_count=100, days=60, frequency=20, trade=True)
+
+        result = run_ensemble(scenario, 3, seed=7, workers=1)
+
+        self.assertNotEqual(result.members[0], result.members[1])
+        self.assertNotEqual(result.members[1], result.members[2])
+
+    def test_members_should_not_trade_by_default_like_single_runs(self):
+        scenario = Scenario(user_count=100, days=400, frequency=100)
+        simulator = Simulator(scenario.start_date, Population())
+        simulator.user_pool.add_numbered_users(100, scenario.birthdate)
+        for days in (365, 35):
+            SimpleYearlyDeathGod().give_death(SimpleYearlyDeathGod().give_birth(simulator.user_pool))
+            simulator.new_days(days)
+
+        points = run_member(scenario, np.random.SeedSequence(1))
+        traded = run_member(scenario._replace(trade=True), np.random.SeedSequence(1))
+
+        self.assertEqual(points["guzis_on_road"][-1], simulator.guzis_on_road())
+        self.assertLess(traded["guzis_on_road"][-1], points["guzis_on_road"][-1])
+
+    def test_members_should_trade_with_companies_of_dead_founders(self):
+        scenario = Scenario(user_count=1000, days=800, frequency=100, company_count=20, trade=True)
+
+        points = run_member(scenario, np.random.SeedSequence(1))
+
+        self.assertEqual(points["date"][-1], date(2022, 3, 11))
+        self.assertNotEqual(points["user_count"][-1], 1000)
+
+    def test_series_should_have_ordered_bands(self):
+        scenario = Scenario(user_count=100, days=60, frequency=20, trade=True)
+
+        result = run_ensemble(scenario, 5, seed=3, workers=1)
+
+        series = result.series["guzis_on_road"]
+        self.assertEqual(len(series["mean"]), len(result.dates))
+        self.assertTrue((series["p5"] <= series["p50"]).all())
+        self.assertTrue((series["p50"] <= series["p95"]).all())
+        result.draw(["guzis_on_road", "user_count"])
+
+    def test_save_should_write_figure_file(self):
+        result = run_ensemble(Scenario(user_count=20, days=20, frequency=10), 2, seed=1, workers=1)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bands.svg")
+            result.save(["guzis_on_road"], path)
+
+            self.assertGreater(os.path.getsize(path), 0)
@@ -0,0 +1,63 @@
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from simulator.events import Scheduler
+from simulator.models import Simulator, SimpleUser
+
+
+class TestScheduler(unittest.TestCase):
+    def test_run_due_should_run_events_by_date_then_priority(self):
+        scheduler = Scheduler()
+        calls = []
+        scheduler.schedule(date(2000, 1, 2), lambda: calls.append("late"))
+        scheduler.schedule(date(2000, 1, 1), lambda: calls.append("second"), priority=1)
+        scheduler.schedule(date(2000, 1, 1), lambda: calls.append("first"))
+        scheduler.schedule(date(2000, 1, 1), lambda: calls.append("third"), priority=1)
+
+        scheduler.run_due(date(2000, 1, 1))
+
+        self.assertEqual(calls, ["first", "second", "third"])
+        self.assertEqual(scheduler.next_date(), date(2000, 1, 2))
+
+    def test_recurring_event_should_be_scheduled_again_until_cancelled(self):
+        scheduler = Scheduler()
+        calls = []
+        event = scheduler.schedule(date(2000, 1, 1), lambda: calls.append(1), every=7)
+
+        scheduler.run_due(date(2000, 1, 20))
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(scheduler.next_date(), date(2000, 1, 22))
+
+        event.cancel()
+        self.assertIsNone(scheduler.next_date())
+        self.assertEqual(len(scheduler), 0)
+
+    def test_schedule_should_raise_error_for_sub_daily_events(self):
+        with self.assertRaises(ValueError):
+            Scheduler().schedule(date(2000, 1, 1), print, every=0)
+
+
+class TestSimulatorRun(unittest.TestCase):
+    def test_run_should_skip_days_without_events(self):
+        simulator = Simulator(date(2000, 1, 1))
+        simulator.add_user(SimpleUser(1, date(2000, 1, 1)))
+        dates = []
+        simulator.schedule(lambda s: dates.append(s.current_date), every=10)
+
+        with patch.object(simulator, "new_days", wraps=simulator.new_days) as new_days:
+            simulator.run(25)
+
+        self.assertEqual([c.args[0] for c in new_days.call_args_list], [10, 10, 5])
+        self.assertEqual(dates, [date(2000, 1, 1), date(2000, 1, 11), date(2000, 1, 21)])
+        self.assertEqual(simulator.current_date, date(2000, 1, 26))
+        self.assertEqual(simulator.guzis_on_road(), 25)
+
+    def test_events_should_schedule_other_events(self):
+        simulator = Simulator(date(2000, 1, 1))
+        dates = []
+        simulator.schedule(lambda s: s.schedule(lambda s: dates.append(s.current_date)), date(2000, 1, 3))
+
+        simulator.run(5)
+
+        self.assertEqual(dates, [date(2000, 1, 3)])
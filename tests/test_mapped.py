@@ -0,0 +1,117 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+from datetime import date
+
+import numpy as np
+
+from simulator.models import Simulator, SimpleYearlyDeathGod
+from simulator.population import Population
+from simulator.mapped import MappedPopulation
+from simulator.demography import AgeDeathGod, DailyDeathGod, pyramid_birthdates
+from simulator.distribution import distribution_point
+from simulator.trading import BatchRandomTrader
+
+
+FIELDS = ("keys", "birthdates") + Population.FIELDS
+
+
+class TestMappedPopulation(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "population")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assertSamePopulation(self, mapped, population):
+        self.assertEqual(len(mapped), len(population))
+        for name in FIELDS:
+            self.assertEqual(getattr(mapped, name).tolist(), getattr(population, name).tolist(), name)
+        self.assertEqual((mapped.guzis_on_road, mapped.daily_guzis_total),
+                         (population.guzis_on_road, population.daily_guzis_total))
+        mapped.check_totals()
+
+    def run_both(self, death_god, days, trade=False):
+        """
+        Run the same simulation on a Population and on a MappedPopulation
+        of small chunks, and return them
+        """
+        birthdates = pyramid_birthdates(1000, date(2020, 1, 1), np.random.default_rng(0))
+        pools = [Population(), MappedPopulation(self.path, capacity=10, chunk_size=64)]
+        results = []
+        for pool in pools:
+            pool.add_numbered_users(1000, birthdates)
+            simulator = Simulator(date(2020, 1, 1), pool, seed=0)
+            god = death_god()
+            trader = BatchRandomTrader(pool, rng=np.random.default_rng(1))
+            for day in range(days):
+                if isinstance(god, DailyDeathGod) or day % 365 == 0:
+                    god.give_birth(pool, simulator.current_date, np.random.default_rng(day))
+                    if isinstance(god, AgeDeathGod):
+                        god.give_death(pool, simulator.current_date)
+                    else:
+                        god.give_death(pool)
+                simulator.new_day()
+                if trade:
+                    trader.trade_guzis()
+            results.append(pool)
+        return results
+
+    def test_yearly_demography_should_match_population(self):
+        population, mapped = self.run_both(SimpleYearlyDeathGod, 800)
+
+        self.assertSamePopulation(mapped, population)
+
+    def test_age_demography_and_trades_should_match_population(self):
+        population, mapped = self.run_both(lambda: AgeDeathGod(np.random.default_rng(2)), 400, trade=True)
+
+        self.assertSamePopulation(mapped, population)
+        self.assertEqual(distribution_point(mapped), distribution_point(population))
+
+    def test_daily_demography_should_match_population(self):
+        population, mapped = self.run_both(DailyDeathGod, 400)
+
+        self.assertSamePopulation(mapped, population)
+
+    def test_columns_should_be_files(self):
+        mapped = MappedPopulation(self.path, capacity=4)
+        mapped.add_numbered_users(10, date(2000, 1, 1))
+        mapped.remove([0, 5])
+        mapped.flush()
+
+        self.assertEqual(np.load(os.path.join(self.path, "ids.npy"))[:8].tolist(), [1, 2, 3, 4, 6, 7, 8, 9])
+        self.assertEqual(mapped.positions([0, 1, 9]).tolist(), [-1, 0, 7])
+        with self.assertRaises(ValueError):
+            mapped.add_users(["a"], date(2000, 1, 1))
+
+    def test_new_day_memory_should_depend_on_chunk_size(self):
+        peaks = []
+        for size in (100000, 400000):
+            mapped = MappedPopulation(os.path.join(self.path, str(size)), capacity=size, chunk_size=1000)
+            mapped.add_numbered_users(size, date(2000, 1, 1))
+            tracemalloc.start()
+            mapped.new_day(date(2020, 1, 1))
+            mapped.check_totals()
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        self.assertLess(peaks[1], 1000 * 8 * 20)
+        self.assertLess(peaks[1], 2 * peaks[0])
+
+    def test_add_numbered_users_memory_should_depend_on_chunk_size(self):
+        mapped = MappedPopulation(self.path, capacity=10, chunk_size=1000)
+        tracemalloc.start()
+        mapped.add_numbered_users(400000, date(2000, 1, 1))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.assertLess(peak, 1000 * 8 * 20)
+        self.assertEqual(mapped.positions([0, 399999]).tolist(), [0, 399999])
+        self.assertEqual(mapped.ids[-3:].tolist(), [399997, 399998, 399999])
+        self.assertTrue(mapped.anonymous_births)
+
+
+if __name__ == '__main__':
+    unittest.main()
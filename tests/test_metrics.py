@@ -0,0 +1,144 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from simulator.models import Simulator, GrapheDrawer, UserGenerator
+from simulator.metrics import MetricsSink, MemorySink, CsvSink, NpzSink, open_sink, read_points
+
+
+POINTS = [
+    {"date": date(2000, 1, 1), "user_count": 10, "average_daily_guzi": 1.0, "guzis_on_road": 0},
+    {"date": date(2000, 1, 2), "user_count": 11, "average_daily_guzi": 1.5, "guzis_on_road": 10},
+    {"date": date(2000, 1, 3), "user_count": 12, "average_daily_guzi": 2.0, "guzis_on_road": 21},
+]
+EXPECTED = {
+    "date": [date(2000, 1, 1), date(2000, 1, 2), date(2000, 1, 3)],
+    "user_count": [10, 11, 12],
+    "average_daily_guzi": [1.0, 1.5, 2.0],
+    "guzis_on_road": [0, 10, 21],
+}
+
+
+class TestMetricsSink(unittest.TestCase):
+    def test_sink_should_implement_write_and_read(self):
+        class WriteOnlySink(MetricsSink):
+            def write(self, point):
+                pass
+
+        with self.assertRaises(TypeError):
+            MetricsSink()
+        with self.assertRaises(TypeError):
+            WriteOnlySink()
+
+
+class TestMemorySink(unittest.TestCase):
+    def test_write_should_append_point_values(self):
+        sink = MemorySink()
+
+        for point in POINTS:
+            sink.write(point)
+
+        self.assertEqual(sink.read(), EXPECTED)
+
+
+class TestCsvSink(unittest.TestCase):
+    def test_points_should_be_read_back(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "points.csv")
+            sink = CsvSink(path)
+
+            for point in POINTS:
+                sink.write(point)
+            sink.close()
+
+            self.assertEqual(read_points(path), EXPECTED)
+
+    def test_full_chunks_should_be_on_disk_before_close(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "points.csv")
+            sink = CsvSink(path, chunk_size=2)
+
+            for point in POINTS:
+                sink.write(point)
+
+            self.assertEqual(read_points(path)["user_count"], [10, 11])
+            sink.close()
+
+    def test_resume_should_append_after_points_before_resume_date(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "points.csv")
+            sink = CsvSink(path)
+            for point in POINTS:
+                sink.write(point)
+            sink.close()
+
+            sink = open_sink(path, resume_date=date(2000, 1, 2))
+            for point in POINTS[1:]:
+                sink.write(point)
+            sink.close()
+
+            self.assertEqual(read_points(path), EXPECTED)
+
+
+class TestNpzSink(unittest.TestCase):
+    def test_points_should_be_read_back_from_chunks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "points")
+            sink = NpzSink(path, chunk_size=2)
+
+            for point in POINTS:
+                sink.write(point)
+            self.assertEqual(len(os.listdir(path)), 1)
+            sink.close()
+
+            self.assertEqual(len(os.listdir(path)), 2)
+            self.assertEqual(read_points(path), EXPECTED)
+
+    def test_read_should_not_save_partial_chunks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "points")
+            sink = NpzSink(path, chunk_size=2)
+
+            for point in POINTS:
+                sink.write(point)
+                sink.read()
+
+            self.assertEqual(len(os.listdir(path)), 1)
+            self.assertEqual(sink.read(), EXPECTED)
+            sink.close()
+            self.assertEqual(len(os.listdir(path)), 2)
+
+    def test_resume_should_keep_chunks_before_resume_date(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "points")
+            sink = NpzSink(path, chunk_size=2)
+            for point in POINTS:
+                sink.write(point)
+            sink.close()
+
+            sink = NpzSink(path, chunk_size=2, resume_date=date(2000, 1, 2))
+            self.assertEqual(read_points(path)["user_count"], [10])
+            for point in POINTS[1:]:
+                sink.write(point)
+            sink.close()
+
+            self.assertEqual(sorted(os.listdir(path)), ["points_000000.npz", "points_000001.npz"])
+            self.assertEqual(read_points(path), EXPECTED)
+
+
+class TestGrapheDrawerSink(unittest.TestCase):
+    def test_add_point_should_stream_to_sink(self):
+        simulator = Simulator(date(2000, 1, 1))
+        simulator.add_users(UserGenerator.generate_users(date(2000, 1, 1), 10))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "points.csv")
+            drawer = GrapheDrawer(simulator, open_sink(path))
+
+            drawer.add_point()
+            simulator.new_day()
+            drawer.add_point()
+            drawer.sink.close()
+
+            self.assertEqual(read_points(path)["guzis_on_road"], [0, 10])
+            self.assertEqual(drawer.points["date"], [date(2000, 1, 1), date(2000, 1, 2)])
@@ -1,12 +1,67 @@
+import pickle
+import sys
+import tracemalloc
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from datetime import date
-from guzi.models import GuziCreator, Company
 
+import numpy as np
+from guzi.models import GuziCreator, Company, User
+
+from simulator.models import DAILY_GUZIS_TABLE_SIZE, daily_guzis_of
 from simulator.models import Simulator, UserGenerator, SimpleYearlyDeathGod, GrapheDrawer, SimpleUser, SimpleCompany, RandomTrader, CompanyGenerator
 
 
+# A SimpleUser is 112 bytes on 64 bits CPython (10 slots and the object
+# header), against about 330 with a __dict__ and a balance dict
+MAX_USER_BYTES = 128
+
+
 class TestSimpleUser(unittest.TestCase):
+    def test_user_should_take_less_than_max_user_bytes(self):
+        ids = list(range(1000, 11000))
+        birthdate = date(2000, 1, 1)
+        # The first user allocates the caches of the class
+        SimpleUser(0, birthdate)
+        tracemalloc.start()
+        users = [SimpleUser(i, birthdate) for i in ids]
+        size = tracemalloc.get_traced_memory()[0] - sys.getsizeof(users)
+        tracemalloc.stop()
+
+        self.assertFalse(hasattr(users[0], "__dict__"))
+        self.assertLess(size / len(users), MAX_USER_BYTES)
+
+    def test_balance_should_map_income_and_outcome(self):
+        user = SimpleUser("", None)
+
+        user.balance["income"] += 3
+        user.balance = {"income": user.balance["income"], "outcome": 2}
+
+        self.assertEqual((user.income, user.outcome), (3, 2))
+        self.assertEqual(dict(user.balance), {"income": 3, "outcome": 2})
+        with self.assertRaises(KeyError):
+            user.balance["other"] = 1
+
+    def test_string_ids_should_be_interned(self):
+        first = SimpleUser("".join(["user", "-1"]), None)
+        second = SimpleUser("".join(["user", "-1"]), None)
+
+        self.assertIs(first.id, second.id)
+
+    def test_user_should_be_picklable(self):
+        user = SimpleUser(1, date(2000, 1, 1))
+        user.guzi_wallet = 4
+        user.balance["outcome"] = 2
+
+        copy = pickle.loads(pickle.dumps(user))
+
+        self.assertEqual((copy.id, copy.birthdate, copy.guzi_wallet, copy.balance["outcome"]), (1, date(2000, 1, 1), 4, 2))
+
+    def test_age_should_be_the_one_of_user(self):
+        user = SimpleUser(1, date(2000, 1, 1))
+
+        self.assertEqual(user.age(date(2010, 6, 1)), User(1, date(2000, 1, 1)).age(date(2010, 6, 1)))
+
     def test_daily_guzis(self):
         user = SimpleUser("", None)
         user.total_accumulated = 27
@@ -16,6 +71,22 @@ class TestSimpleUser(unittest.TestCase):
 
         self.assertEqual(result, expected)
 
+    def test_daily_guzis_should_follow_total_accumulated(self):
+        user = SimpleUser("", None)
+        self.assertEqual(user.daily_guzis(), 1)
+
+        user.total_accumulated += 8
+        self.assertEqual(user.daily_guzis(), 3)
+        user.spend_to(user, 0)
+        user.balance["income"] = 20
+        user.check_balance()
+        self.assertEqual(user.daily_guzis(), 4)
+
+    def test_daily_guzis_of_should_match_formula(self):
+        totals = list(range(DAILY_GUZIS_TABLE_SIZE - 1000, DAILY_GUZIS_TABLE_SIZE + 1000)) + [10**12 - 1, 10**12]
+
+        self.assertEqual([daily_guzis_of(t) for t in totals], [int(t ** (1/3) + 1) for t in totals])
+
     def test_outdate(self):
         user = SimpleUser("", None)
         user.guzi_wallet = 1
@@ -52,10 +123,28 @@ class TestSimpleUser(unittest.TestCase):
         self.assertEqual(user.guzi_wallet, 0)
         self.assertEqual(user.total_accumulated, 10)
 
+    def test_pay_count(self):
+        user = SimpleUser("", None)
+
+        user.pay_count(3)
+
+        self.assertEqual(user.balance["income"], 3)
+
     def test_spend_to_should_pay_target(self):
         source = SimpleUser("", None)
         source.guzi_wallet = 10
         target = SimpleUser("", None)
+
+        with patch.object(SimpleUser, "pay_count") as pay_count:
+            source.spend_to(target, 10)
+
+        pay_count.assert_called_with(10)
+        self.assertEqual(source.guzi_wallet, 0)
+
+    def test_spend_to_should_pay_guzis_to_target_without_pay_count(self):
+        source = SimpleUser("", None)
+        source.guzi_wallet = 10
+        target = User("", None)
         target.pay = MagicMock()
 
         source.spend_to(target, 10)
@@ -90,6 +179,17 @@ class TestSimpleUser(unittest.TestCase):
         self.assertEqual(user.guza_wallet, 0)
         self.assertEqual(user.balance["outcome"], 10)
 
+    def test_give_guzas_to_should_add_guza_count_to_simple_company(self):
+        user = SimpleUser("", None)
+        user.guza_wallet = 10
+        company = SimpleCompany("", [user])
+
+        user.give_guzas_to(company, 10)
+
+        self.assertEqual(company.guzi_wallet, 10)
+        self.assertEqual(user.guza_wallet, 0)
+        self.assertEqual(user.balance["outcome"], 10)
+
     def test_check_balance(self):
         user = SimpleUser("", None)
         user.balance["income"] = 10
@@ -133,6 +233,25 @@ class TestSimpleCompany(unittest.TestCase):
 
         self.assertEqual(company.guzi_wallet, 2)
 
+    def test_add_guza_count(self):
+        founders = [UserGenerator.generate_user(date(2000, 1, 1))]
+        company = SimpleCompany("", founders)
+
+        company.add_guza_count(2)
+
+        self.assertEqual(company.guzi_wallet, 2)
+
+    def test_spend_to_should_pay_count_to_simple_target(self):
+        founders = [UserGenerator.generate_user(date(2000, 1, 1))]
+        company = SimpleCompany("", founders)
+        company.guzi_wallet = 10
+        target = SimpleUser("", None)
+
+        company.spend_to(target, 10)
+
+        self.assertEqual(target.balance["income"], 10)
+        self.assertEqual(company.guzi_wallet, 0)
+
     def test_spend_to_should_raise_error_if_amount_is_negative(self):
         founders = [UserGenerator.generate_user(date(2000, 1, 1))]
         company = SimpleCompany("", founders)
@@ -151,7 +270,7 @@ class TestSimpleCompany(unittest.TestCase):
         founders = [UserGenerator.generate_user(date(2000, 1, 1))]
         company = SimpleCompany("", founders)
         company.guzi_wallet = 10
-        target = SimpleUser("", None)
+        target = User("", None)
         target.pay = MagicMock()
 
         company.spend_to(target, 10)
@@ -159,6 +278,30 @@ class TestSimpleCompany(unittest.TestCase):
         target.pay.assert_called_with([GuziCreator.create_guza(founders[0], date(2000, 1, 1), i) for i in range(10)])
         self.assertEqual(company.guzi_wallet, 0)
 
+    def test_pay_count_should_pay_engaged_users_first(self):
+        founders = [SimpleUser("f", None)]
+        engaged = [SimpleUser("a", None), SimpleUser("b", None)]
+        company = SimpleCompany("", founders)
+        company.add_engaged(engaged[0], 2)
+        company.add_engaged(engaged[1], 1)
+
+        company.pay_count(5)
+
+        self.assertEqual(engaged[0].balance["income"], 2)
+        self.assertEqual(engaged[1].balance["income"], 1)
+        self.assertEqual(founders[0].balance["income"], 2)
+        self.assertEqual(company.engaged_strategy.engaged_users, [])
+
+    def test_pay_count_should_share_profit_between_founders_in_turn(self):
+        founders = [SimpleUser("a", None), SimpleUser("b", None), SimpleUser("c", None)]
+        company = SimpleCompany("", founders)
+
+        company.pay_count(4)
+        company.pay_count(1)
+
+        self.assertEqual([f.balance["income"] for f in founders], [2, 2, 1])
+        self.assertEqual(company.engaged_strategy.founders_index, 2)
+
 
 class TestUserGenerator(unittest.TestCase):
     """
@@ -179,6 +322,27 @@ class TestUserGenerator(unittest.TestCase):
 
         self.assertIsInstance(user, SimpleUser)
 
+    def test_generate_users_should_be_reproducible_with_rng(self):
+        first = UserGenerator.generate_users(date(2000, 1, 1), 5, np.random.default_rng(1))
+        second = UserGenerator.generate_users(date(2000, 1, 1), 5, np.random.default_rng(1))
+
+        self.assertEqual([u.id for u in first], [u.id for u in second])
+        self.assertEqual(len(set(u.id for u in first)), 5)
+
+    def test_generate_random_user_should_be_reproducible_with_rng(self):
+        first = UserGenerator.generate_random_user(rng=np.random.default_rng(1))
+        second = UserGenerator.generate_random_user(rng=np.random.default_rng(1))
+
+        self.assertEqual(first.birthdate, second.birthdate)
+
+    def test_generate_birthdates_should_draw_an_array_in_range(self):
+        birthdates = UserGenerator.generate_birthdates(1000, date(2000, 1, 1), date(2000, 1, 11), np.random.default_rng(1))
+
+        self.assertEqual(birthdates.dtype, np.dtype("datetime64[D]"))
+        self.assertEqual(set(birthdates.astype(date)), {date(2000, 1, d) for d in range(1, 11)})
+        np.testing.assert_array_equal(
+            birthdates, UserGenerator.generate_birthdates(1000, date(2000, 1, 1), date(2000, 1, 11), np.random.default_rng(1)))
+
     def test_generate_random_adult_user(self):
         users = []
 
@@ -232,6 +396,75 @@ class TestSimulator(unittest.TestCase):
         for i in range(10):
             self.assertEqual(simulator.user_pool[i].total_accumulated, 1)
 
+    def test_new_day_should_check_balance_of_paid_users_only(self):
+        simulator = Simulator(date(2000, 1, 1))
+        simulator.add_users([SimpleUser(i, date(2000, 1, 1)) for i in range(3)])
+        users = simulator.user_pool
+
+        with patch.object(SimpleUser, "check_balance", autospec=True) as check_balance:
+            simulator.new_day()
+            self.assertEqual(check_balance.call_count, 3)
+            simulator.new_day()
+            self.assertEqual(check_balance.call_count, 3)
+            users[0].spend_to(users[1], 1)
+            simulator.new_day()
+            check_balance.assert_called_with(users[1])
+            self.assertEqual(check_balance.call_count, 4)
+            # New users are checked once, without the others
+            simulator.add_user(SimpleUser(3, date(2000, 1, 1)))
+            simulator.new_day()
+            self.assertEqual(check_balance.call_count, 5)
+            check_balance.assert_called_with(users[3])
+
+        users[0].spend_to(users[1], 1)
+        users[2].balance["income"] = 5
+        simulator.new_day()
+        self.assertEqual((users[1].total_accumulated, users[2].total_accumulated), (2, 5))
+
+    def test_new_day_should_only_check_new_users_after_removals(self):
+        simulator = Simulator(date(2000, 1, 1))
+        simulator.add_users([SimpleUser(i, date(2000, 1, 1)) for i in range(4)])
+        users = simulator.user_pool
+        simulator.new_day()
+
+        with patch.object(SimpleUser, "check_balance", autospec=True) as check_balance:
+            del users[:2]
+            simulator.add_user(SimpleUser(4, date(2000, 1, 1)))
+            simulator.new_day()
+            check_balance.assert_called_once_with(users[2])
+            # A new list gets all users checked once
+            simulator.user_pool = list(users)
+            simulator.new_day()
+            self.assertEqual(check_balance.call_count, 4)
+
+    def test_new_day_should_check_newborns_replacing_as_many_dead(self):
+        totals = []
+        for full_check in (False, True):
+            simulator = Simulator(date(2000, 1, 1))
+            simulator.add_users([SimpleUser(i, date(2000, 1, 1)) for i in range(50)])
+            trader = RandomTrader(simulator.user_pool, rng=np.random.default_rng(0))
+            for day in range(60):
+                # As many births as deaths : the list size doesn't change
+                del simulator.user_pool[:2]
+                simulator.add_users([SimpleUser(100 + 2 * day + i, date(2000, 1, 1)) for i in range(2)])
+                trader.trade_guzis()
+                if full_check:
+                    simulator.track_users()
+                simulator.new_day()
+            totals.append([u.total_accumulated for u in simulator.user_pool])
+
+        self.assertEqual(totals[0], totals[1])
+
+    def test_user_copy_should_not_keep_dirty_set(self):
+        simulator = Simulator(date(2000, 1, 1))
+        simulator.add_user(SimpleUser(1, date(2000, 1, 1)))
+        simulator.new_day()
+
+        copy = pickle.loads(pickle.dumps(simulator.user_pool[0]))
+
+        self.assertIs(simulator.user_pool[0].dirty_set, simulator.dirty_users)
+        self.assertIsNone(copy.dirty_set)
+
     def test_new_day_must_check_outdated_guzis_of_all_users(self):
         """
         new_day should move Guzis in guzi_wallet older than 30 days to the
@@ -311,6 +544,23 @@ class TestSimulator(unittest.TestCase):
             self.assertEqual(simulator.user_pool[i].guzi_wallet, 3)
             self.assertEqual(simulator.user_pool[i].guza_wallet, 3)
 
+    def test_seed_should_give_reproducible_independent_streams(self):
+        first = Simulator(date(2000, 1, 1), seed=42)
+        second = Simulator(date(2000, 1, 1), seed=42)
+
+        draws = {name: rng.random(3).tolist() for name, rng in first.rngs.items()}
+
+        self.assertEqual(draws, {name: rng.random(3).tolist() for name, rng in second.rngs.items()})
+        self.assertEqual(len(set(tuple(d) for d in draws.values())), len(Simulator.STREAMS))
+
+    def test_spawn_seeds_should_not_overlap(self):
+        simulator = Simulator(date(2000, 1, 1), seed=42)
+
+        seeds = simulator.spawn_seeds(2) + simulator.spawn_seeds(1)
+
+        draws = [np.random.default_rng(s).random() for s in seeds]
+        self.assertEqual(len(set(draws)), 3)
+
     def test_new_days(self):
         """
         Running new_days(15) should increase guzi_wallet & guza_wallet of 
@@ -478,6 +728,28 @@ class TestRandomTrader(unittest.TestCase):
         for u in user_pool[1:]:
             self.assertEqual(u.guzi_wallet, 0)
 
+    def test_trade_guzis_should_make_no_trade_for_users_with_a_single_guzi(self):
+        user_pool = UserGenerator.generate_users(date(2000, 1, 1), 5)
+        for u in user_pool:
+            u.guzi_wallet = 1
+        trader = RandomTrader(user_pool)
+
+        trader.trade_guzis()
+
+        self.assertEqual([u.guzi_wallet for u in user_pool], [1] * 5)
+
+    def test_trade_guzis_should_make_entities_with_two_guzis_pay_one(self):
+        user_pool = UserGenerator.generate_users(date(2000, 1, 1), 5)
+        company_pool = CompanyGenerator.create_company_pool(2, user_pool)
+        for e in user_pool + company_pool:
+            e.guzi_wallet = 2
+        company_pool[0].guzi_wallet = 1
+        trader = RandomTrader(user_pool, company_pool, np.random.default_rng(0))
+
+        trader.trade_guzis()
+
+        self.assertEqual([e.guzi_wallet for e in user_pool + company_pool], [1] * 7)
+
     def test_trade_guzis_with_count_should_reduce_N_guzi_wallets(self):
         user_pool = UserGenerator.generate_users(date(2000, 1, 1), 10)
         trader = RandomTrader(user_pool)
@@ -516,6 +788,20 @@ class TestRandomTrader(unittest.TestCase):
 
         self.assertEqual(len(companies_who_spended), 4)
 
+    def test_trade_guzis_should_be_reproducible_with_rng(self):
+        wallets = []
+        for _ in range(2):
+            user_pool = UserGenerator.generate_users(date(2000, 1, 1), 10, np.random.default_rng(0))
+            company_pool = CompanyGenerator.create_company_pool(3, user_pool, np.random.default_rng(1))
+            for u in user_pool:
+                u.guzi_wallet = 20
+            trader = RandomTrader(user_pool, company_pool, np.random.default_rng(2))
+
+            trader.trade_guzis()
+            wallets.append([u.guzi_wallet for u in user_pool] + [u.balance["income"] for u in user_pool])
+
+        self.assertEqual(wallets[0], wallets[1])
+
     def test_trade_guzas_should_raise_error_if_user_pool_is_empty(self):
         trader = RandomTrader([])
 
@@ -540,6 +826,18 @@ class TestRandomTrader(unittest.TestCase):
         for u in user_pool[1:]:
             self.assertEqual(u.guza_wallet, 0)
 
+    def test_trade_guzas_should_make_no_trade_for_users_with_a_single_guza(self):
+        user_pool = UserGenerator.generate_users(date(2000, 1, 1), 5)
+        company_pool = CompanyGenerator.create_company_pool(2, user_pool)
+        for u in user_pool:
+            u.guza_wallet = 1
+        user_pool[0].guza_wallet = 2
+        trader = RandomTrader(user_pool, company_pool)
+
+        trader.trade_guzas()
+
+        self.assertEqual([u.guza_wallet for u in user_pool], [1] * 5)
+
     def test_trade_guzas_without_count_should_reduce_N_guza_wallets(self):
         user_pool = UserGenerator.generate_users(date(2000, 1, 1), 10)
         company_pool = CompanyGenerator.create_company_pool(4, user_pool)
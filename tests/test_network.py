@@ -0,0 +1,90 @@
+import os
+import pickle
+import tempfile
+import unittest
+from datetime import date
+
+import numpy as np
+
+from simulator.models import CompanyGenerator
+from simulator.network import TradeNetwork, NetworkTrader, local_edges, preferential_edges, company_edges
+from tests.helpers import generate_population
+
+
+
+class TestTradeNetwork(unittest.TestCase):
+    def test_from_edges_should_build_undirected_csr(self):
+        network = TradeNetwork.from_edges(4, [0, 0, 1, 2, 3], [1, 1, 0, 2, 0])
+
+        self.assertEqual(network.indptr.tolist(), [0, 2, 3, 3, 4])
+        self.assertEqual(network.neighbours(0).tolist(), [1, 3])
+        self.assertEqual(network.neighbours(2).tolist(), [])
+        self.assertEqual(network.degrees().tolist(), [2, 1, 0, 1])
+
+    def test_from_edges_should_raise_error_for_unknown_node(self):
+        with self.assertRaises(ValueError):
+            TradeNetwork.from_edges(2, [0], [2])
+
+    def test_local_edges_should_link_nearby_rows(self):
+        network = TradeNetwork.from_edges(10, *local_edges(10, 4))
+
+        self.assertEqual(network.degrees().tolist(), [4] * 10)
+        self.assertEqual(network.neighbours(0).tolist(), [1, 2, 8, 9])
+
+    def test_preferential_edges_should_favour_early_nodes(self):
+        sources, targets = preferential_edges(10000, 2, np.random.default_rng(0))
+
+        self.assertEqual(len(sources), (10000 - 2) * 2)
+        self.assertTrue((targets < sources).all())
+        self.assertTrue((targets >= 0).all())
+        degrees = TradeNetwork.from_edges(10000, sources, targets).degrees()
+        self.assertGreater(degrees[:10].mean(), 10 * degrees[-1000:].mean())
+
+    def test_company_edges_should_link_founders(self):
+        population = generate_population(20, wallet=10)
+        company_pool = CompanyGenerator.create_company_pool(2, population, np.random.default_rng(0))
+
+        network = TradeNetwork.from_edges(22, *company_edges(population, company_pool))
+
+        strategy = company_pool[1].engaged_strategy
+        founders = [strategy.users[f].key for f in strategy.founders]
+        self.assertEqual(network.neighbours(21).tolist(), sorted(set(founders)))
+
+    def test_loaded_network_should_be_read_only_and_pickled_by_path(self):
+        network = TradeNetwork.from_edges(1000, *local_edges(1000, 6))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "network")
+            network.save(path)
+            loaded = TradeNetwork.load(path)
+            data = pickle.dumps(loaded)
+            copy = pickle.loads(data)
+
+            self.assertIsInstance(loaded.indices, np.memmap)
+            self.assertFalse(loaded.indices.flags.writeable)
+            self.assertLess(len(data), 1000)
+            self.assertEqual(copy.indices.tolist(), network.indices.tolist())
+
+
+class TestNetworkTrader(unittest.TestCase):
+    def test_trade_guzis_should_only_pay_neighbours(self):
+        population = generate_population(6, wallet=10)
+        # Two separate triangles and an isolated user
+        network = TradeNetwork.from_edges(7, [0, 1, 2, 3, 4, 5], [1, 2, 0, 4, 5, 3])
+        population.add_numbered_users(1, date(2000, 1, 1))
+        population.set_value(6, "guzi_wallet", 10)
+        trader = NetworkTrader(population, network, rng=np.random.default_rng(0))
+
+        trader.trade_guzis()
+
+        paid = 10 - population.guzi_wallet
+        self.assertEqual(paid[:3].sum(), population.income[:3].sum())
+        self.assertEqual(paid[3:6].sum(), population.income[3:6].sum())
+        self.assertEqual((paid[6], population.income[6]), (0, 0))
+        population.check_totals()
+
+    def test_trade_guzis_should_raise_error_if_network_does_not_match(self):
+        trader = NetworkTrader(generate_population(5, wallet=10), TradeNetwork.from_edges(4, [0], [1]))
+
+        with self.assertRaises(ValueError):
+            trader.trade_guzis()
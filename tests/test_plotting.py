@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from datetime import date
+
+from matplotlib.figure import Figure
+
+from simulator.models import Simulator, SimpleUser
+from simulator.plotting import GrapheDrawer
+from simulator.metrics import MemorySink, NpzSink
+from simulator.bench import measure_import
+
+# Seconds to import the core modules : about 0.15 (mostly numpy) on one
+# CPU core, generous enough for slow CI machines
+IMPORT_BUDGET = 2.0
+
+
+class TestPlotting(unittest.TestCase):
+    def test_core_import_should_not_load_matplotlib(self):
+        result = measure_import()
+
+        self.assertFalse(result["matplotlib"])
+        self.assertLess(result["seconds"], IMPORT_BUDGET)
+
+    def test_save_should_write_png_and_svg_files(self):
+        simulator = Simulator(date(2000, 1, 1))
+        simulator.add_users([SimpleUser(i, date(2000, 1, 1)) for i in range(5)])
+        drawer = GrapheDrawer(simulator)
+        for _ in range(3):
+            drawer.add_point()
+            simulator.new_day()
+        drawer.add_graph("date", "guzis_on_road")
+        drawer.add_graph("date", "user_count")
+
+        with tempfile.TemporaryDirectory() as directory:
+            drawer.save(os.path.join(directory, "graph.png"))
+            drawer.save(os.path.join(directory, "graph.svg"))
+
+            with open(os.path.join(directory, "graph.png"), "rb") as f:
+                self.assertEqual(f.read(8), b"\x89PNG\r\n\x1a\n")
+            with open(os.path.join(directory, "graph.svg")) as f:
+                self.assertIn("<svg", f.read())
+
+    def test_save_should_raise_error_if_no_graph_set(self):
+        with self.assertRaises(ValueError):
+            GrapheDrawer(None).save("graph.png")
+
+    def test_plot_should_decimate_long_series(self):
+        drawer = GrapheDrawer(None, MemorySink({"date": list(range(10000)), "user_count": list(range(10000))}), max_points=100)
+        drawer.add_graph("date", "user_count")
+
+        drawer._plot(Figure())
+        self.assertEqual(len(drawer.lines[0][0].get_xdata()), 100)
+
+        drawer.decimation = None
+        drawer._plot(Figure())
+        self.assertEqual(len(drawer.lines[0][0].get_xdata()), 10000)
+
+    def test_refresh_should_add_new_points_to_live_figure(self):
+        simulator = Simulator(date(2000, 1, 1))
+        simulator.add_users([SimpleUser(i, date(2000, 1, 1)) for i in range(5)])
+        drawer = GrapheDrawer(simulator, max_points=10)
+        drawer.add_graph("date", "guzis_on_road")
+        drawer.add_graph("date", "user_count")
+        with self.assertRaises(ValueError):
+            drawer.refresh()
+        drawer.add_point()
+
+        plt = drawer.draw_live()
+        for _ in range(50):
+            simulator.new_day()
+            drawer.add_point()
+            drawer.refresh()
+        plt.close("all")
+
+        line, axis = drawer.lines[0]
+        self.assertLessEqual(len(line.get_xdata()), 10 + drawer.live["streams"][0].size)
+        self.assertEqual(line.get_ydata()[-1], simulator.guzis_on_road())
+        self.assertGreaterEqual(axis.get_ylim()[1], max(line.get_ydata()))
+
+    def test_refresh_should_not_read_the_sink(self):
+        simulator = Simulator(date(2000, 1, 1))
+        simulator.add_users([SimpleUser(i, date(2000, 1, 1)) for i in range(5)])
+        with tempfile.TemporaryDirectory() as directory:
+            drawer = GrapheDrawer(simulator, NpzSink(directory, chunk_size=100))
+            drawer.add_graph("date", "guzis_on_road")
+            drawer.add_point()
+
+            plt = drawer.draw_live()
+            with patch.object(drawer.sink, "read") as read:
+                for _ in range(30):
+                    simulator.new_day()
+                    drawer.add_point()
+                    drawer.refresh()
+            plt.close("all")
+            drawer.sink.close()
+
+            read.assert_not_called()
+
+            self.assertEqual(os.listdir(directory), ["points_000000.npz"])
+            self.assertEqual(len(drawer.points["date"]), 31)
+            self.assertEqual(drawer.lines[0][0].get_ydata()[-1], simulator.guzis_on_road())
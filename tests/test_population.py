@@ -0,0 +1,311 @@
+import random
+import unittest
+from datetime import date, timedelta
+
+import numpy as np
+from guzi.models import User
+
+from simulator.models import Simulator, UserGenerator, SimpleUser, SimpleYearlyDeathGod
+from simulator.population import Population, UserView, daily_guzis
+from simulator.trading import BatchRandomTrader
+
+
+def random_users(count):
+    users = UserGenerator.generate_users(date(2000, 1, 1), count)
+    for u in users:
+        u.guzi_wallet = random.randrange(0, 500)
+        u.guza_wallet = random.randrange(0, 500)
+        u.total_accumulated = random.randrange(0, 100000)
+        u.balance["income"] = random.randrange(0, 50)
+        u.balance["outcome"] = random.randrange(0, 50)
+    return users
+
+
+def copy_user(user):
+    copy = SimpleUser(user.id, user.birthdate)
+    copy.guzi_wallet = user.guzi_wallet
+    copy.guza_wallet = user.guza_wallet
+    copy.total_accumulated = user.total_accumulated
+    copy.guza_trashbin = user.guza_trashbin
+    copy.balance = dict(user.balance)
+    return copy
+
+
+class TestDailyGuzis(unittest.TestCase):
+    def test_daily_guzis_should_match_simple_user_formula(self):
+        totals = list(range(0, 200000)) + [random.randrange(0, 10**15) for _ in range(10000)]
+
+        result = daily_guzis(np.array(totals))
+
+        expected = [int(t ** (1/3) + 1) for t in totals]
+        self.assertEqual(result.tolist(), expected)
+
+
+class TestPopulation(unittest.TestCase):
+    def test_append_should_copy_user_state(self):
+        population = Population()
+        user = SimpleUser("a", date(2000, 1, 1))
+        user.guzi_wallet = 3
+        user.balance["income"] = 2
+
+        population.append(user)
+
+        self.assertEqual(len(population), 1)
+        self.assertEqual(population[0].id, "a")
+        self.assertEqual(population[0].birthdate, date(2000, 1, 1))
+        self.assertEqual(population[0].guzi_wallet, 3)
+        self.assertEqual(population[0].balance["income"], 2)
+
+    def test_append_should_grow_capacity(self):
+        population = Population(capacity=2)
+
+        population.extend(UserGenerator.generate_users(None, 10))
+
+        self.assertEqual(len(population), 10)
+        self.assertIsNone(population[9].birthdate)
+
+    def test_add_numbered_users_should_use_keys_as_ids(self):
+        population = Population()
+        population.add_users(["a"], date(2000, 1, 1))
+
+        population.add_numbered_users(3, np.array(["2001-01-01", "2002-01-01", "2003-01-01"], dtype="datetime64[D]"))
+
+        self.assertEqual(population.ids.tolist(), ["a", 1, 2, 3])
+        self.assertEqual(population[2].birthdate, date(2002, 1, 1))
+        self.assertEqual(population.daily_guzis_total, 4)
+        population.check_totals()
+
+    def test_view_should_write_in_arrays(self):
+        population = Population()
+        population.add_users(["a", "b"], date(2000, 1, 1))
+
+        population[1].guza_wallet = 4
+        population[1].balance["outcome"] += 2
+
+        self.assertIsInstance(population[1], UserView)
+        self.assertEqual(population.guza_wallet.tolist(), [0, 4])
+        self.assertEqual(population.outcome.tolist(), [0, 2])
+
+    def test_view_should_support_simple_user_methods(self):
+        population = Population()
+        population.add_users(["a", "b"], date(2000, 1, 1))
+        population[0].guzi_wallet = 10
+
+        population[0].spend_to(population[1], 4)
+
+        self.assertEqual(population.guzi_wallet.tolist(), [6, 0])
+        self.assertEqual(population.income.tolist(), [0, 4])
+
+    def test_view_spending_to_another_view_of_itself_should_pay_itself(self):
+        population = Population()
+        population.add_users(["a", "b"], date(2000, 1, 1))
+        population[0].guzi_wallet = 10
+
+        population[0].spend_to(population[0], 4)
+
+        self.assertEqual(population.guzi_wallet.tolist(), [6, 0])
+        self.assertEqual(population.total_accumulated.tolist(), [4, 0])
+        self.assertEqual(population.income.tolist(), [0, 0])
+
+    def test_slice_should_return_a_copy(self):
+        population = Population()
+        population.add_users(["a", "b", "c"], date(2000, 1, 1))
+        population[2].guzi_wallet = 7
+
+        sliced = population[1:]
+        sliced[0].guzi_wallet = 5
+
+        self.assertEqual(sliced.ids.tolist(), ["b", "c"])
+        self.assertEqual(sliced.guzi_wallet.tolist(), [5, 7])
+        self.assertEqual(population.guzi_wallet.tolist(), [0, 0, 7])
+
+    def test_remove_should_keep_order_and_update_positions(self):
+        population = Population()
+        population.add_users(["a", "b", "c", "d"], date(2000, 1, 1))
+        population[3].guzi_wallet = 4
+
+        population.remove([0, 2])
+
+        self.assertEqual(population.ids.tolist(), ["b", "d"])
+        self.assertEqual(population.guzi_wallet.tolist(), [0, 4])
+        self.assertEqual(population.positions([0, 1, 2, 3]).tolist(), [-1, 0, -1, 1])
+
+    def test_swap_remove_should_move_last_users_and_update_positions(self):
+        population = Population(exact_expiry=True)
+        population.add_users(["a", "b", "c", "d", "e", "f"], date(2000, 1, 1))
+        Simulator(date(2000, 1, 1), population).new_day()
+        population[4].guzi_wallet = 4
+        view = population[4]
+
+        population.swap_remove([1, 0, 5, 1])
+
+        self.assertEqual(population.ids.tolist(), ["d", "e", "c"])
+        self.assertEqual(population.guzi_wallet.tolist(), [1, 4, 1])
+        self.assertEqual(population.positions(np.arange(6)).tolist(), [-1, -1, 2, 0, 1, -1])
+        self.assertEqual(population.slots["guzi_wallet"][:, :6].sum(axis=0).tolist(), [1, 4, 1, 0, 0, 0])
+        self.assertEqual(view.id, "e")
+        population.check_totals()
+
+    def test_paying_a_removed_user_should_lose_the_guzis(self):
+        population = Population()
+        population.add_users(["a", "b"], date(2000, 1, 1))
+        removed = population[0]
+
+        population.remove([0])
+        removed.pay_count(3)
+
+        self.assertTrue(removed.removed)
+        self.assertEqual(population.income.tolist(), [0])
+        with self.assertRaises(ValueError):
+            removed.income
+
+    def test_first_user_should_be_found_by_key(self):
+        population = Population()
+        population.add_users(["a", "b", "c", "d"], date(2000, 1, 1))
+
+        population.swap_remove([0])
+
+        self.assertEqual(population[0].id, "d")
+        self.assertEqual(population.first_user().id, "b")
+        population.remove([0, 1, 2])
+        with self.assertRaises(IndexError):
+            population.first_user()
+
+    def test_view_should_follow_its_user_after_removals(self):
+        population = Population()
+        population.add_users(["a", "b", "c"], date(2000, 1, 1))
+        view = population[2]
+        removed = population[0]
+
+        population.remove([0])
+
+        self.assertEqual(view.id, "c")
+        with self.assertRaises(ValueError):
+            removed.guzi_wallet
+
+    def test_index_out_of_range_should_raise_error(self):
+        population = Population()
+
+        with self.assertRaises(IndexError):
+            population[0]
+
+    def test_new_day_should_match_simple_users(self):
+        users = random_users(300)
+        population = Population()
+        population.extend(users)
+        users = [copy_user(u) for u in users]
+        object_simulator = Simulator(date(2000, 1, 1))
+        object_simulator.add_users(users)
+        population_simulator = Simulator(date(2000, 1, 1), population)
+
+        object_simulator.new_days(40)
+        population_simulator.new_days(40)
+
+        self.assertEqual(population_simulator.current_date, object_simulator.current_date)
+        for u, v in zip(users, population):
+            self.assertEqual(
+                (u.guzi_wallet, u.guza_wallet, u.total_accumulated, u.guza_trashbin, u.balance["income"], u.balance["outcome"]),
+                (v.guzi_wallet, v.guza_wallet, v.total_accumulated, v.guza_trashbin, v.balance["income"], v.balance["outcome"]))
+
+    def test_death_god_should_work_on_population(self):
+        god = SimpleYearlyDeathGod()
+        population = Population()
+        population.extend(UserGenerator.generate_users(None, 1000))
+
+        population = god.give_birth(population)
+        population = god.give_death(population)
+
+        self.assertIsInstance(population, Population)
+        self.assertEqual(len(population), 1002)
+
+
+class TestPopulationTotals(unittest.TestCase):
+    def test_running_totals_should_follow_new_day_and_views(self):
+        population = Population()
+        population.extend(random_users(100))
+        population.add_users(["a", "b"], None)
+        simulator = Simulator(date(2000, 1, 1), population, debug=True)
+
+        simulator.new_days(35)
+        population[0].spend_to(population[1], population[0].guzi_wallet)
+        population[2].spend_to(population[2], population[2].guzi_wallet)
+        population.remove([3, 4])
+
+        population.check_totals()
+        self.assertEqual(simulator.guzis_on_road(), population.guzi_wallet.sum())
+        self.assertEqual(simulator.daily_guzis_total(), population.daily_guzis().sum())
+
+    def test_check_totals_should_raise_error_on_direct_array_write(self):
+        population = Population()
+        population.add_users(["a"], None)
+        population.guzi_wallet[0] = 10
+        simulator = Simulator(date(2000, 1, 1), population, debug=True)
+
+        with self.assertRaises(RuntimeError):
+            simulator.guzis_on_road()
+
+        population.recompute_totals()
+        self.assertEqual(simulator.guzis_on_road(), 10)
+
+
+class TestExactExpiry(unittest.TestCase):
+    def state_of(self, user):
+        return tuple(len(getattr(user, name)) for name in ("guzi_wallet", "guza_wallet", "total_accumulated", "guza_trashbin"))
+
+    def test_guzis_should_expire_like_python_guzi_users(self):
+        users = [User("a", date(2000, 1, 1)), User("b", date(2000, 1, 1))]
+        population = Population(exact_expiry=True)
+        population.add_users(["a", "b"], date(2000, 1, 1))
+
+        for day in range(100):
+            current_date = date(2020, 1, 1) + timedelta(days=day)
+            for user in users:
+                user.check_balance()
+                user.check_outdated_guzis(current_date)
+                user.create_daily_guzis(current_date)
+            population.new_day(current_date)
+            if day % 7 == 3:
+                users[0].spend_to(users[1], 3)
+                population[0].spend_to(population[1], 3)
+            if day % 11 == 5:
+                users[1].spend_to(users[1], 2)
+                view = population[1]
+                view.spend_to(view, 2)
+
+            self.assertEqual([self.state_of(u) for u in users], [
+                (v.guzi_wallet, v.guza_wallet, v.total_accumulated, v.guza_trashbin) for v in population])
+        population.check_totals()
+
+    def test_spend_should_take_oldest_guzis_first(self):
+        population = Population(exact_expiry=True)
+        population.add_users(["a"], None)
+        for day in range(3):
+            population.new_day(date(2020, 1, 1) + timedelta(days=day))
+
+        population[0].guzi_wallet -= 1
+        population.new_day(date(2020, 1, 31))
+        self.assertEqual(population[0].total_accumulated, 0)
+        population.new_day(date(2020, 2, 1))
+
+        # The day 1 Guzi was spent, the day 2 one expired
+        self.assertEqual(population[0].total_accumulated, 1)
+        self.assertEqual(population[0].guzi_wallet, 4)
+        population.check_totals()
+
+    def test_trades_and_removals_should_keep_slots(self):
+        population = Population(exact_expiry=True)
+        population.add_numbered_users(200, date(2000, 1, 1))
+        simulator = Simulator(date(2020, 1, 1), population)
+        trader = BatchRandomTrader(population, rng=np.random.default_rng(0))
+
+        for day in range(60):
+            simulator.new_day()
+            trader.trade_guzis()
+            if day % 20 == 0:
+                population.remove([0, 7])
+        half = population.take(np.arange(0, len(population), 2))
+
+        population.check_totals()
+        half.check_totals()
+        self.assertEqual(half.day, population.day)
+        self.assertGreater(population.guza_trashbin.sum(), 0)
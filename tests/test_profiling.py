@@ -0,0 +1,73 @@
+import unittest
+from datetime import date
+
+from simulator.models import Simulator, UserGenerator
+from simulator.population import Population
+from simulator.profiling import Profiler, phase
+
+
+NEW_DAY_PHASES = {"check_balance", "check_outdated_guzis", "create_daily_guzis"}
+
+
+class TestProfiler(unittest.TestCase):
+    def test_phase_should_add_time_and_calls(self):
+        profiler = Profiler()
+
+        for _ in range(3):
+            with profiler.phase("a"):
+                pass
+        profiler.add("b", 2.5, calls=2)
+
+        stats = profiler.stats()
+        self.assertEqual(stats["a"]["calls"], 3)
+        self.assertGreaterEqual(stats["a"]["seconds"], 0)
+        self.assertEqual(stats["b"], {"calls": 2, "seconds": 2.5})
+
+    def test_summary_should_list_slowest_phase_first(self):
+        profiler = Profiler()
+        profiler.add("fast", 1)
+        profiler.add("slow", 3)
+
+        lines = profiler.summary().splitlines()
+
+        self.assertEqual([line.split()[0] for line in lines], ["phase", "slow", "fast"])
+        self.assertIn("75.0%", lines[1])
+
+    def test_reset_should_forget_phases(self):
+        profiler = Profiler()
+        profiler.add("a", 1)
+
+        profiler.reset()
+
+        self.assertEqual(profiler.stats(), {})
+
+    def test_phase_without_profiler_should_do_nothing(self):
+        with phase(None, "a"):
+            pass
+
+
+class TestSimulatorProfiling(unittest.TestCase):
+    def test_new_day_should_time_each_step_of_user_list(self):
+        profiler = Profiler()
+        simulator = Simulator(date(2000, 1, 1), profiler=profiler)
+        simulator.add_users(UserGenerator.generate_users(date(2000, 1, 1), 5))
+        expected = Simulator(date(2000, 1, 1))
+        expected.add_users(UserGenerator.generate_users(date(2000, 1, 1), 5))
+
+        simulator.new_days(4)
+        expected.new_days(4)
+
+        self.assertEqual(set(profiler.stats()), NEW_DAY_PHASES)
+        self.assertEqual({s["calls"] for s in profiler.stats().values()}, {4})
+        self.assertEqual(simulator.guzis_on_road(), expected.guzis_on_road())
+
+    def test_new_day_should_time_each_step_of_population(self):
+        profiler = Profiler()
+        population = Population()
+        population.add_users(["a", "b"], date(2000, 1, 1))
+        simulator = Simulator(date(2000, 1, 1), population, profiler=profiler)
+
+        simulator.new_days(2)
+
+        self.assertEqual(set(profiler.stats()), NEW_DAY_PHASES)
+        self.assertEqual(simulator.guzis_on_road(), 4)
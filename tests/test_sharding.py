@@ -0,0 +1,104 @@
+import unittest
+from datetime import date
+
+import numpy as np
+
+from simulator.models import Simulator, SimpleUser
+from simulator.population import Population
+from simulator.sharding import ShardedPopulation, ShardedRandomTrader, shard_simulator
+from tests.helpers import generate_population
+
+
+def varied_population(count):
+    """
+    Return a Population of count users with different totals and incomes
+    """
+    population = generate_population(count)
+    population.total_accumulated[:] = np.arange(count) * 7
+    population.income[:] = np.arange(count) % 5
+    population.recompute_totals()
+    return population
+
+
+def state_of(population):
+    return {name: population._field(name).tolist() for name in Population.FIELDS}
+
+
+def run_trades(seed, shard_count, processes, days=5):
+    simulator = Simulator(date(2000, 1, 1), varied_population(200), seed=seed)
+    with shard_simulator(simulator, shard_count, processes) as sharded:
+        trader = ShardedRandomTrader(sharded, simulator.rngs["trading"])
+        for _ in range(days):
+            simulator.new_day()
+            trader.trade_guzis()
+            trader.trade_guzis(30)
+        sharded.check_totals()
+        return state_of(sharded.gather())
+
+
+class TestShardedPopulation(unittest.TestCase):
+    def test_new_day_should_match_population(self):
+        population = varied_population(101)
+        expected = varied_population(101)
+
+        with ShardedPopulation.split(population, [1, 2, 3], processes=True) as sharded:
+            self.assertEqual(sharded.sizes, [33, 34, 34])
+            for _ in range(40):
+                sharded.new_day(date(2000, 1, 2))
+                expected.new_day(date(2000, 1, 2))
+
+            self.assertEqual(len(sharded), 101)
+            self.assertEqual(sharded.guzis_on_road, expected.guzis_on_road)
+            self.assertEqual(sharded.daily_guzis_total, expected.daily_guzis_total)
+            self.assertEqual(state_of(sharded.gather()), state_of(expected))
+
+    def test_trades_should_be_deterministic_for_seed_and_shard_count(self):
+        expected = run_trades(3, 3, processes=False)
+
+        self.assertEqual(run_trades(3, 3, processes=True), expected)
+        self.assertNotEqual(run_trades(4, 3, processes=False), expected)
+
+    def test_trades_should_keep_guzis(self):
+        with ShardedPopulation.split(varied_population(50), [1, 2], processes=False) as sharded:
+            sharded.new_day(date(2000, 1, 2))
+            before = sharded.gather()
+
+            ShardedRandomTrader(sharded).trade_guzis()
+
+            after = sharded.gather()
+            paid = int((before.guzi_wallet - after.guzi_wallet).sum())
+            self.assertGreater(paid, 0)
+            self.assertEqual(
+                paid,
+                int((after.income - before.income).sum() + (after.total_accumulated - before.total_accumulated).sum()))
+            sharded.check_totals()
+
+    def test_append_should_fill_smallest_shard_and_index_in_shard_order(self):
+        with ShardedPopulation([Population(), Population()], [1, 2], processes=False) as sharded:
+            for i in range(3):
+                sharded.append(SimpleUser(i, None))
+            sharded.add_users(["a"], None)
+
+            self.assertEqual(sharded.sizes, [2, 2])
+            self.assertEqual([sharded[i].id for i in range(4)], [0, 1, 2, "a"])
+
+            sharded.remove([0, 3])
+
+            self.assertEqual([sharded[i].id for i in range(len(sharded))], [1, 2])
+
+    def test_trade_guzis_should_raise_error_if_user_pool_is_empty(self):
+        with ShardedPopulation([Population()], [1], processes=False) as sharded:
+            with self.assertRaises(ValueError):
+                ShardedRandomTrader(sharded).trade_guzis()
+
+    def test_shard_simulator_should_keep_simulator_metrics(self):
+        simulator = Simulator(date(2000, 1, 1), varied_population(20))
+        simulator.new_days(3)
+        expected = (simulator.user_count(), simulator.guzis_on_road(), simulator.average_daily_guzi())
+
+        with shard_simulator(simulator, 4, processes=False):
+            self.assertEqual((simulator.user_count(), simulator.guzis_on_road(), simulator.average_daily_guzi()), expected)
+
+    def test_shard_simulator_should_need_population(self):
+        with self.assertRaises(ValueError):
+            shard_simulator(Simulator(date(2000, 1, 1)), 2)
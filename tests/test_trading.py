@@ -0,0 +1,98 @@
+import unittest
+
+import numpy as np
+
+from simulator.models import CompanyGenerator
+from simulator.population import Population
+from simulator.trading import BatchRandomTrader
+from tests.helpers import generate_population
+
+
+class TestBatchRandomTrader(unittest.TestCase):
+    def test_trade_guzis_should_raise_error_if_user_pool_is_empty(self):
+        trader = BatchRandomTrader(Population())
+
+        with self.assertRaises(ValueError):
+            trader.trade_guzis()
+
+    def test_trade_guzis_should_make_no_trade_for_users_who_are_broke(self):
+        population = generate_population(5)
+        population.guzi_wallet[0] = 5 # Others are broke
+        trader = BatchRandomTrader(population)
+
+        trader.trade_guzis(5)
+
+        self.assertTrue(population.guzi_wallet[0] < 5)
+        self.assertEqual(population.guzi_wallet[1:].tolist(), [0, 0, 0, 0])
+
+    def test_trade_guzis_with_count_should_reduce_N_guzi_wallets(self):
+        population = generate_population(10)
+        population.guzi_wallet[:] = 12
+        trader = BatchRandomTrader(population)
+
+        trader.trade_guzis(5)
+
+        self.assertEqual((population.guzi_wallet < 12).sum(), 5)
+
+    def test_trade_guzis_without_count_should_reduce_all_guzi_wallets(self):
+        population = generate_population(15)
+        population.guzi_wallet[:] = 11
+        trader = BatchRandomTrader(population)
+
+        trader.trade_guzis()
+
+        self.assertEqual((population.guzi_wallet < 11).sum(), 15)
+
+    def test_trade_guzis_should_keep_guzis_count(self):
+        population = generate_population(1000)
+        population.guzi_wallet[:] = np.arange(1000)
+        company_pool = CompanyGenerator.create_company_pool(4, population)
+        for c in company_pool:
+            c.guzi_wallet = 10
+        trader = BatchRandomTrader(population, company_pool, np.random.default_rng(1))
+
+        trader.trade_guzis()
+
+        spent = 1000 * 999 // 2 + 40 - population.guzi_wallet.sum() - sum(c.guzi_wallet for c in company_pool)
+        received = population.income.sum() + population.total_accumulated.sum()
+        self.assertTrue(spent > 0)
+        self.assertEqual(received, spent)
+
+    def test_trade_guzis_should_keep_running_totals(self):
+        population = generate_population(1000)
+        population.guzi_wallet[:] = 50
+        population.recompute_totals()
+        trader = BatchRandomTrader(population, rng=np.random.default_rng(2))
+
+        trader.trade_guzis()
+
+        population.check_totals()
+
+    def test_trade_guzis_should_trade_companies_if_company_pool_not_empty(self):
+        population = generate_population(10)
+        company_pool = CompanyGenerator.create_company_pool(4, population)
+        for c in company_pool:
+            c.guzi_wallet = 10
+        trader = BatchRandomTrader(population, company_pool)
+
+        trader.trade_guzis()
+
+        self.assertEqual(len([c for c in company_pool if c.guzi_wallet < 10]), 4)
+
+    def test_trade_guzas_should_raise_error_if_company_pool_is_empty(self):
+        trader = BatchRandomTrader(generate_population(1))
+
+        with self.assertRaises(ValueError):
+            trader.trade_guzas()
+
+    def test_trade_guzas_with_count_should_reduce_N_guza_wallets(self):
+        population = generate_population(10)
+        population.guza_wallet[:] = 12
+        company_pool = CompanyGenerator.create_company_pool(4, population)
+        trader = BatchRandomTrader(population, company_pool)
+
+        trader.trade_guzas(5)
+
+        self.assertEqual((population.guza_wallet < 12).sum(), 5)
+        self.assertEqual(population.outcome.sum(), 120 - population.guza_wallet.sum())
+        self.assertEqual(sum(c.guzi_wallet for c in company_pool), population.outcome.sum())